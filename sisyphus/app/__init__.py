@@ -1,10 +1,16 @@
+import datetime
 import logging
 import os
 
 from flask import Flask
 from flask.logging import default_handler
 
-from .repos_app import repos_hook
+from ..common.metrics import Metrics
+from ..common.tracing import Tracer
+from .dedup import Deliveries
+from .metrics import metrics_view, record_request, start_request
+from .queue import redis_conn
+from .repos_app import accepted, repos_hook
 from .settings import load_config
 
 
@@ -25,4 +31,19 @@ def create_app():
     app.config.from_mapping(repos_app.flask_config())
     repos_hook.init_app(app)
 
+    if repos_app.metrics:
+        Metrics.use(redis_conn())
+        app.before_request(start_request)
+        app.after_request(record_request)
+        app.add_url_rule("/metrics", "metrics", metrics_view)
+
+    if repos_app.tracing:
+        Tracer.use(redis_conn())
+
+    if (window := repos_app.dedup_window) is not None:
+        Deliveries.use(redis_conn(), window=datetime.timedelta(seconds=window))
+
+    # Se registra último para correr primero: record_request ve el 202.
+    app.after_request(accepted)
+
     return app
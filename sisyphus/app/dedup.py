@@ -0,0 +1,92 @@
+"""Descarte de webhooks repetidos, antes de encolar nada.
+
+GitHub reenvía un webhook si no le respondimos a tiempo (con el mismo
+X-GitHub-Delivery), y a veces llegan casi juntos un check_suite.requested y
+un rerequested del mismo commit. Cada uno crearía check runs y una
+corrección entera. Por eso, antes de encolar, se reclaman en Redis dos
+claves con SET NX EX:
+
+  sisyphus:delivery:<delivery_id>               (un día)
+  sisyphus:delivery:<repo>@<sha>:<evento>       (la ventana, p.ej. 2 minutos)
+
+Si alguna ya existía, el evento es un duplicado y se descarta. Las dos se
+reclaman en un solo pipeline: un duplicado cuesta un viaje a Redis.
+"""
+
+import datetime
+
+from typing import Optional
+
+from redis import Redis
+
+from ..common.typ import Repo
+
+
+__all__ = [
+    "Deliveries",
+]
+
+
+class Deliveries:
+    """Registro en Redis de los webhooks ya aceptados.
+
+    Args:
+      connection: conexión a Redis.
+      window: tiempo durante el cual un (repo, sha, evento) se considera
+          repetido, aunque tenga otro delivery id.
+      ttl: tiempo que se recuerda cada delivery id.
+      prefix: prefijo de las claves en Redis.
+    """
+
+    # Si se configura con use(), el webhook descarta los duplicados.
+    default: Optional["Deliveries"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        window: datetime.timedelta = datetime.timedelta(minutes=2),
+        ttl: datetime.timedelta = datetime.timedelta(days=1),
+        prefix: str = "sisyphus:delivery",
+    ):
+        self.connection = connection
+        self.window = window
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "Deliveries":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    def claim(
+        self, delivery_id: Optional[str], repo: Repo, sha: str, event: str
+    ) -> bool:
+        """Reclama un webhook; devuelve False si es un duplicado.
+        """
+        event_key = self._event_key(repo, sha, event)
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.set(event_key, 1, nx=True, ex=self.window)
+        if delivery_id is not None:
+            pipe.set(self._delivery_key(delivery_id), sha, nx=True, ex=self.ttl)
+        fresh_event, *fresh_delivery = pipe.execute()
+        if fresh_event and not all(fresh_delivery):
+            # Un reenvío tardío no debe bloquear un evento nuevo del commit.
+            self.connection.delete(event_key)
+        return bool(fresh_event) and all(fresh_delivery)
+
+    def release(self, delivery_id: Optional[str], repo: Repo, sha: str, event: str):
+        """Olvida un webhook reclamado (p.ej. si no se pudo encolar).
+
+        Así, el reenvío de GitHub no se descarta como duplicado.
+        """
+        keys = [self._event_key(repo, sha, event)]
+        if delivery_id is not None:
+            keys.append(self._delivery_key(delivery_id))
+        self.connection.delete(*keys)
+
+    def _delivery_key(self, delivery_id: str) -> str:
+        return f"{self.prefix}:{delivery_id}"
+
+    def _event_key(self, repo: Repo, sha: str, event: str) -> str:
+        return f"{self.prefix}:{repo.full_name}@{sha}:{event}"
@@ -0,0 +1,218 @@
+"""Etapa de ingesta: de un evento de check suite a un trabajo de corrección.
+
+El webhook responde en cuanto encola el IngestJob; todo lo que requiere ir
+a la red (planilla de repos, token de instalación, creación de los check
+runs en GitHub) ocurre aquí, en un worker de rq.
+"""
+
+import functools
+import logging
+import re
+import time
+import uuid
+
+from typing import Optional
+
+from ..common import tracing
+from ..common.github_pool import GitHubPool, app_pool
+from ..common.typ import AppInstallationTokenAuth, CorregirJob, IngestJob
+from ..common.wire import encode_job
+from ..corrector.affinity import Affinity
+from ..corrector.fairshare import FairShare
+from ..corrector.prefetch import prefetch_entrega
+from ..corrector.supersede import Supersession
+from ..corrector.tasks import corregir_entrega
+from .dedup import Deliveries
+from .queue import named_queue, prefetch_queue, redis_conn, task_queue
+from .reposdb import make_reposdb
+from .settings import load_config
+
+
+__all__ = [
+    "ingest_check_suite",
+    "warm_up",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def reposdb():
+    """Índice de repositorios del proceso (se construye en el primer uso).
+    """
+    return make_reposdb()
+
+
+@functools.lru_cache(maxsize=None)
+def github_pool() -> GitHubPool:
+    """Pool de clientes de GitHub de la app, compartido entre trabajos.
+    """
+    repos_app = load_config().repos_app
+    with open(repos_app.key_path, "rb") as key:
+        return app_pool(repos_app.app_id, key.read())
+
+
+def warm_up():
+    """Construye el índice de repos y el pool de GitHub antes del primer evento.
+
+    En un worker con fork() por trabajo, llamarla en el padre hace que los
+    hijos hereden ambos ya cargados (ver worker --preload-app).
+    """
+    github_pool()
+    reposdb().lookup("")
+
+
+def app_installation_token_auth(installation_id: int) -> AppInstallationTokenAuth:
+    """Obtiene el token de la instalación que originó el webhook.
+
+    El token se reusa entre trabajos hasta poco antes de que expire.
+    """
+    # Para poder usar github3.py en el worker, se necesita tanto el token
+    # como su fecha de expiración. Para PyGithub haría falta solamente el
+    # token.
+    return github_pool().installation_auth(installation_id)
+
+
+def ingest_check_suite(event: IngestJob):
+    """Crea los check runs de una entrega y encola su corrección.
+
+    Si falla (p.ej. un error transitorio de GitHub o de la planilla), se
+    libera el webhook reclamado en app.dedup: si no, su reenvío se
+    descartaría como duplicado, y la entrega no se corregiría nunca.
+
+    Returns:
+      el id del trabajo de corrección, o None si el repo no es conocido.
+    """
+    try:
+        return _ingest_check_suite(event)
+    except Exception:
+        release_delivery(event)
+        raise
+
+
+def release_delivery(event: IngestJob):
+    config = load_config()
+    if config.repos_app.dedup_window is None:
+        return
+    try:
+        Deliveries(redis_conn()).release(
+            event.delivery_id, event.repo, event.head_sha, event.kind
+        )
+    except Exception as ex:
+        logging.getLogger(__name__).warning(f"could not release delivery: {ex}")
+
+
+def _ingest_check_suite(event: IngestJob):
+    start = time.time()
+    config = load_config()
+    logger = logging.getLogger(__name__)
+    repo_full = event.repo.full_name
+    trace_id = event.trace_id
+
+    with tracing.span(trace_id, "lookup"):
+        info = reposdb().lookup(repo_full)
+
+    if info is None:
+        logger.debug(f"ignoring check_suite request from unknown repo {repo_full}")
+        return None
+
+    if (materia := info.materia or legacy_materia(repo_full)) is None:
+        logger.error(f"could not extract course name from {repo_full}")
+        return None
+
+    entrega = config.entregas[event.head_branch]
+    auth = app_installation_token_auth(event.installation_id)
+
+    if (prefetch := prefetch_queue()) is not None:
+        # Descarga especulativa: corre mientras el trabajo espera en la cola.
+        prefetch.enqueue(
+            prefetch_entrega,
+            event.repo,
+            event.head_sha,
+            entrega.alu_dir,
+            auth,
+            result_ttl=0,
+        )
+
+    logger.info(f"enqueuing check-run job for {repo_full}@{event.head_branch}")
+    job = CorregirJob(
+        repo=event.repo,
+        materia=materia,
+        head_sha=event.head_sha,
+        head_branch=event.head_branch,
+        alu_dir=entrega.alu_dir,
+        installation_auth=auth,
+        checks={check: config.checks[check] for check in entrega.checks},
+        trace_id=trace_id,
+        supersedable=event.before is not None,
+    )
+    with tracing.span(trace_id, "checkruns"):
+        job.checkrun_ids = create_checkruns(job)
+    job_id = str(uuid.uuid4())
+    previous = None
+
+    if config.repos_app.supersede and event.before is not None:
+        # Se registra antes de encolar, para que el trabajo nuevo ya se vea a sí
+        # mismo como el último; el anterior, si está corriendo, lo detecta solo.
+        supersession = Supersession(redis_conn())
+        previous = supersession.register(
+            event.repo, event.head_branch, event.head_sha, job_id, before=event.before
+        )
+
+    queue, meta = task_queue(), None
+    if config.repos_app.fair_share:
+        fair = FairShare(
+            redis_conn(), max_pending_per_repo=config.repos_app.max_pending_per_repo
+        )
+        queue_name, meta = fair.route(queue.name, job, priority=event.priority)
+        queue = named_queue(queue_name)
+
+    if config.repos_app.node_affinity:
+        affinity = Affinity(redis_conn(), max_backlog=config.repos_app.max_backlog)
+        queue = named_queue(affinity.route(task_queue().name, queue.name, job))
+
+    if trace_id is not None:
+        meta = dict(meta or {}, trace_id=trace_id)
+
+    # En el formato de common.wire los datos son más chicos, y el token no
+    # aparece en la descripción del trabajo (se la da aparte).
+    payload = encode_job(job) if config.repos_app.wire_format else job
+    description = f"corregir_entrega({repo_full}@{event.head_sha[:7]})"
+
+    with tracing.span(trace_id, "enqueue", queue=queue.name):
+        queue.enqueue(
+            corregir_entrega,
+            payload,
+            job_id=job_id,
+            meta=meta,
+            description=description,
+        )
+    tracing.record(trace_id, "ingest", start, materia=materia)
+
+    if previous is not None:
+        supersession.supersede(previous, event.head_sha, auth)
+
+    return job_id
+
+
+def legacy_materia(repo_full: str) -> Optional[str]:
+    """Materia según el nombre del repo, para la configuración con una sola
+    planilla (repos_app.spreadsheet_id, sin repos_app.spreadsheets).
+    """
+    m = re.search(r"/([^_]+)_", repo_full)
+    return m.group(1) if m else None
+
+
+def create_checkruns(job):
+    """Crea los check_run para pasar al worker, uno por check.
+
+    Returns:
+      un diccionario {check_id: checkrun_id}.
+    """
+    gh3 = github_pool().github3(job.installation_auth)
+    repo = gh3.repository(job.repo.owner, job.repo.name)
+    checkrun_ids = {}
+
+    for check_id, check in job.checks.items():
+        checkrun = repo.create_check_run(head_sha=job.head_sha, name=check.name)
+        checkrun_ids[check_id] = checkrun.id
+
+    return checkrun_ids
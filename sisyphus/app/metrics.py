@@ -0,0 +1,86 @@
+"""Endpoint /metrics, y medición de los requests al webhook.
+
+Las métricas de webhook, ingesta y workers se leen de Redis (ver
+common.metrics); a ellas se agrega, en el momento, la profundidad de cada
+cola de rq.
+
+Como la app es pública, /metrics requiere el token repos_app.metrics_token
+(Authorization: Bearer <token>).
+"""
+
+import hmac
+import time
+
+from flask import Response, abort, g, request
+from rq import Queue  # type: ignore
+
+from ..common import metrics
+from ..common.metrics import Metrics, format_labels, render_family
+from .queue import redis_conn
+from .settings import load_config
+
+
+__all__ = [
+    "metrics_view",
+    "record_request",
+    "start_request",
+]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def start_request():
+    """before_request: toma el tiempo de inicio del request.
+    """
+    g.request_start = time.monotonic()
+
+
+def record_request(response):
+    """after_request: registra duración y status de los eventos de GitHub.
+    """
+    if (event := request.headers.get("X-GitHub-Event")) is not None:
+        action = (request.get_json(silent=True) or {}).get("action")
+        event = f"{event}.{action}" if action else event
+        metrics.observe(
+            "sisyphus_webhook_seconds", time.monotonic() - g.request_start, event=event
+        )
+        metrics.inc(
+            "sisyphus_webhook_requests_total",
+            event=event,
+            status=response.status_code,
+        )
+    return response
+
+
+def metrics_view():
+    """Métricas en formato de texto de Prometheus.
+    """
+    if not authorized(request.headers.get("Authorization", "")):
+        abort(401)
+    text = Metrics.default.render() if Metrics.default is not None else ""
+    queues = Queue.all(connection=redis_conn())
+    depth = [("sisyphus_queue_depth", _queue(q), q.count) for q in queues]
+    started = [
+        ("sisyphus_queue_started", _queue(q), q.started_job_registry.count)
+        for q in queues
+    ]
+    text += render_family(
+        "sisyphus_queue_depth", "gauge", "Trabajos encolados en cada cola.", depth
+    )
+    text += render_family(
+        "sisyphus_queue_started", "gauge", "Trabajos en curso en cada cola.", started
+    )
+    return Response(text, content_type=CONTENT_TYPE)
+
+
+def authorized(authorization: str) -> bool:
+    """Si el header Authorization lleva el token de las métricas.
+    """
+    if (token := load_config().repos_app.metrics_token) is None:
+        return False
+    expected = f"Bearer {token.get_secret_value()}"
+    return hmac.compare_digest(authorization.encode(), expected.encode())
+
+
+def _queue(queue: Queue) -> str:
+    return format_labels(dict(queue=queue.name))
@@ -1,11 +1,50 @@
+"""Conexión a Redis y colas de rq de la app.
+
+Todo se construye la primera vez que se usa (y se reusa en el proceso), no
+al importar el módulo: importar la app no lee la configuración ni abre
+conexiones.
+"""
+
+import functools
+
+from typing import Optional
+
 from redis import Redis
 from rq import Queue  # type: ignore
 
 from .settings import load_config
 
 
-settings = load_config()
-repos_app = settings.repos_app
+__all__ = [
+    "ingest_queue",
+    "named_queue",
+    "prefetch_queue",
+    "redis_conn",
+    "task_queue",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def redis_conn() -> Redis:
+    return Redis()
+
+
+def task_queue() -> Queue:
+    return named_queue(load_config().repos_app.job_queue)
+
+
+def ingest_queue() -> Queue:
+    return named_queue(load_config().repos_app.ingest_queue)
+
+
+def prefetch_queue() -> Optional[Queue]:
+    if (name := load_config().repos_app.prefetch_queue) is None:
+        return None
+    return named_queue(name)
+
 
-redis_conn = Redis()
-task_queue = Queue(repos_app.job_queue, connection=redis_conn)
+@functools.lru_cache(maxsize=None)
+def named_queue(name: str) -> Queue:
+    """Cola de rq por nombre (p.ej. las sub-colas de FairShare).
+    """
+    return Queue(name, connection=redis_conn())
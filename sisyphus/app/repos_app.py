@@ -1,39 +1,33 @@
-"""Endpoints de los repositorios para el corrector automático."""
+"""Endpoints de los repositorios para el corrector automático.
+
+Los handlers solo validan y filtran el payload, y encolan un IngestJob; el
+resto (planilla de repos, tokens, check runs) ocurre en ingest.py. Así la
+respuesta a GitHub (202 Accepted) sale en milisegundos.
+"""
 
 import logging
 import re
+import time
 
+from flask import g, request
 from flask_githubapp import GitHubApp  # type: ignore
 
-from ..common import github_utils
-from ..common.typ import AppInstallationTokenAuth, CorregirJob, Repo
-from ..corrector.tasks import corregir_entrega
-from .queue import task_queue
-from .reposdb import make_reposdb
+from ..common import metrics, tracing
+from ..common.typ import IngestJob, Repo
+from .dedup import Deliveries
+from .ingest import ingest_check_suite
+from .queue import ingest_queue
 from .settings import load_config
 
 
 __all__ = [
+    "accepted",
     "repos_hook",
 ]
 
-reposdb = make_reposdb()
 repos_hook = GitHubApp()
 
 
-def app_installation_token_auth() -> AppInstallationTokenAuth:
-    """Obtiene el token de autenticación del objeto GitHubApp.
-    """
-    client = repos_hook.installation_client
-    session_auth = client.session.auth
-    # Para poder usar github3.py en el worker, se necesita tanto el token
-    # como su fecha de expiración. Para PyGithub haría falta solamente el
-    # token.
-    return AppInstallationTokenAuth(
-        token=session_auth.token, expires_at=session_auth.expires_at_str,
-    )
-
-
 @repos_hook.on("check_suite.requested")
 def checksuite_requested():
     create_runs(repos_hook.payload)
@@ -46,10 +40,12 @@ def checksuite_rerequested():
 
 @repos_hook.on("check_run.rerequested")
 def checkrun_rerequested():
-    create_runs(repos_hook.payload)
+    # Un pedido explícito de volver a correr va por la cola de prioridad.
+    create_runs(repos_hook.payload, priority=True)
 
 
-def create_runs(payload):
+def create_runs(payload, *, priority=False):
+    start = time.time()
     config = load_config()
     logger = logging.getLogger(__name__)
 
@@ -57,46 +53,69 @@ def create_runs(payload):
     # a check_run.rerequested; in that case the check_suite is inside the check_run
     # object.
     if "check_run" not in payload:
+        kind = "check_suite"
         suite = payload["check_suite"]
     else:
+        kind = "check_run"
         suite = payload["check_run"]["check_suite"]
 
-    materia = None
     repo = payload["repository"]
     branch = suite["head_branch"]
     repo_full = repo["full_name"]
 
-    if not reposdb.is_repo_known(repo_full):
-        logger.debug(f"ignoring check_suite request from unknown repo {repo_full}")
-    elif re.match(r"^0+$", suite["before"]):
+    if re.match(r"^0+$", suite["before"]):
         logger.info(f"ignoring check_suite event for just-created {repo_full}@{branch}")
     elif branch not in config.entregas:
         logging.warn(f"ignoring check_suite for branch {branch!r} in {repo_full}")
-    elif not (m := re.search(r"/([^_]+)_", repo_full)):
-        logger.error(f"could not extract course name from {repo_full}")
+    elif not claim_delivery(Repo(repo_full), suite["head_sha"], kind):
+        logger.info(f"ignoring duplicate {kind} event for {repo_full}@{branch}")
+        metrics.inc("sisyphus_webhook_duplicates_total", event=kind)
     else:
-        # TODO: remove this.
-        materia = m.group(1)
-
-    if materia:
-        logger.info(f"enqueuing check-run job for {repo_full}@{branch}")
-        job = CorregirJob(
+        # La materia (y si el repo es conocido) se averigua en la ingesta.
+        trace_id = tracing.new_trace_id()
+        event = IngestJob(
             repo=Repo(repo_full),
-            materia=materia,
             head_sha=suite["head_sha"],
             head_branch=branch,
-            installation_auth=app_installation_token_auth(),
+            installation_id=payload["installation"]["id"],
+            priority=priority,
+            trace_id=trace_id,
+            before=suite["before"] if payload["action"] == "requested" else None,
+            delivery_id=request.headers.get("X-GitHub-Delivery"),
+            kind=kind,
         )
-        job.checkrun_id = create_checkrun(job)
-        task_queue.enqueue(corregir_entrega, job)
-
-
-def create_checkrun(job):
-    """Crea un check_run para pasar al worker. Devuelve el checkrun id."""
-    gh3 = repos_hook.installation_client
-    github_utils.configure_retries(gh3.session)
-    repo = gh3.repository(job.repo.owner, job.repo.name)
-    checkrun = repo.create_check_run(
-        head_sha=job.head_sha, name=f"Pruebas {job.head_branch}"
-    )
-    return checkrun.id
+        queue = ingest_queue()
+        try:
+            with tracing.span(trace_id, "enqueue", queue=queue.name):
+                queue.enqueue(
+                    ingest_check_suite, event, meta=dict(trace_id=trace_id)
+                )
+        except Exception:
+            # Que el reenvío de GitHub no se descarte como duplicado.
+            release_delivery(event.repo, event.head_sha, kind)
+            raise
+        g.ingest_enqueued = True
+        tracing.record(trace_id, "webhook", start, repo=repo_full)
+
+
+def claim_delivery(repo: Repo, sha: str, kind: str) -> bool:
+    """Reclama el webhook en curso; False si es un duplicado (ver dedup.py).
+    """
+    if (deliveries := Deliveries.default) is None:
+        return True
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    return deliveries.claim(delivery_id, repo, sha, kind)
+
+
+def release_delivery(repo: Repo, sha: str, kind: str):
+    if (deliveries := Deliveries.default) is not None:
+        delivery_id = request.headers.get("X-GitHub-Delivery")
+        deliveries.release(delivery_id, repo, sha, kind)
+
+
+def accepted(response):
+    """after_request: responde 202 si el evento quedó encolado para ingesta.
+    """
+    if g.get("ingest_enqueued") and response.status_code == 200:
+        response.status_code = 202
+    return response
@@ -1,9 +1,13 @@
 """Pseudo-DB con la lista de repositorios conocidos."""
 
+from typing import Union
+
 from google.oauth2.service_account import Credentials  # type: ignore
 
 from ..common.sheets import Config
-from ..repos.planilla import ReposDB
+from ..repos.planilla import ReposDB, ReposRegistry
+from ..repos.shared import SharedReposIndex
+from .queue import redis_conn
 from .settings import load_config
 
 
@@ -12,8 +16,14 @@ __all__ = [
 ]
 
 
-def make_reposdb() -> ReposDB:
-    """
+def make_reposdb() -> Union[ReposRegistry, SharedReposIndex]:
+    """Construye el índice de repositorios de todas las materias configuradas.
+
+    Cada materia de repos_app.spreadsheets tiene su planilla; si solo se
+    configuró spreadsheet_id, sus repos quedan sin materia asignada.
+
+    Con repos_app.repos_shared, el índice se comparte en Redis entre todos
+    los procesos, y solo uno a la vez descarga las planillas.
     """
     settings = load_config()
     repos_app = settings.repos_app
@@ -21,9 +31,32 @@ def make_reposdb() -> ReposDB:
         repos_app.sheets_auth,
         scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
     )
-    config = Config(
-        spreadsheet_id=repos_app.spreadsheet_id,
-        credentials=credentials,
-        sheet_list=["Repos"],
-    )
-    return ReposDB(config)
+    spreadsheets = dict(repos_app.spreadsheets)
+    if repos_app.spreadsheet_id:
+        spreadsheets.setdefault(None, repos_app.spreadsheet_id)
+
+    def snapshot_path(materia):
+        if not (path := repos_app.repos_snapshot):
+            return None
+        return f"{path}.{materia}" if materia else path
+
+    shared = repos_app.repos_shared
+    dbs = {
+        materia: ReposDB(
+            Config(
+                spreadsheet_id=spreadsheet_id,
+                credentials=credentials,
+                sheet_list=["Repos"],
+                refresh_interval=None if shared else repos_app.repos_refresh,
+                snapshot_path=snapshot_path(materia),
+            )
+        )
+        for materia, spreadsheet_id in spreadsheets.items()
+    }
+    registry = ReposRegistry(dbs)
+
+    if shared:
+        return SharedReposIndex(
+            redis_conn(), registry, refresh_interval=repos_app.repos_refresh or 300
+        )
+    return registry
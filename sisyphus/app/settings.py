@@ -1,7 +1,7 @@
 import functools
 import os
 
-from typing import Dict
+from typing import Dict, Optional
 
 import yaml
 
@@ -16,13 +16,45 @@ class ReposApp(BaseSettings):
     key_path: str
     endpoint: str
     sheets_auth: str
-    spreadsheet_id: str
+    spreadsheet_id: Optional[str] = None
+    spreadsheets: Dict[str, str] = Field(default_factory=dict)
     webhook_secret: SecretStr
+    repos_refresh: Optional[float] = None
+    repos_snapshot: Optional[str] = None
+    repos_shared: bool = False
     job_queue: str = "default"
+    ingest_queue: str = "ingest"
+    prefetch_queue: Optional[str] = None
+    supersede: bool = True
+    fair_share: bool = False
+    max_pending_per_repo: int = 3
+    node_affinity: bool = False
+    max_backlog: int = 2
+    metrics: bool = False
+    metrics_token: Optional[SecretStr] = None
+    tracing: bool = True
+    wire_format: bool = False
+    dedup_window: Optional[float] = 120
 
     class Config:
         env_prefix = "REPOS_"
 
+    @root_validator
+    def some_spreadsheet(cls, fields):
+        """Se necesita spreadsheet_id, o una planilla por materia en spreadsheets.
+        """
+        if not fields.get("spreadsheet_id") and not fields.get("spreadsheets"):
+            raise ValueError("either spreadsheet_id or spreadsheets is required")
+        return fields
+
+    @root_validator
+    def metrics_need_token(cls, fields):
+        """/metrics está en la app pública: solo se sirve con un token.
+        """
+        if fields.get("metrics") and not fields.get("metrics_token"):
+            raise ValueError("metrics requires metrics_token")
+        return fields
+
     def flask_config(self):
         return dict(
             GITHUBAPP_ID=self.app_id,
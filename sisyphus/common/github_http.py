@@ -0,0 +1,276 @@
+"""Capa HTTP para la API de GitHub, consciente del rate limit.
+
+GitHubAdapter es un HTTPAdapter de requests que se monta en las sesiones de
+github3.py y PyGithub, y que:
+
+  • registra X-RateLimit-Remaining/X-RateLimit-Reset de cada respuesta, y
+    espacia los requests cuando quedan pocos, en lugar de agotar la cuota
+    de golpe y hacer fallar todos los trabajos a la vez;
+
+  • ante un rate limit (primario o secundario), espera lo que indique
+    Retry-After (o hasta X-RateLimit-Reset) y reintenta;
+
+  • nunca espera más de max_wait segundos (así un request del webhook o de
+    la ingesta no queda colgado): al espaciar, espera a lo sumo max_wait y
+    envía igual; solo si la cuota está agotada (o bloqueada) por más
+    tiempo, lanza RateLimitExceeded sin enviar el request;
+
+  • guarda las respuestas a GET que traen ETag, y las revalida con
+    If-None-Match: las respuestas 304 no cuentan para el rate limit.
+
+La latencia de cada request y el rate limit restante se registran en
+common.metrics.
+"""
+
+import collections
+import copy
+import functools
+import logging
+import threading
+import time
+
+from typing import Dict, Optional, Tuple
+
+from requests import PreparedRequest, RequestException, Response
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+
+__all__ = [
+    "GitHubAdapter",
+    "RateLimitExceeded",
+    "RateLimiter",
+    "ResponseCache",
+    "shared_adapter_state",
+]
+
+
+class RateLimitExceeded(RequestException):
+    """Habría que esperar más de max_wait segundos para no exceder el rate limit.
+    """
+
+
+class RateLimiter:
+    """Estado del rate limit por credencial (header Authorization).
+
+    Args:
+      low_watermark: por debajo de esta cantidad de requests restantes, se
+          reparten los que quedan de manera uniforme hasta el reset.
+      max_wait: espera máxima (en segundos) antes de un request. El espaciado
+          se limita a max_wait; si la cuota está agotada por más tiempo, el
+          request falla con RateLimitExceeded.
+    """
+
+    def __init__(self, *, low_watermark: int = 500, max_wait: float = 10):
+        self.low_watermark = low_watermark
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[int, float]] = {}
+        self._blocked_until: Dict[str, float] = {}
+
+    def delay(self, key: str) -> float:
+        """Segundos a esperar antes de enviar un request con esta credencial.
+
+        Mientras queden requests, nunca más de max_wait: solo una cuota
+        agotada (o bloqueada) puede requerir más.
+        """
+        now = time.time()
+        with self._lock:
+            blocked_until = self._blocked_until.get(key, 0)
+            remaining, reset = self._state.get(key, (None, 0))
+
+        if blocked_until > now:
+            return blocked_until - now
+        if remaining is None or reset <= now or remaining >= self.low_watermark:
+            return 0
+        if remaining <= 0:
+            return reset - now
+
+        return min((reset - now) / remaining, self.max_wait)
+
+    def update(self, key: str, resp: Response):
+        headers = resp.headers
+        if "X-RateLimit-Remaining" in headers and "X-RateLimit-Reset" in headers:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+            with self._lock:
+                self._state[key] = (remaining, reset)
+
+    def block(self, key: str, seconds: float):
+        """Bloquea la credencial (p.ej. tras un rate limit secundario).
+        """
+        with self._lock:
+            self._blocked_until[key] = time.time() + seconds
+
+    def remaining(self, key: str) -> Optional[int]:
+        with self._lock:
+            return self._state.get(key, (None, 0))[0]
+
+
+class ResponseCache:
+    """Caché LRU de respuestas a GET con ETag.
+
+    Args:
+      max_entries: cantidad máxima de respuestas guardadas.
+      max_size: tamaño máximo (en bytes) de una respuesta para guardarla.
+    """
+
+    def __init__(self, *, max_entries: int = 2048, max_size: int = 1 << 20):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+
+    def get(self, key) -> Optional[Response]:
+        with self._lock:
+            if (resp := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+            return resp
+
+    def put(self, key, resp: Response):
+        if len(resp.content) > self.max_size:
+            return
+        with self._lock:
+            self._entries[key] = resp
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revalidated(self, cached: Response, not_modified: Response) -> Response:
+        """Construye la respuesta a devolver ante un 304.
+        """
+        with self._lock:
+            self.hits += 1
+        resp = copy.copy(cached)
+        resp.headers = copy.copy(cached.headers)
+        # Los headers de rate limit del 304 son los actuales.
+        for header, value in not_modified.headers.items():
+            if header.lower().startswith("x-ratelimit"):
+                resp.headers[header] = value
+        resp.request = not_modified.request
+        resp.elapsed = not_modified.elapsed
+        return resp
+
+
+class GitHubAdapter(HTTPAdapter):
+    """HTTPAdapter con throttling adaptativo y caché de requests condicionales.
+    """
+
+    def __init__(
+        self,
+        *,
+        limiter: RateLimiter,
+        cache: Optional[ResponseCache],
+        rate_limit_retries: int = 3,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+        self.cache = cache
+        self.rate_limit_retries = rate_limit_retries
+        self.logger = logging.getLogger(__name__)
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ) -> Response:
+        key = request.headers.get("Authorization", "")
+        cache = self.cache
+        cache_key = None
+        cached = None
+
+        if cache is not None and request.method == "GET" and not stream:
+            cache_key = (request.url, request.headers.get("Accept"), key)
+            if (cached := cache.get(cache_key)) is not None:
+                request.headers["If-None-Match"] = cached.headers["ETag"]
+
+        for attempt in range(self.rate_limit_retries + 1):
+            if (delay := self.limiter.delay(key)) > self.limiter.max_wait:
+                raise RateLimitExceeded(
+                    f"GitHub rate limit: would need to wait {delay:.0f}s",
+                    request=request,
+                )
+            if delay > 0:
+                self.logger.info(f"throttling GitHub request for {delay:.1f}s")
+                time.sleep(delay)
+
+            resp = super().send(
+                request,
+                stream=stream,
+                timeout=timeout,
+                verify=verify,
+                cert=cert,
+                proxies=proxies,
+            )
+            self.limiter.update(key, resp)
+            self.record(request, resp)
+
+            if (wait := self.rate_limited(resp)) is None:
+                break
+            if attempt == self.rate_limit_retries or wait > self.limiter.max_wait:
+                self.logger.warn(f"GitHub rate limit hit, giving up ({wait:.0f}s)")
+                break
+
+            self.logger.warn(f"GitHub rate limit hit, retrying in {wait:.0f}s")
+            self.limiter.block(key, wait)
+            resp.close()
+
+        if cache is None:
+            return resp
+
+        if cached is not None and resp.status_code == 304:
+            return cache.revalidated(cached, resp)
+
+        if cache_key is not None and resp.status_code == 200 and "ETag" in resp.headers:
+            cache.put(cache_key, resp)
+
+        return resp
+
+    @staticmethod
+    def record(request: PreparedRequest, resp: Response):
+        metrics.observe(
+            "sisyphus_github_request_seconds",
+            resp.elapsed.total_seconds(),
+            method=request.method,
+        )
+        if (remaining := resp.headers.get("X-RateLimit-Remaining")) is not None:
+            metrics.gauge(
+                "sisyphus_github_ratelimit_remaining",
+                float(remaining),
+                resource=resp.headers.get("X-RateLimit-Resource", "core"),
+            )
+
+    @staticmethod
+    def rate_limited(resp: Response) -> Optional[float]:
+        """Si la respuesta es un rate limit, devuelve los segundos a esperar.
+        """
+        if resp.status_code not in (403, 429):
+            return None
+
+        if "Retry-After" in resp.headers:
+            # Rate limit secundario (o abuse detection).
+            return float(resp.headers["Retry-After"])
+
+        if resp.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(resp.headers.get("X-RateLimit-Reset", 0))
+            return max(reset - time.time(), 1)
+
+        if resp.status_code == 429 or "rate limit" in resp.text.lower():
+            # Rate limit secundario sin Retry-After: GitHub sugiere un minuto.
+            return 60
+
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def shared_adapter_state() -> Tuple[RateLimiter, ResponseCache]:
+    """Rate limiter y caché compartidos por todas las sesiones del proceso.
+    """
+    return RateLimiter(), ResponseCache()
@@ -0,0 +1,222 @@
+"""Pool de clientes de GitHub, compartido entre webhook y worker.
+
+Cada instalación de la app obtiene un token que dura una hora; aquí se lo
+guarda hasta poco antes de su expiración, en lugar de generar un JWT y
+pedir un token nuevo en cada uso. Además, cada token tiene asociada una
+única sesión HTTP (keep-alive) de github3.py. Los clientes de PyGithub, en
+cambio, no se comparten entre threads: su conexión persistente guarda el
+request en curso en el propio objeto.
+
+Las llamadas a la red (generar un token, buscar una instalación) se hacen
+fuera del lock del pool, con un lock por instalación o repo: una llamada
+lenta a GitHub no demora a los threads que usan otras instalaciones.
+"""
+
+import datetime
+import functools
+import threading
+
+from typing import Dict, Hashable, Optional, Tuple
+
+import github
+import github3  # type: ignore
+
+from github3.session import GitHubSession  # type: ignore
+
+from . import github_utils
+from .typ import AppInstallationTokenAuth, Repo
+
+
+__all__ = [
+    "GitHubPool",
+    "app_auth",
+    "app_pool",
+    "default_pool",
+    "github3_installation_auth",
+]
+
+# Margen antes de expires_at a partir del cual se considera vencido un token.
+EXPIRY_MARGIN = datetime.timedelta(minutes=5)
+
+
+class GitHubPool:
+    """Pool de sesiones y tokens de instalación, indexado por instalación.
+
+    Las credenciales de la app (app_id y private_key) solo son necesarias
+    para generar tokens; un worker que recibe el token en el trabajo puede
+    usar un pool sin ellas.
+    """
+
+    def __init__(
+        self,
+        app_id: Optional[int] = None,
+        private_key: Optional[bytes] = None,
+        *,
+        margin: datetime.timedelta = EXPIRY_MARGIN,
+    ):
+        self.app_id = app_id
+        self.private_key = private_key
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._tokens: Dict[int, AppInstallationTokenAuth] = {}
+        self._installations: Dict[str, int] = {}
+        self._sessions: Dict[str, GitHubSession] = {}
+        self._pygithub: Dict[Tuple[str, int], github.Github] = {}
+
+    def installation_auth(self, installation_id: int) -> AppInstallationTokenAuth:
+        """Devuelve un token para la instalación, generándolo solo si hace falta.
+        """
+        with self._lock_for(("token", installation_id)):
+            with self._lock:
+                auth = self._tokens.get(installation_id)
+            if auth is None or not self.is_fresh(auth):
+                auth = self._mint_token(installation_id)
+                with self._lock:
+                    self._tokens[installation_id] = auth
+            return auth
+
+    def installation_for_repo(self, repo: Repo) -> int:
+        """Devuelve (y guarda) el id de instalación de la app en un repositorio.
+        """
+        with self._lock_for(("installation", repo.full_name)):
+            with self._lock:
+                inst_id = self._installations.get(repo.full_name)
+            if inst_id is None:
+                gh3 = github3.GitHub(session=self._new_session())
+                gh3.login_as_app(self._key(), self.app_id)
+                installation = gh3.app_installation_for_repository(
+                    repo.owner, repo.name
+                )
+                inst_id = installation.id
+                with self._lock:
+                    self._installations[repo.full_name] = inst_id
+            return inst_id
+
+    def repo_auth(self, repo: Repo) -> AppInstallationTokenAuth:
+        """Atajo para obtener el token de la instalación de un repositorio.
+        """
+        return self.installation_auth(self.installation_for_repo(repo))
+
+    def session(self, auth: AppInstallationTokenAuth) -> GitHubSession:
+        """Devuelve la sesión (compartida) asociada a un token de instalación.
+        """
+        token = auth.token.get_secret_value()
+        with self._lock:
+            if (session := self._sessions.get(token)) is None:
+                self._expire_sessions()
+                session = self._new_session()
+                session.app_installation_token_auth(auth.as_dict())
+                self._sessions[token] = session
+            return session
+
+    def github3(self, auth: AppInstallationTokenAuth) -> github3.GitHub:
+        """Cliente github3.py sobre la sesión compartida del token.
+        """
+        return github3.GitHub(session=self.session(auth))
+
+    def pygithub(self, auth: AppInstallationTokenAuth) -> github.Github:
+        """Cliente PyGithub para el token, reusado entre llamadas del thread.
+
+        PyGithub mantiene una conexión persistente por cliente, así que
+        reusar el objeto equivale a reusar la conexión. Pero esa conexión
+        guarda el request en curso (verbo, url, body) entre request() y
+        getresponse(): usado desde dos threads, uno podría recibir la
+        respuesta del otro. Por eso se guarda un cliente por thread.
+        """
+        key = (auth.token.get_secret_value(), threading.get_ident())
+        with self._lock:
+            if (gh := self._pygithub.get(key)) is None:
+                gh = self._pygithub[key] = self.new_pygithub(auth)
+            return gh
+
+    def new_pygithub(self, auth: AppInstallationTokenAuth) -> github.Github:
+        """Cliente PyGithub nuevo, para usar en un único trabajo.
+
+        Con aio_worker, las etapas de un trabajo pueden correr en threads
+        distintos del executor (y un mismo thread atiende varios trabajos):
+        cada trabajo necesita su propio cliente.
+        """
+        gh = github.Github(login_or_token=auth.token.get_secret_value())
+        github_utils.configure_pygithub(gh)
+        return gh
+
+    def _mint_token(self, installation_id: int) -> AppInstallationTokenAuth:
+        session = self._new_session()
+        gh3 = github3.GitHub(session=session)
+        gh3.login_as_app_installation(self._key(), self.app_id, installation_id)
+        session_auth = session.auth
+        auth = AppInstallationTokenAuth(
+            token=session_auth.token, expires_at=session_auth.expires_at_str,
+        )
+        # La sesión con que se obtuvo el token queda ya autenticada con él.
+        with self._lock:
+            self._sessions[session_auth.token] = session
+        return auth
+
+    def is_fresh(self, auth: AppInstallationTokenAuth) -> bool:
+        """Indica si el token sigue vigente (con el margen del pool).
+        """
+        expires_at = parse_expires_at(auth.expires_at)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return now + self.margin < expires_at
+
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        """Lock propio de una instalación o repo, para las llamadas a la red.
+        """
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _expire_sessions(self):
+        """Cierra las sesiones (y clientes) de tokens ya vencidos.
+        """
+        for token, session in list(self._sessions.items()):
+            if getattr(session.auth, "expired", False):
+                session.close()
+                del self._sessions[token]
+                for key in [key for key in self._pygithub if key[0] == token]:
+                    del self._pygithub[key]
+
+    def _new_session(self) -> GitHubSession:
+        session = GitHubSession()
+        github_utils.configure_retries(session)
+        return session
+
+    def _key(self) -> bytes:
+        if self.app_id is None or self.private_key is None:
+            raise ValueError("GitHubPool without app credentials cannot mint tokens")
+        return self.private_key
+
+
+def parse_expires_at(expires_at: str) -> datetime.datetime:
+    """Convierte el expires_at de GitHub (ISO 8601, con "Z") a datetime.
+    """
+    return datetime.datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+
+
+@functools.lru_cache(maxsize=None)
+def app_pool(app_id: int, private_key: bytes) -> GitHubPool:
+    """Pool del proceso para una app (puede generar tokens de instalación).
+    """
+    return GitHubPool(app_id, private_key)
+
+
+@functools.lru_cache(maxsize=None)
+def default_pool() -> GitHubPool:
+    """Pool del proceso sin credenciales, para tokens recibidos en los trabajos.
+    """
+    return GitHubPool()
+
+
+def github3_installation_auth(repo: Repo, app_id: int, private_key: bytes):
+    """Cliente github3.py autenticado como la instalación de la app en repo.
+    """
+    pool = app_pool(app_id, private_key)
+    return pool.github3(pool.repo_auth(repo))
+
+
+def app_auth(repo_name: str, app_id: int, private_key: bytes):
+    """Cliente PyGithub autenticado como la instalación de la app en repo_name.
+    """
+    pool = app_pool(app_id, private_key)
+    return pool.pygithub(pool.repo_auth(Repo(repo_name)))
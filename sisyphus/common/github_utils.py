@@ -1,18 +1,18 @@
 import logging
 import pathlib
 
-from typing import List, Set
+from typing import BinaryIO, List, Optional, Set, cast
 
 import github
-import github3  # type: ignore
 
 from github3.session import GitHubSession  # type: ignore
 from github.ContentFile import ContentFile
 from github.GithubException import GithubException
-from requests.adapters import HTTPAdapter
+from requests import Session
 from requests.packages.urllib3.util.retry import Retry
 
-from .typ import PyGithubRepo, Repo, RepoFile
+from .github_http import GitHubAdapter, shared_adapter_state
+from .typ import SPILL_THRESHOLD, PyGithubRepo, RepoFile
 
 
 def exception_codes(gh_exception: GithubException) -> Set[str]:
@@ -22,18 +22,49 @@ def exception_codes(gh_exception: GithubException) -> Set[str]:
     return {code for e in errors if (code := e.get("code"))}  # type: ignore
 
 
-def configure_retries(session: GitHubSession):
-    """Configure retries for a github3 client.
+def make_retry() -> Retry:
+    """Política de reintentos común para github3.py y PyGithub.
     """
     # https://cumulusci.readthedocs.io/en/latest/_modules/cumulusci/core/github.html
-    retries = Retry(status_forcelist=(401, 502, 503, 504), backoff_factor=0.3)
-    adapter = HTTPAdapter(max_retries=retries)
+    return Retry(status_forcelist=(401, 502, 503, 504), backoff_factor=0.3)
+
+
+def configure_retries(session: GitHubSession):
+    """Configura los reintentos de un cliente de github3.py.
+
+    Además de los reintentos de urllib3, el adapter espacia los requests
+    según los headers de rate limit, y revalida con ETag las respuestas a GET
+    guardadas.
+    """
+    limiter, cache = shared_adapter_state()
+    adapter = GitHubAdapter(max_retries=make_retry(), limiter=limiter, cache=cache)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
 
 
-def repo_files(gh_repo: PyGithubRepo, sha: str, subdir: str = None) -> List[RepoFile]:
+def configure_pygithub(gh: github.Github):
+    """Configura un cliente de PyGithub con el mismo adapter que github3.py.
     """
+    # PyGithub crea su requests.Session dentro de un objeto privado de
+    # conexión, sin forma de pasarle un adapter; se crea la conexión
+    # (persistente) de antemano y se monta el nuestro sobre ella.
+    requester = gh._Github__requester  # type: ignore
+    connection = requester._Requester__createConnection()
+    configure_retries(connection.session)
+
+
+def repo_files(
+    gh_repo: PyGithubRepo,
+    sha: str,
+    subdir: Optional[str] = None,
+    *,
+    session: Optional[Session] = None,
+) -> List[RepoFile]:
+    """Descarga los archivos de un subdirectorio de un repositorio.
+
+    Si se pasa una sesión HTTP, los archivos de más de SPILL_THRESHOLD bytes
+    (incluyendo los que la API de contenidos rechaza por grandes) se
+    descargan en streaming desde su download_url, directo a disco.
     """
     # TODO: añadir soporte para directorios.
     # TODO: añadir soporte para permisos.
@@ -50,41 +81,30 @@ def repo_files(gh_repo: PyGithubRepo, sha: str, subdir: str = None) -> List[Repo
         if entry.type != "file":
             logger.warn(f"ignoring entry {entry.path!r} of type {entry.type}")
             continue
-        rel_path = pathlib.PurePath(entry.path).relative_to(subdir)
+        rel_path = pathlib.PurePath(entry.path).relative_to(subdir).as_posix()
         try:
-            repo_file = RepoFile(
-                path=rel_path.as_posix(), contents=entry.decoded_content
-            )
-        except GithubException as ex:
-            if "too_large" in exception_codes(ex):
-                # FIXME: usar la Git Data API para descargar el archivo?
-                logger.warn(f"por su tamaño no se pudo descargar {entry.path!r}")
+            if session is not None and entry.size > SPILL_THRESHOLD:
+                repo_file = download_file(session, entry.download_url, rel_path)
             else:
+                repo_file = RepoFile(path=rel_path, contents=entry.decoded_content)
+        except GithubException as ex:
+            if "too_large" not in exception_codes(ex):
                 raise ex from ex
-        else:
-            repo_files.append(repo_file)
+            elif session is not None:
+                repo_file = download_file(session, entry.download_url, rel_path)
+            else:
+                logger.warn(f"por su tamaño no se pudo descargar {entry.path!r}")
+                continue
+
+        repo_files.append(repo_file)
 
     return repo_files
 
 
-def github3_installation_auth(repo: Repo, app_id: int, private_key: bytes):
-    """
+def download_file(session: Session, url: str, path: str) -> RepoFile:
+    """Descarga un archivo en streaming, sin cargarlo entero a memoria.
     """
-    gh3 = github3.GitHub()
-    gh3.login_as_app(private_key, app_id)
-
-    installation = gh3.app_installation_for_repository(repo.owner, repo.name)
-    gh3.login_as_app_installation(private_key, app_id, installation.id)
-
-    return gh3
-
-
-def app_auth(repo_name: str, app_id: int, private_key: str):
-    gh = github.GithubIntegration(app_id, private_key)
-
-    owner, repo = repo_name.split("/")
-    inst = gh.get_installation(owner, repo)
-    inst_auth = gh.get_access_token(inst.id.value)  # type: ignore
-    # error: "_ValuedAttribute" has no attribute "value"
-
-    return github.Github(login_or_token=inst_auth.token)
+    with session.get(url, stream=True) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        return RepoFile.from_stream(path, cast(BinaryIO, resp.raw))
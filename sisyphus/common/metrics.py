@@ -0,0 +1,285 @@
+"""Métricas compartidas en Redis, exportadas en el formato de Prometheus.
+
+Webhook, ingesta y workers corren en muchos procesos (incluso uno por
+trabajo, con fork), así que las métricas no pueden vivir en memoria de un
+único proceso. Cada proceso acumula sus observaciones localmente, y las
+vuelca a Redis (un único pipeline) cada flush_interval segundos, o al
+terminar cada trabajo:
+
+  • contadores:   sisyphus:metrics:c:<nombre>  hash {labels: total}
+  • gauges:       sisyphus:metrics:g:<nombre>  hash {labels: valor}
+  • histogramas:  sisyphus:metrics:h:<nombre>  hash {labels|le: cuenta,
+                                                     labels|sum, labels|count}
+
+render() las lee todas y genera el texto que sirve /metrics. Si no se
+configuró Metrics.default, las funciones del módulo no hacen nada.
+"""
+
+import atexit
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import time
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from redis import Redis
+
+
+__all__ = [
+    "METRICS",
+    "Metrics",
+    "flush",
+    "format_labels",
+    "gauge",
+    "inc",
+    "observe",
+    "render_family",
+    "timer",
+]
+
+# Límites (en segundos) de los buckets de los histogramas.
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Nombre: (tipo, descripción).
+METRICS: Dict[str, Tuple[str, str]] = {
+    "sisyphus_webhook_seconds": (
+        "histogram",
+        "Tiempo de respuesta del webhook, por evento.",
+    ),
+    "sisyphus_webhook_requests_total": (
+        "counter",
+        "Requests al webhook, por evento y status.",
+    ),
+    "sisyphus_webhook_duplicates_total": (
+        "counter",
+        "Webhooks descartados por repetidos, por evento.",
+    ),
+    "sisyphus_queue_wait_seconds": (
+        "histogram",
+        "Tiempo entre que se encola un trabajo y empieza a correr.",
+    ),
+    "sisyphus_jobs_total": ("counter", "Trabajos terminados, por cola y estado."),
+    "sisyphus_stage_seconds": (
+        "histogram",
+        "Duración de cada etapa de la corrección (prepare, fetch, tar, build, "
+        "corrector, convert, publish).",
+    ),
+    "sisyphus_results_total": ("counter", "Check runs publicados, por conclusión."),
+    "sisyphus_github_request_seconds": (
+        "histogram",
+        "Latencia de los requests a la API de GitHub.",
+    ),
+    "sisyphus_github_ratelimit_remaining": (
+        "gauge",
+        "Requests restantes en el rate limit de GitHub (última respuesta).",
+    ),
+    "sisyphus_sheets_refresh_seconds": (
+        "histogram",
+        "Duración de la descarga de las planillas.",
+    ),
+    "sisyphus_sheets_refreshed_timestamp": (
+        "gauge",
+        "Momento (epoch) de la última descarga exitosa de cada planilla.",
+    ),
+}
+
+_KINDS = {"counter": "c", "gauge": "g", "histogram": "h"}
+
+
+class Metrics:
+    """Acumulador local de métricas, volcado periódicamente a Redis.
+
+    Args:
+      connection: conexión a Redis.
+      flush_interval: cada cuántos segundos volcar lo acumulado.
+      prefix: prefijo de las claves en Redis.
+    """
+
+    # Si se configura con use(), las funciones del módulo registran aquí.
+    default: Optional["Metrics"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        flush_interval: float = 5,
+        prefix: str = "sisyphus:metrics",
+    ):
+        self.connection = connection
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush_quietly)
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "Metrics":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    def inc(self, name: str, value: float = 1, **labels):
+        field = format_labels(labels)
+        with self._lock:
+            key = (self._key(name), field)
+            self._increments[key] = self._increments.get(key, 0) + value
+        self._ensure_flusher()
+
+    def observe(self, name: str, value: float, **labels):
+        field = format_labels(labels)
+        idx = bisect.bisect_left(BUCKETS, value)
+        le = str(BUCKETS[idx]) if idx < len(BUCKETS) else "+Inf"
+        key = self._key(name)
+        with self._lock:
+            for suffix, amount in ((le, 1), ("sum", value), ("count", 1)):
+                entry = (key, f"{field}|{suffix}")
+                self._increments[entry] = self._increments.get(entry, 0) + amount
+        self._ensure_flusher()
+
+    def gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(self._key(name), format_labels(labels))] = value
+        self._ensure_flusher()
+
+    def flush(self):
+        """Vuelca a Redis lo acumulado desde el último flush.
+        """
+        with self._lock:
+            increments, self._increments = self._increments, {}
+            gauges, self._gauges = self._gauges, {}
+        if not increments and not gauges:
+            return
+        pipe = self.connection.pipeline(transaction=False)
+        for (key, field), value in increments.items():
+            pipe.hincrbyfloat(key, field, value)
+        for (key, field), value in gauges.items():
+            pipe.hset(key, field, value)
+        pipe.execute()
+
+    def flush_quietly(self):
+        """Como flush(), pero sin propagar errores: las métricas nunca deben
+        afectar el servicio.
+        """
+        try:
+            self.flush()
+        except Exception as ex:
+            logging.getLogger(__name__).debug(f"could not flush metrics: {ex}")
+
+    def render(self) -> str:
+        """Todas las métricas de Redis, en el formato de texto de Prometheus.
+        """
+        pipe = self.connection.pipeline(transaction=False)
+        for name in METRICS:
+            pipe.hgetall(self._key(name))
+        families = []
+
+        for (name, (kind, help_)), data in zip(METRICS.items(), pipe.execute()):
+            data = {k.decode(): float(v) for k, v in data.items()}
+            if kind == "histogram":
+                samples = _histogram_samples(name, data)
+            else:
+                samples = ((name, labels, value) for labels, value in data.items())
+            families.append(render_family(name, kind, help_, samples))
+
+        return "".join(families)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{_KINDS[METRICS[name][0]]}:{name}"
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._increments: Dict[Tuple[str, str], float] = {}
+        self._gauges: Dict[Tuple[str, str], float] = {}
+        self._flusher_pid = None
+
+    def _ensure_flusher(self):
+        """Lanza el thread de flush (uno por proceso, también tras fork).
+        """
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        thread = threading.Thread(
+            target=self._flush_loop, name="metrics flusher", daemon=True
+        )
+        thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush_quietly()
+
+
+def render_family(name: str, kind: str, help_: str, samples: Iterable) -> str:
+    """Una familia de métricas en formato de texto de Prometheus.
+
+    Args:
+      samples: tuplas (serie, labels, valor), con labels ya formateados
+          (ver format_labels); la serie es el nombre, o p.ej. nombre_bucket.
+    """
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} {kind}"]
+    for series, labels, value in samples:
+        value = int(value) if float(value).is_integer() else value
+        lines.append(f"{series}{{{labels}}} {value}" if labels else f"{series} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_samples(name: str, data: Dict[str, float]):
+    by_labels: Dict[str, Dict[str, float]] = {}
+    for field, value in data.items():
+        labels, _, suffix = field.rpartition("|")
+        by_labels.setdefault(labels, {})[suffix] = value
+
+    for labels, values in sorted(by_labels.items()):
+        sep = "," if labels else ""
+        cumulative = 0.0
+        for le in [*BUCKETS, "+Inf"]:
+            cumulative += values.get(str(le), 0)
+            yield f"{name}_bucket", f'{labels}{sep}le="{le}"', cumulative
+        yield f"{name}_sum", labels, values.get("sum", 0)
+        yield f"{name}_count", labels, values.get("count", 0)
+
+
+def format_labels(labels: Dict) -> str:
+    """Formatea labels como en Prometheus: 'a="1",b="2"' (ordenados).
+    """
+    return ",".join(
+        f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())
+    )
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def inc(name: str, value: float = 1, **labels):
+    if (metrics := Metrics.default) is not None:
+        metrics.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    if (metrics := Metrics.default) is not None:
+        metrics.observe(name, value, **labels)
+
+
+def gauge(name: str, value: float, **labels):
+    if (metrics := Metrics.default) is not None:
+        metrics.gauge(name, value, **labels)
+
+
+@contextlib.contextmanager
+def timer(name: str, **labels):
+    """Registra en un histograma la duración del bloque.
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start, **labels)
+
+
+def flush():
+    if (metrics := Metrics.default) is not None:
+        metrics.flush_quietly()
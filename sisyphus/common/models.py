@@ -1,15 +1,25 @@
+import functools
+
+from dataclasses import dataclass, field
 from itertools import islice
 from logging import getLogger
-from typing import ClassVar, List, Sequence, Type
+from typing import Any, ClassVar, Dict, List, Sequence, Tuple, Type
 
 from pydantic import BaseModel, ValidationError
+from pydantic.fields import SHAPE_SINGLETON
 
 
 __all__ = [
     "Model",
+    "ParseReport",
     "parse_rows",
+    "parse_rows_report",
 ]
 
+# Tipos que, si el valor de la celda ya es exactamente de ese tipo, pydantic
+# no transformaría.
+_PLAIN_TYPES = (str, int, float, bool)
+
 
 class Model(BaseModel):
     """Clase base para los objetos leídos de una planilla.
@@ -22,44 +32,156 @@ class Model(BaseModel):
     COLUMNAS: ClassVar[Sequence[str]]
 
 
-def parse_rows(rows: List[List[str]], model: Type[Model]) -> List[Model]:
-    """Construye objetos de una clase modelo a partir de filas de planilla.
+@dataclass
+class ParseReport:
+    """Errores de validación de parse_rows_report(), agregados.
 
-    Argumentos:
-      rows: lista de filas de la hoja. Se asume que la primera fila
-          son los nombres de las columnas.
-      model: Model con que construir los objetos, usando model.COLUMNAS
-          como origen (ordenado) de los atributos.
+    Attributes:
+      rows: cantidad de filas procesadas (sin contar los encabezados).
+      validated: cuántas necesitaron validación completa de pydantic.
+      errors: lista de (número de fila, campos inválidos, atributos).
+    """
+
+    rows: int = 0
+    validated: int = 0
+    errors: List[Tuple[int, Tuple[str, ...], Dict]] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.errors)
+
+    def __str__(self):
+        lines = [f"{len(self.errors)} invalid rows out of {self.rows}:"]
+        lines.extend(
+            f"  row {rownum}: {', '.join(fields)} in {attrs}"
+            for rownum, fields, attrs in self.errors
+        )
+        return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class _ColumnPlan:
+    """Cómo extraer los atributos de un modelo de las filas de una hoja.
+
+    Attributes:
+      columns: tuplas (campo, índice de columna, tipo simple o None), donde el
+          tipo es None si el campo siempre requiere validación completa.
+      nullable: campos que aceptan None sin validación.
+      partial: si el modelo tiene campos fuera de COLUMNAS (con sus defaults).
+    """
+
+    columns: Tuple[Tuple[str, int, Any], ...]
+    nullable: frozenset
+    partial: bool
+
+
+@functools.lru_cache(maxsize=64)
+def _column_plan(model: Type[Model], headers: Tuple) -> _ColumnPlan:
+    fields = model.__fields__
+    config = model.__config__
+    fast_ok = not (
+        model.__pre_root_validators__
+        or model.__post_root_validators__
+        or config.anystr_strip_whitespace
+        or config.min_anystr_length
+        or config.max_anystr_length
+    )
+    columns = []
+    nullable = set()
+
+    for name, column in zip(fields, model.COLUMNAS):
+        mfield = fields[name]
+        simple = (
+            fast_ok
+            and mfield.shape == SHAPE_SINGLETON
+            and mfield.outer_type_ in _PLAIN_TYPES
+            and not mfield.class_validators
+        )
+        columns.append((name, headers.index(column), mfield.type_ if simple else None))
+        if mfield.allow_none:
+            nullable.add(name)
+
+    partial = len(columns) < len(fields)
+    return _ColumnPlan(tuple(columns), frozenset(nullable), partial)
+
+
+def _constructor(model: Type[Model]):
+    """Equivalente a model.construct() cuando attrs incluye todos los campos.
+    """
+    new = model.__new__
+    setattr_ = object.__setattr__
+
+    def construct(**attrs):
+        obj = new(model)
+        setattr_(obj, "__dict__", attrs)
+        setattr_(obj, "__fields_set__", set(attrs))
+        return obj
+
+    return construct
+
+
+def parse_rows_report(
+    rows: List[List[str]], model: Type[Model]
+) -> Tuple[List[Model], ParseReport]:
+    """Igual que parse_rows(), pero devuelve los errores en lugar de registrarlos.
+
+    El plan de columnas se calcula una vez por encabezado. Las filas cuyos
+    valores ya son del tipo exacto de cada campo (o None, si el campo lo
+    admite) se construyen sin validar (Model.construct); el resto pasa por
+    la validación completa de pydantic.
 
     Returns:
-      una lista de los objetos construidos.
+      una tupla (objetos, ParseReport).
     """
-    logger = getLogger(__name__)
-    fields = model.__fields__.keys()
-    indices = []
+    plan = _column_plan(model, tuple(rows[0]))
+    nullable = plan.nullable
+    construct = model.construct if plan.partial else _constructor(model)
+    report = ParseReport()
     objects = []
-    headers = rows[0]
-
-    for field in model.COLUMNAS:
-        indices.append(headers.index(field))
 
-    for row in islice(rows, 1, None):
-        attrs = {field: _safeidx(row, idx) for field, idx in zip(fields, indices)}
+    for rownum, row in enumerate(islice(rows, 1, None), start=2):
+        rowlen = len(row)
+        attrs: Dict[str, Any] = {}
+        clean = True
+
+        for name, idx, typ in plan.columns:
+            value = None if idx >= rowlen or row[idx] == "" else row[idx]
+            attrs[name] = value
+            if clean and (
+                typ is None
+                or (value is None and name not in nullable)
+                or (value is not None and type(value) is not typ)
+            ):
+                clean = False
+
+        report.rows += 1
+        if clean:
+            objects.append(construct(**attrs))
+            continue
+
+        report.validated += 1
         try:
             objects.append(model.parse_obj(attrs))
         except ValidationError as ex:
-            errors = ex.errors()
-            failed = ", ".join(e["loc"][0] for e in errors)
-            logger.warn(ex)
-            logger.warn(f"ValidationError: {failed} in {attrs}")
+            failed = tuple(str(e["loc"][0]) for e in ex.errors())
+            report.errors.append((rownum, failed, attrs))
+
+    return objects, report
 
-    return objects
 
+def parse_rows(rows: List[List[str]], model: Type[Model]) -> List[Model]:
+    """Construye objetos de una clase modelo a partir de filas de planilla.
 
-def _safeidx(lst, i):
-    """Devuelve el índice i-ésimo (columna i-ésima)d e una lista (fila).
+    Argumentos:
+      rows: lista de filas de la hoja. Se asume que la primera fila
+          son los nombres de las columnas.
+      model: Model con que construir los objetos, usando model.COLUMNAS
+          como origen (ordenado) de los atributos.
 
-    Si la lista no tiene el tamaño suficiente, o contiene la cadena vacía,
-    se devuelve None.
+    Returns:
+      una lista de los objetos construidos. Las filas inválidas se omiten,
+      y se registran todas juntas en un único warning.
     """
-    return None if i >= len(lst) or lst[i] == "" else lst[i]
+    objects, report = parse_rows_report(rows, model)
+    if report:
+        getLogger(__name__).warn(f"ValidationError in {model.__name__}: {report}")
+    return objects
@@ -1,19 +1,45 @@
+import json
+import logging
+import os
+import random
 import threading
+import time
 
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from googleapiclient import discovery  # type: ignore
 
+from . import metrics
+
 
 __all__ = ["Config", "PullDB"]
 
 
 @dataclass
 class Config:
+    """Configuración de PullDB.
+
+    Args:
+      refresh_interval: si se especifica, los datos se actualizan en
+          segundo plano cada tantos segundos (± refresh_jitter, como
+          fracción), y mientras tanto se sirven los anteriores.
+      snapshot_path: archivo donde guardar la última descarga exitosa; al
+          arrancar, se sirven esos datos hasta completar la primera descarga.
+
+    En ambos casos, una descarga en segundo plano que falla se reintenta
+    con backoff exponencial (desde retry_min hasta retry_max segundos, o
+    refresh_interval si es menor).
+    """
+
     spreadsheet_id: str
     credentials: Dict
     sheet_list: List[str]
+    refresh_interval: Optional[float] = None
+    refresh_jitter: float = 0.1
+    snapshot_path: Optional[str] = None
+    retry_min: float = 5
+    retry_max: float = 300
 
 
 class PullDB:
@@ -23,8 +49,15 @@ class PullDB:
     def __init__(self, cfg: Config, /, *, initial_fetch=False):
         self._cfg = cfg
         self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._service = None
+        self._fetched_at = 0.0
+        self._refresher_pid = None
         self.__data = None
 
+        if cfg.snapshot_path:
+            self._load_snapshot()
+
         if initial_fetch:
             self.refresh()
 
@@ -32,11 +65,22 @@ class PullDB:
     def data(self):
         return self.get()
 
-    def get(self, *, refresh=False):
+    @property
+    def loaded(self) -> bool:
+        """Indica si hay datos (descargados o de snapshot), sin descargarlos.
         """
+        return self.__data is not None
+
+    def get(self, *, refresh=False):
+        """Devuelve los datos, descargándolos solo si no hay ninguno.
+
+        Con refresh_interval, los datos viejos se sirven igual, y se
+        actualizan en segundo plano (stale-while-revalidate).
         """
         if refresh or self.__data is None:
             self.refresh()
+        if self._cfg.refresh_interval is not None or self._fetched_at < 0:
+            self._ensure_refresher()
         return self.__data
 
     def refresh(self):
@@ -44,25 +88,112 @@ class PullDB:
 
         Si ya habían sido descargadas, se remplazan los datos anteriores con los nuevos.
         """
-        service = discovery.build("sheets", "v4", credentials=self._cfg.credentials)
-        spreadsheets = service.spreadsheets()
-        query = spreadsheets.values().batchGet(
-            spreadsheetId=self._cfg.spreadsheet_id,
-            ranges=self._cfg.sheet_list,
-            valueRenderOption="UNFORMATTED_VALUE",
-        )
-        result = query.execute()
-        sheets = parse_sheets(result["valueRanges"])
-        new_data = self.parse_sheets(sheets)
-        if new_data is not None:
-            with self._lock:
-                self.__data = new_data
+        with self._refresh_lock:
+            if self._service is None:
+                # El documento de discovery se obtiene una sola vez.
+                self._service = discovery.build(
+                    "sheets",
+                    "v4",
+                    credentials=self._cfg.credentials,
+                    cache_discovery=False,
+                )
+            spreadsheets = self._service.spreadsheets()
+            query = spreadsheets.values().batchGet(
+                spreadsheetId=self._cfg.spreadsheet_id,
+                ranges=self._cfg.sheet_list,
+                valueRenderOption="UNFORMATTED_VALUE",
+            )
+            spreadsheet = self._cfg.spreadsheet_id
+            with metrics.timer("sisyphus_sheets_refresh_seconds"):
+                result = query.execute()
+            sheets = parse_sheets(result["valueRanges"])
+            if self._update(sheets):
+                metrics.gauge(
+                    "sisyphus_sheets_refreshed_timestamp",
+                    time.time(),
+                    spreadsheet=spreadsheet,
+                )
+                if self._cfg.snapshot_path:
+                    self._save_snapshot(sheets)
 
     def parse_sheets(self, sheet_dict):
         """
         """
         raise NotImplementedError
 
+    def _update(self, sheets) -> bool:
+        new_data = self.parse_sheets(sheets)
+        if new_data is None:
+            return False
+        with self._lock:
+            self.__data = new_data
+            self._fetched_at = time.monotonic()
+        return True
+
+    def _ensure_refresher(self):
+        """Lanza el thread de actualización (uno por proceso, también tras fork).
+        """
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        thread = threading.Thread(
+            target=self._refresh_loop, name="PullDB refresher", daemon=True
+        )
+        thread.start()
+
+    def _refresh_loop(self):
+        logger = logging.getLogger(__name__)
+        if (interval := self._cfg.refresh_interval) is None:
+            # Sin intervalo: solo reemplazar los datos del snapshot.
+            interval = float("inf")
+        retry = self._cfg.retry_min
+        while True:
+            age = time.monotonic() - self._fetched_at
+            if age >= interval:
+                try:
+                    self.refresh()
+                except Exception as ex:
+                    logger.warning(
+                        f"could not refresh {self._cfg.sheet_list} "
+                        f"(retrying in {retry:g}s): {ex}"
+                    )
+                    time.sleep(retry)
+                    retry = min(retry * 2, self._cfg.retry_max, interval)
+                    continue
+                retry = self._cfg.retry_min
+                age = 0
+            if interval == float("inf"):
+                return
+            jitter = random.uniform(-1, 1) * self._cfg.refresh_jitter * interval
+            time.sleep(max(interval - age + jitter, 1))
+
+    def _load_snapshot(self):
+        logger = logging.getLogger(__name__)
+        try:
+            with open(self._cfg.snapshot_path) as snapshot:
+                sheets = json.load(snapshot)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            logger.warning(f"ignoring snapshot {self._cfg.snapshot_path}: {ex}")
+            return
+        if self._update(sheets):
+            # Datos servibles, pero a actualizar en cuanto se pueda.
+            self._fetched_at = -float("inf")
+
+    def _save_snapshot(self, sheets):
+        """Guarda la descarga de manera atómica (archivo temporal y rename).
+        """
+        path = self._cfg.snapshot_path
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as snapshot:
+                json.dump(sheets, snapshot)
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            logging.getLogger(__name__).warning(f"could not save {path}: {ex}")
+
 
 def parse_sheets(sheet_ranges: List[Dict]) -> Dict[str, List[List[str]]]:
     """Segrega por hoja la lista de rango/valores obtenidos.
@@ -0,0 +1,156 @@
+"""Trazas de una entrega, desde el webhook hasta el check run publicado.
+
+Cada evento de check suite recibe un trace id en el webhook, que viaja en
+el IngestJob, en el CorregirJob y en job.meta["trace_id"] de rq. Cada etapa
+(webhook, enqueue, dequeue, fetch, tar, corrector, convert, publish, ...)
+registra un span con su inicio y duración, en una lista de Redis por traza:
+
+  sisyphus:trace:<trace_id>   [{"name": ..., "start": ..., "duration": ...,
+                                "attrs": {...}}, ...]
+
+Las trazas se consultan con la herramienta trace; opcionalmente
+(check_summary), se resumen además al final del output de cada check run,
+que ven los alumnos. Si no se configuró Tracer.default, o el trabajo no
+tiene trace id, las funciones del módulo no hacen nada.
+"""
+
+import contextlib
+import dataclasses
+import datetime
+import json
+import time
+import uuid
+
+from typing import Dict, List, Optional
+
+from redis import Redis
+
+
+__all__ = [
+    "Span",
+    "Tracer",
+    "new_trace_id",
+    "record",
+    "span",
+    "summary_markdown",
+]
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    attrs: Dict = dataclasses.field(default_factory=dict)
+
+
+class Tracer:
+    """Guarda y lee los spans de las trazas en Redis.
+
+    Args:
+      connection: conexión a Redis.
+      ttl: tiempo que se conserva cada traza.
+      check_summary: si agregar el resumen de la traza al output de los
+          check runs (por omisión, solo se consulta con la herramienta trace).
+      prefix: prefijo de las claves en Redis.
+    """
+
+    # Si se configura con use(), las funciones del módulo registran aquí.
+    default: Optional["Tracer"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        ttl: datetime.timedelta = datetime.timedelta(days=7),
+        check_summary: bool = False,
+        prefix: str = "sisyphus:trace",
+    ):
+        self.connection = connection
+        self.ttl = ttl
+        self.check_summary = check_summary
+        self.prefix = prefix
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "Tracer":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    def record(self, trace_id: str, name: str, start: float, end: float, **attrs):
+        """Agrega un span a la traza (start y end en segundos desde epoch).
+        """
+        data = dataclasses.asdict(Span(name, start, end - start, attrs))
+        key = self._key(trace_id)
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.rpush(key, json.dumps(data))
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def spans(self, trace_id: str) -> List[Span]:
+        """Los spans de una traza, ordenados por inicio.
+        """
+        data = self.connection.lrange(self._key(trace_id), 0, -1)
+        spans = [Span(**json.loads(item)) for item in data]
+        return sorted(spans, key=lambda s: s.start)
+
+    def export(self, trace_id: str) -> Dict:
+        """La traza completa como diccionario (para exportar a JSON).
+        """
+        return dict(
+            trace_id=trace_id,
+            spans=[dataclasses.asdict(span) for span in self.spans(trace_id)],
+        )
+
+    def _key(self, trace_id: str) -> str:
+        return f"{self.prefix}:{trace_id}"
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def record(trace_id: Optional[str], name: str, start: float, end=None, **attrs):
+    """Registra un span ya medido (end por omisión: ahora).
+    """
+    if trace_id is None or (tracer := Tracer.default) is None:
+        return
+    try:
+        tracer.record(trace_id, name, start, end or time.time(), **attrs)
+    except Exception:
+        # Una traza incompleta nunca debe afectar la corrección.
+        pass
+
+
+@contextlib.contextmanager
+def span(trace_id: Optional[str], name: str, **attrs):
+    """Registra un span con la duración del bloque.
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        record(trace_id, name, start, **attrs)
+
+
+def summary_markdown(trace_id: str, spans: List[Span]) -> str:
+    """Resumen de una traza para el output del check run (plegado).
+    """
+    if not spans:
+        return ""
+    origin = spans[0].start
+    lines = [
+        "<details><summary>Tiempos de la corrección</summary>",
+        "",
+        f"Traza `{trace_id}`",
+        "",
+        "| etapa | inicio | duración |",
+        "|---|---:|---:|",
+    ]
+    for s in spans:
+        name = s.name
+        if detail := s.attrs.get("check") or s.attrs.get("queue"):
+            name = f"{name} ({detail})"
+        lines.append(f"| {name} | +{s.start - origin:.2f}s | {s.duration:.2f}s |")
+    lines.append("")
+    lines.append("</details>")
+    return "\n".join(lines)
@@ -1,13 +1,20 @@
+import io
 import json
+import os
+import shutil
+import tempfile
 
 from dataclasses import dataclass, field
-from typing import Optional
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Union
 
 from github.Repository import Repository as PyGithubRepo
-from pydantic import BaseModel, SecretStr
+from pydantic import BaseModel, Field, SecretStr
+from pydantic.dataclasses import dataclass as pydantic_dataclass
 
 
 __all__ = [
+    "Check",
     "PyGithubRepo",
     "Repo",
     "RepoFile",
@@ -24,12 +31,128 @@ class Repo:
         self.owner, self.name = self.full_name.split("/", 1)
 
 
-@dataclass
+# Tamaño a partir del cual el contenido de un RepoFile se guarda en disco.
+SPILL_THRESHOLD = 1 << 20
+
+
 class RepoFile:
+    """Archivo de un repositorio (entrega o tests), con ruta relativa y modo.
+
+    El contenido puede estar en memoria (si es chico), en un archivo
+    temporal (si supera SPILL_THRESHOLD), o en un archivo local que se lee
+    recién al usarlo (from_disk). En todos los casos se accede a él en
+    streaming con open(); el atributo contents lo lee entero a memoria.
+    """
+
     # TODO: add mtime (optional)
-    path: str
-    contents: bytes
-    mode: int = 0o644
+    __slots__ = ("path", "mode", "size", "_data")
+
+    def __init__(self, path: str, contents: bytes, mode: int = 0o644):
+        self.path = path
+        self.mode = mode
+        self.size = len(contents)
+        self._data: Union[bytes, _SpilledData, str] = (
+            contents if self.size <= SPILL_THRESHOLD else _SpilledData(contents)
+        )
+
+    @classmethod
+    def from_stream(cls, path: str, fileobj: BinaryIO, mode: int = 0o644):
+        """Construye un RepoFile copiando un stream, sin leerlo entero a memoria.
+        """
+        head = fileobj.read(SPILL_THRESHOLD + 1)
+        if len(head) <= SPILL_THRESHOLD:
+            return cls(path, head, mode)
+        repo_file = cls(path, b"", mode)
+        repo_file._data = spilled = _SpilledData(head, fileobj)
+        repo_file.size = spilled.size
+        return repo_file
+
+    @classmethod
+    def from_disk(cls, path: str, disk_path: str, mode: int = 0o644, size=None):
+        """Construye un RepoFile respaldado por un archivo local.
+        """
+        repo_file = cls(path, b"", mode)
+        repo_file._data = str(disk_path)
+        repo_file.size = os.stat(disk_path).st_size if size is None else size
+        return repo_file
+
+    @property
+    def contents(self) -> bytes:
+        with self.open() as fileobj:
+            return fileobj.read()
+
+    def open(self) -> BinaryIO:
+        """Devuelve un archivo (binario, de solo lectura) con el contenido.
+
+        Se puede llamar desde varios threads a la vez: cada llamada devuelve
+        un archivo independiente.
+        """
+        if isinstance(self._data, bytes):
+            return io.BytesIO(self._data)
+        elif isinstance(self._data, str):
+            return open(self._data, "rb")
+        return self._data.open()
+
+    def __eq__(self, other):
+        if not isinstance(other, RepoFile):
+            return NotImplemented
+        return (self.path, self.mode, self.contents) == (
+            other.path,
+            other.mode,
+            other.contents,
+        )
+
+    def __repr__(self):
+        return f"RepoFile(path={self.path!r}, size={self.size}, mode={self.mode:o})"
+
+    def __getstate__(self):
+        # Los archivos (temporales o locales) no se serializan: se los lee.
+        return self.path, self.contents, self.mode
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+class _SpilledData:
+    """Contenido de un RepoFile guardado en un archivo temporal (anónimo).
+
+    Las lecturas usan os.pread(), por lo que varios lectores pueden compartir
+    el mismo descriptor sin interferir entre sí.
+    """
+
+    __slots__ = ("_file", "size")
+
+    def __init__(self, head: bytes, rest: Optional[BinaryIO] = None):
+        self._file = tempfile.TemporaryFile()
+        self._file.write(head)
+        if rest is not None:
+            shutil.copyfileobj(rest, self._file)
+        self._file.flush()
+        self.size = self._file.tell()
+
+    def open(self) -> BinaryIO:
+        return io.BufferedReader(_PReadRaw(self._file.fileno(), self.size))
+
+
+class _PReadRaw(io.RawIOBase):
+    """Lector de un descriptor con posición propia (os.pread).
+    """
+
+    def __init__(self, fd: int, size: int):
+        self._fd = fd
+        self._size = size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf) -> int:
+        if self._pos >= self._size:
+            return 0
+        data = os.pread(self._fd, min(len(buf), self._size - self._pos), self._pos)
+        buf[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
 
 
 class AppInstallationTokenAuth(BaseModel):
@@ -56,13 +179,78 @@ class AppInstallationTokenAuth(BaseModel):
         return json.loads(self.json())
 
 
+@pydantic_dataclass
+class Check:
+    """Clase que representa una corrección (un check run).
+
+    Args:
+      • name: nombre visible en Github, por ejemplo "Pruebas datalab"
+      • alu_files: lista de archivos a corregir, por ejemplo ["bits.c"]. (Si
+            no se especifica, se usan todos los archivos en Entrega.alu_dir.)
+      • test_files: ídem, con los archivos que componen los tests.
+      • build_stage: si compilar primero la entrega (CORRECTOR_BIN --build-only),
+            publicando de inmediato si no compila, sin correr las pruebas.
+            El corrector debe salir entonces con estado BUILD_FAILED (65).
+    """
+
+    name: str
+    alu_files: Optional[List[Path]] = None
+    test_files: Optional[List[Path]] = None
+    build_stage: bool = False
+
+
 class CorregirJob(BaseModel):
+    """Trabajo de corrección de una entrega, tal y como se encola para el worker.
+
+    Todos los checks de la entrega se corrigen a partir de una única descarga
+    de los archivos; cada uno publica su propio check run.
+
+    Args:
+      • alu_dir: subdirectorio del repositorio con los archivos de la entrega.
+      • checks: los checks a correr, indexados por su identificador.
+      • checkrun_ids: id del check run (ya creado) de cada check, si lo hay.
+      • trace_id: id de la traza de la entrega (ver common.tracing).
+      • supersedable: si un push más nuevo de la rama cancela el trabajo
+        (no en los pedidos de volver a correr, que pueden ser de un commit
+        viejo a propósito).
+    """
+
     repo: Repo
     materia: str
     head_sha: str
     head_branch: str
+    alu_dir: str
     installation_auth: AppInstallationTokenAuth
-    checkrun_id: Optional[int] = None
+    checks: Dict[str, Check] = Field(default_factory=dict)
+    checkrun_ids: Dict[str, int] = Field(default_factory=dict)
+    trace_id: Optional[str] = None
+    supersedable: bool = True
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class IngestJob(BaseModel):
+    """Evento de check suite ya filtrado por el webhook, pendiente de ingesta.
+
+    El webhook solo mira el payload; la etapa de ingesta hace todo lo que
+    requiere la red (planilla de repos, token de instalación, creación de
+    los check runs) y encola el CorregirJob.
+    """
+
+    repo: Repo
+    head_sha: str
+    head_branch: str
+    installation_id: int
+    priority: bool = False
+    trace_id: Optional[str] = None
+    # Commit anterior de la rama, si el evento es un push; None en los pedidos
+    # de volver a correr, cuyo commit puede no ser el último de la rama.
+    before: Optional[str] = None
+    # Webhook que originó el evento (ver app.dedup): si la ingesta falla, se
+    # libera, para que GitHub pueda reenviarlo.
+    delivery_id: Optional[str] = None
+    kind: str = "check_suite"
 
     class Config:
         arbitrary_types_allowed = True
@@ -0,0 +1,160 @@
+"""Formato de encolado de CorregirJob: JSON compacto y versionado.
+
+Encolar el CorregirJob tal cual obliga a rq a hacer pickle del modelo de
+pydantic entero (con sus __fields_set__, el dataclass Repo, SecretStr...):
+el resultado es grande, lento de cargar, y se rompe si el modelo cambia en
+medio de un deploy. En su lugar, se encolan los bytes de encode_job():
+
+  {"v": 1, "r": repo, "m": materia, "s": head_sha, "b": head_branch,
+   "d": alu_dir, "t": token, "e": expires_at,
+   "c": {check_id: {"n": name, "a": alu_files, "t": test_files,
+                    "b": build_stage}},
+   "k": {check_id: checkrun_id}, "x": trace_id, "u": supersedable}
+
+donde se omiten los campos con su valor por omisión. Reglas de evolución:
+
+  • agregar un campo opcional no cambia la versión: decode_job() ignora las
+    claves que no conoce, así que un worker viejo puede correr el trabajo;
+
+  • un cambio incompatible sube WIRE_VERSION, y decode_job() sigue
+    aceptando las versiones anteriores (y el CorregirJob con pickle).
+"""
+
+import functools
+import json
+
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from pydantic import SecretStr
+
+from .typ import AppInstallationTokenAuth, Check, CorregirJob, Repo
+
+
+__all__ = [
+    "WIRE_VERSION",
+    "WireFormatError",
+    "decode_job",
+    "encode_job",
+]
+
+WIRE_VERSION = 1
+
+
+class WireFormatError(ValueError):
+    """El trabajo encolado tiene una versión (o forma) desconocida.
+    """
+
+
+def encode_job(job: CorregirJob) -> bytes:
+    """Serializa un CorregirJob en el formato de encolado.
+    """
+    auth = job.installation_auth
+    data = {
+        "v": WIRE_VERSION,
+        "r": job.repo.full_name,
+        "m": job.materia,
+        "s": job.head_sha,
+        "b": job.head_branch,
+        "d": job.alu_dir,
+        "t": auth.token.get_secret_value(),
+        "e": auth.expires_at,
+    }
+    if job.checks:
+        data["c"] = {key: _encode_check(check) for key, check in job.checks.items()}
+    if job.checkrun_ids:
+        data["k"] = job.checkrun_ids
+    if job.trace_id is not None:
+        data["x"] = job.trace_id
+    if not job.supersedable:
+        data["u"] = False
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def decode_job(data: Union[bytes, CorregirJob]) -> CorregirJob:
+    """Reconstruye un CorregirJob de cualquier versión del formato.
+
+    Acepta también un CorregirJob ya construido (encolado con pickle, por
+    un productor anterior a este formato); si es de la forma original (sin
+    alu_dir ni checks, con un único checkrun_id), se lo completa.
+    """
+    if isinstance(data, CorregirJob):
+        return _upgrade_pickled(data)
+    try:
+        attrs = json.loads(data)
+        version = attrs["v"]
+    except (ValueError, TypeError, KeyError) as ex:
+        raise WireFormatError(f"not a queued job: {ex}") from ex
+    if (decoder := _DECODERS.get(version)) is None:
+        raise WireFormatError(f"unknown job wire version {version}")
+    return decoder(attrs)
+
+
+def _decode_v1(attrs: Dict) -> CorregirJob:
+    # Los valores vienen de encode_job(): se construye sin validar.
+    checks = {key: _decode_check(**c) for key, c in attrs.get("c", {}).items()}
+    return CorregirJob.construct(
+        repo=Repo(attrs["r"]),
+        materia=attrs["m"],
+        head_sha=attrs["s"],
+        head_branch=attrs["b"],
+        alu_dir=attrs["d"],
+        installation_auth=AppInstallationTokenAuth.construct(
+            token=SecretStr(attrs["t"]), expires_at=attrs["e"]
+        ),
+        checks=checks,
+        checkrun_ids={key: int(i) for key, i in attrs.get("k", {}).items()},
+        trace_id=attrs.get("x"),
+        supersedable=attrs.get("u", True),
+    )
+
+
+def _upgrade_pickled(job: CorregirJob) -> CorregirJob:
+    # pickle restaura __dict__ sin validar: en un CorregirJob de la forma
+    # original faltan los campos nuevos, y sobra checkrun_id.
+    attrs = dict(job.__dict__)
+    if attrs.keys() >= CorregirJob.__fields__.keys() and "checkrun_id" not in attrs:
+        return job
+    checkrun_id = attrs.pop("checkrun_id", None)
+    # La entrega estaba en el subdirectorio de igual nombre que la rama, y
+    # su único check (el por omisión) se indexa también por la rama.
+    attrs.setdefault("alu_dir", attrs["head_branch"])
+    if checkrun_id is not None:
+        attrs.setdefault("checkrun_ids", {attrs["head_branch"]: checkrun_id})
+    return CorregirJob.construct(**attrs)
+
+
+_DECODERS = {
+    1: _decode_v1,
+}
+
+
+def _encode_check(check: Check) -> Dict:
+    data: Dict[str, Any] = {"n": check.name}
+    if check.alu_files is not None:
+        data["a"] = [str(path) for path in check.alu_files]
+    if check.test_files is not None:
+        data["t"] = [str(path) for path in check.test_files]
+    if check.build_stage:
+        data["b"] = True
+    return data
+
+
+def _decode_check(n: str, a=None, t=None, b=False, **_unknown) -> Check:
+    return _build_check(n, _tuple(a), _tuple(t), b)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_check(name, alu_files, test_files, build_stage) -> Check:
+    """Los checks se repiten entre trabajos: se construye cada uno una vez.
+    """
+    return Check(
+        name=name,
+        alu_files=[Path(p) for p in alu_files] if alu_files is not None else None,
+        test_files=[Path(p) for p in test_files] if test_files is not None else None,
+        build_stage=build_stage,
+    )
+
+
+def _tuple(paths):
+    return tuple(paths) if paths is not None else None
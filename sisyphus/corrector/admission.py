@@ -0,0 +1,227 @@
+"""Control de admisión de correcciones concurrentes por host.
+
+Cada corrección compila y corre las pruebas de una entrega; si hay más
+correcciones simultáneas que cores, todas se vuelven más lentas y empiezan
+a vencer los timeouts. AdmissionController limita la cantidad de
+correcciones en curso en el host, sin importar cuántos workers (o procesos
+de un mismo worker) haya:
+
+  • la capacidad es el mínimo entre CPUs (sched_getaffinity) y memoria
+    total dividida por la memoria estimada de una corrección; depende solo
+    del host, así que todos sus workers calculan la misma. Además, no se
+    admite una corrección si la memoria disponible (MemAvailable) no
+    alcanza y ya hay otra en curso;
+
+  • cada slot es un archivo de lock (flock) en un directorio compartido por
+    todos los workers del host, de modo que un slot se libera solo si su
+    proceso muere; el archivo contiene el pid que lo retiene;
+
+  • opcionalmente, cada slot tiene asignado un conjunto de cores, y la
+    corrección corre fijada a ellos.
+"""
+
+import asyncio
+import contextlib
+import fcntl
+import logging
+import os
+import pathlib
+import time
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+
+__all__ = [
+    "AdmissionController",
+    "DEFAULT_SLOTS_DIR",
+    "Slot",
+]
+
+DEFAULT_SLOTS_DIR = "/tmp/sisyphus-slots"
+
+
+@dataclass(frozen=True)
+class Slot:
+    index: int
+    cpus: FrozenSet[int]
+
+
+class AdmissionController:
+    """Semáforo de correcciones por host, basado en archivos de lock.
+
+    Args:
+      slots_dir: directorio (local al host) con los archivos de lock.
+      max_slots: tope explícito de correcciones simultáneas.
+      mem_per_run: memoria estimada de una corrección, en bytes.
+      pin_cpus: si fijar cada corrección a los cores de su slot.
+    """
+
+    def __init__(
+        self,
+        slots_dir: str = DEFAULT_SLOTS_DIR,
+        *,
+        max_slots: Optional[int] = None,
+        mem_per_run: int = 512 << 20,
+        pin_cpus: bool = False,
+    ):
+        self.slots_dir = pathlib.Path(slots_dir)
+        self.slots_dir.mkdir(parents=True, exist_ok=True)
+        self.mem_per_run = mem_per_run
+        self.pin_cpus = pin_cpus
+        self.logger = logging.getLogger(__name__)
+
+        cpus = sorted(os.sched_getaffinity(0))
+        by_mem = max(1, mem_total() // mem_per_run)
+        self.capacity = max(1, min(len(cpus), by_mem, max_slots or len(cpus)))
+        self.cpu_sets = split_cpus(cpus, self.capacity)
+
+    @contextlib.contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Context manager que espera un slot libre y lo retiene.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.05
+        while (acquired := self._try_acquire()) is None:
+            if delay == 0.05:
+                self.logger.info("all corrector slots busy, waiting")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("no corrector slot available")
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        slot, lockfile = acquired
+        try:
+            yield slot
+        finally:
+            _release(lockfile)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self):
+        """Versión asyncio de slot().
+        """
+        delay = 0.05
+        while (acquired := self._try_acquire()) is None:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        slot, lockfile = acquired
+        try:
+            yield slot
+        finally:
+            _release(lockfile)
+
+    def pin(self, pid: int, slot: Slot):
+        """Fija un proceso ya lanzado (corrector o proceso persistente).
+        """
+        if self.pin_cpus:
+            try:
+                os.sched_setaffinity(pid, slot.cpus)
+            except ProcessLookupError:
+                # Ya terminó.
+                pass
+
+    def usage(self) -> Dict:
+        """Devuelve el uso actual de slots en el host.
+
+        Returns:
+          un diccionario con "capacity", "used", y "slots": una lista con el
+          pid que retiene cada slot (o None si está libre).
+
+        Se lee el pid escrito en cada archivo, sin tomar el lock: un lock
+        compartido, aunque breve, haría fallar un intento de adquirir el
+        slot. Si el proceso murió sin liberar el slot, su pid ya no existe.
+        """
+        holders: List[Optional[int]] = []
+        for index in range(self.capacity):
+            pid = _read_pid(self._lock_path(index))
+            holders.append(pid if pid is not None and _pid_alive(pid) else None)
+        return dict(
+            capacity=self.capacity,
+            used=sum(pid is not None for pid in holders),
+            slots=holders,
+        )
+
+    def _try_acquire(self):
+        if mem_available() < self.mem_per_run and self.usage()["used"] > 0:
+            # Sin memoria para otra corrección: esperar a que termine alguna.
+            return None
+        for index in range(self.capacity):
+            lockfile = open(self._lock_path(index), "a+")
+            try:
+                fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lockfile.close()
+                continue
+            lockfile.truncate(0)
+            lockfile.write(f"{os.getpid()}\n")
+            lockfile.flush()
+            return Slot(index, self.cpu_sets[index]), lockfile
+        return None
+
+    def _lock_path(self, index: int) -> pathlib.Path:
+        return self.slots_dir / f"slot-{index}.lock"
+
+
+def split_cpus(cpus: List[int], parts: int) -> List[FrozenSet[int]]:
+    """Reparte una lista de CPUs en tantos conjuntos disjuntos como parts.
+    """
+    size, extra = divmod(len(cpus), parts)
+    sets = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(frozenset(cpus[start:end]))
+        start = end
+    return sets
+
+
+def mem_total() -> int:
+    """Memoria total del host según /proc/meminfo (MemTotal).
+    """
+    if (total := _meminfo("MemTotal:")) is None:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return total
+
+
+def mem_available() -> int:
+    """Memoria disponible en el host según /proc/meminfo (MemAvailable).
+    """
+    if (available := _meminfo("MemAvailable:")) is None:
+        available = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    return available
+
+
+def _meminfo(field: str) -> Optional[int]:
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _release(lockfile):
+    """Libera un slot, borrando antes el pid para que usage() lo vea libre.
+    """
+    try:
+        lockfile.truncate(0)
+    finally:
+        lockfile.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_pid(path: pathlib.Path) -> Optional[int]:
+    try:
+        return int(path.read_text().strip() or 0) or None
+    except (OSError, ValueError):
+        return None
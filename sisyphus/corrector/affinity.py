@@ -0,0 +1,301 @@
+"""Afinidad de trabajos con los nodos que tienen los tests de su materia.
+
+Cada nodo (host de workers) tiene en disco los tests de algunas materias
+(TEST_PATHS, configurable con worker --tests), y los anuncia en Redis junto
+con su "temperatura": cuándo corrigió por última vez cada entrega (y por
+tanto, cuán probable es que tenga en caché los tests y las entregas):
+
+  sisyphus:nodes:<nodo>        {"materias": {materia: [entrega, ...]}}
+                               (expira si el nodo deja de anunciarse)
+  sisyphus:nodes:<nodo>:warm   hash {materia/entrega: epoch}
+
+Al encolar, route() elige entre los nodos que pueden corregir la entrega
+el más caliente cuya cola propia (<cola>@<nodo>) no esté llena; si todos lo
+están, usa la cola compartida de la materia (<cola>:<materia>), que leen
+todos los nodos capaces. Un nodo nunca lee las colas de materias que no
+tiene; si desencola de una cola común (<cola>, prioridad, overflow) un
+trabajo que no puede correr, lo devuelve a la cola de su materia, siempre
+que algún nodo vivo pueda correrlo (si no, quedaría allí para siempre: se
+corre igual, y falla a la vista en el registro de rq).
+
+La cola propia de un nodo solo la lee ese nodo. Si el nodo muere (o se lo
+saca de servicio), su anuncio expira, y el primer nodo vivo que lo note
+devuelve los trabajos que quedaron en su cola a la cola común (<cola>), de
+donde los toma un nodo capaz (ver reap()). La cola de prioridad se lee
+siempre antes que la propia del nodo.
+"""
+
+import json
+import logging
+import pathlib
+import socket
+import time
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from redis import Redis
+from rq.exceptions import NoSuchJobError  # type: ignore
+from rq.job import Job  # type: ignore
+from rq.queue import Queue  # type: ignore
+
+from ..common.typ import CorregirJob
+from ..common.wire import decode_job
+from .fairshare import OVERFLOW, PRIORITY
+
+
+__all__ = [
+    "Affinity",
+]
+
+
+class Affinity:
+    """Anuncio de las materias de cada nodo, y ruteo de trabajos a nodos.
+
+    Args:
+      connection: conexión a Redis.
+      node: nombre de este nodo (por omisión, el hostname).
+      tests: directorio de tests de cada materia en este nodo; cada
+          subdirectorio es una entrega (solo en los workers).
+      bases: colas cuyos trabajos se rutean a nodos.
+      max_backlog: trabajos en la cola de un nodo antes de pasar al siguiente.
+      ttl: segundos que dura un anuncio; el worker lo renueva antes.
+      prefix: prefijo de las claves en Redis.
+    """
+
+    # Si se configura con use(), los workers se anuncian y leen su cola.
+    default: Optional["Affinity"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        node: Optional[str] = None,
+        tests: Optional[Mapping[str, pathlib.Path]] = None,
+        bases: Iterable[str] = (),
+        max_backlog: int = 2,
+        ttl: int = 30,
+        prefix: str = "sisyphus:nodes",
+    ):
+        self.connection = connection
+        self.node = node or socket.gethostname()
+        self.tests = tests or {}
+        self.bases = set(bases)
+        self.max_backlog = max_backlog
+        self.ttl = ttl
+        self.prefix = prefix
+        self._advertised = 0.0
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "Affinity":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    # Lado del worker.
+
+    def entregas(self) -> Dict[str, List[str]]:
+        """Las entregas de cada materia con tests en este nodo.
+        """
+        served = {}
+        for materia, tests_dir in self.tests.items():
+            if tests_dir.is_dir():
+                served[materia] = sorted(
+                    entry.name for entry in tests_dir.iterdir() if entry.is_dir()
+                )
+        return served
+
+    def can_serve(self, materia: str, entrega: str) -> bool:
+        tests_dir = self.tests.get(materia)
+        return tests_dir is not None and (tests_dir / entrega).is_dir()
+
+    def advertise(self, *, force: bool = False):
+        """Anuncia (o renueva) las materias del nodo, si pasó un tercio del ttl.
+        """
+        if not force and time.monotonic() - self._advertised < self.ttl / 3:
+            return
+        data = json.dumps(dict(materias=self.entregas()))
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.set(self._node_key(self.node), data, ex=self.ttl)
+        pipe.sadd(self.prefix, self.node)
+        pipe.execute()
+        self._advertised = time.monotonic()
+
+    def warm(self, materia: str, entrega: str):
+        """Registra que el nodo acaba de corregir una entrega.
+        """
+        key = self._warm_key(self.node)
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hset(key, f"{materia}/{entrega}", time.time())
+        pipe.expire(key, 86400)
+        pipe.execute()
+
+    def node_queue(self, base: str) -> str:
+        return f"{base}@{self.node}"
+
+    def queue_names(self, names: Iterable[str]) -> List[str]:
+        """Agrega la cola propia del nodo y las de sus materias, y quita las
+        de materias que el nodo no tiene.
+
+        La cola de prioridad, si está, va antes que la del nodo: un pedido
+        explícito pasa delante de la afinidad de caché.
+        """
+        names = list(names)
+        served = self.entregas()
+        ordered = []
+        seen = set()
+        for name in names:
+            if (split := self._split(name)) is None:
+                ordered.append(name)
+                continue
+            base, sub = split
+            if sub == PRIORITY:
+                ordered.append(name)
+                continue
+            if base not in seen:
+                seen.add(base)
+                ordered.append(self.node_queue(base))
+                ordered.extend(
+                    queue
+                    for materia in sorted(served)
+                    if (queue := f"{base}:{materia}") not in names
+                )
+            if sub in ("", OVERFLOW) or sub in served:
+                ordered.append(name)
+        return ordered
+
+    def reap(self):
+        """Devuelve a la cola común los trabajos de los nodos cuyo anuncio
+        expiró, y los olvida.
+        """
+        for node in sorted(n.decode() for n in self.connection.smembers(self.prefix)):
+            if node == self.node or self.connection.exists(self._node_key(node)):
+                continue
+            for base in self.bases:
+                if moved := self.requeue(f"{base}@{node}", base):
+                    logging.getLogger(__name__).warn(
+                        f"node {node} is gone, moved {moved} jobs to {base}"
+                    )
+            self.connection.srem(self.prefix, node)
+
+    def requeue(self, source: str, target: str) -> int:
+        """Mueve los trabajos de una cola a otra, en el mismo orden.
+
+        Returns:
+          la cantidad de trabajos movidos.
+        """
+        source_queue = Queue(source, connection=self.connection)
+        target_queue = Queue(target, connection=self.connection)
+        moved = 0
+        for job_id in reversed(source_queue.get_job_ids()):
+            if self.connection.lrem(source_queue.key, 1, job_id) != 1:
+                # Lo movió otro nodo (o ya se desencoló).
+                continue
+            try:
+                job = Job.fetch(job_id, connection=self.connection)
+            except NoSuchJobError:
+                continue
+            target_queue.enqueue_job(job, at_front=True)
+            moved += 1
+        return moved
+
+    def misrouted(self, job) -> Optional[Tuple[str, str]]:
+        """Si el trabajo de rq es una corrección que este nodo no puede correr,
+        pero otro nodo sí, devuelve el nombre de la cola a donde moverlo, y su
+        materia.
+        """
+        if (split := self._split(job.origin)) is None:
+            return None
+        if (target := self._target(job)) is None:
+            return None
+        materia, entrega = target
+        if self.can_serve(materia, entrega):
+            return None
+        if (queue_name := f"{split[0]}:{materia}") == job.origin:
+            # Ya está en la cola de su materia: el nodo tiene la materia, pero
+            # no esta entrega. Se corre igual, como sin afinidad.
+            return None
+        if not self.capable_nodes(materia, entrega):
+            logging.getLogger(__name__).warn(
+                f"no node serves {materia}/{entrega}, running {job.id} here"
+            )
+            return None
+        return queue_name, materia
+
+    def finish(self, job):
+        if (target := self._target(job)) is not None:
+            self.warm(*target)
+
+    # Lado del que encola.
+
+    def route(self, base: str, queue_name: str, job: CorregirJob) -> str:
+        """Elige la cola de un trabajo: la de un nodo capaz, o la de su materia.
+
+        Solo se rutean los trabajos que irían a <base> o a <base>:<materia>
+        (no los de prioridad u overflow).
+        """
+        shared = f"{base}:{job.materia}"
+        if queue_name not in (base, shared):
+            return queue_name
+        if not (nodes := self.capable_nodes(job.materia, job.head_branch)):
+            # Nadie la anunció: que espere en la cola común.
+            return queue_name
+
+        pipe = self.connection.pipeline(transaction=False)
+        for node in nodes:
+            pipe.llen(f"{Queue.redis_queue_namespace_prefix}{base}@{node}")
+        backlogs = dict(zip(nodes, pipe.execute()))
+
+        for node in nodes:
+            if backlogs[node] < self.max_backlog:
+                return f"{base}@{node}"
+        return shared
+
+    def capable_nodes(self, materia: str, entrega: str) -> List[str]:
+        """Los nodos vivos que tienen los tests de la entrega, del más caliente
+        al más frío.
+        """
+        nodes = sorted(node.decode() for node in self.connection.smembers(self.prefix))
+        if not nodes:
+            return []
+        pipe = self.connection.pipeline(transaction=False)
+        for node in nodes:
+            pipe.get(self._node_key(node))
+            pipe.hget(self._warm_key(node), f"{materia}/{entrega}")
+        replies = pipe.execute()
+
+        capable = []
+        for node, data, warm in zip(nodes, replies[::2], replies[1::2]):
+            if data is None:
+                # El anuncio expiró: el nodo ya no está (su cola la vacía un
+                # worker con reap()).
+                continue
+            if entrega in json.loads(data)["materias"].get(materia, ()):
+                capable.append((-float(warm or 0), node))
+        return [node for _, node in sorted(capable)]
+
+    def _split(self, name: str) -> Optional[Tuple[str, str]]:
+        """Separa el nombre de una cola en (base, sub-cola), si es de bases.
+        """
+        for base in self.bases:
+            if name == base:
+                return base, ""
+            if name.startswith(f"{base}:"):
+                return base, name[len(base) + 1 :]
+        return None
+
+    def _target(self, job) -> Optional[Tuple[str, str]]:
+        """(materia, entrega) de un trabajo de corrección, o None.
+        """
+        if not job.args or not isinstance(job.args[0], (bytes, CorregirJob)):
+            return None
+        try:
+            corregir = decode_job(job.args[0])
+        except ValueError as ex:
+            logging.getLogger(__name__).warn(f"cannot route job {job.id}: {ex}")
+            return None
+        return corregir.materia, corregir.head_branch
+
+    def _node_key(self, node: str) -> str:
+        return f"{self.prefix}:{node}"
+
+    def _warm_key(self, node: str) -> str:
+        return f"{self.prefix}:{node}:warm"
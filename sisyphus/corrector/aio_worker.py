@@ -0,0 +1,179 @@
+"""Worker asyncio: muchos trabajos de corrección en curso en un solo proceso.
+
+El worker de rq corre un único trabajo a la vez por proceso, y ese trabajo
+pasa la mayor parte del tiempo esperando: descargas de GitHub, el
+subproceso del corrector, y la publicación del check run. AsyncWorker toma
+trabajos de las mismas colas de rq, y corre hasta max_in_flight de ellos a
+la vez:
+
+  • corregir_entrega se corre con corregir_entrega_async(), donde el
+    corrector es un subproceso asyncio;
+
+  • las llamadas bloqueantes (GitHub, Redis) van a un thread pool, sobre
+    las sesiones compartidas de github_pool;
+
+  • cualquier otra función encolada se corre entera en el thread pool.
+
+La contabilidad de rq (registries, estado y resultado del trabajo) se hace
+con los mismos métodos de rq.Worker, de modo que rq info y los registries
+funcionan igual que con un worker normal.
+"""
+
+import asyncio
+import concurrent.futures
+import signal
+import sys
+import time
+import traceback
+
+from typing import Set
+
+from rq import SimpleWorker  # type: ignore
+from rq.queue import DequeueTimeout  # type: ignore
+from rq.utils import utcnow  # type: ignore
+
+from . import tasks
+from .worker import FairShareMixin, record_job_end, record_job_start
+
+
+__all__ = [
+    "AsyncWorker",
+]
+
+
+class AsyncWorker(FairShareMixin, SimpleWorker):
+    """Worker de rq que corre trabajos de manera concurrente con asyncio.
+
+    Args:
+      max_in_flight: cantidad máxima de trabajos en curso a la vez.
+      dequeue_timeout: segundos de espera (BLPOP) en cada intento de desencolar.
+    """
+
+    def __init__(self, *args, max_in_flight: int = 16, dequeue_timeout=5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.dequeue_timeout = dequeue_timeout
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight * 2, thread_name_prefix="aio_worker"
+        )
+
+    def work(self, burst=False, **_kwargs):
+        """Loop principal: desencola y lanza trabajos hasta que se pida parar.
+        """
+        self.register_birth()
+        self.log.info(
+            f"AsyncWorker {self.key} started, up to {self.max_in_flight} "
+            f"jobs in flight on {', '.join(self.queue_names())}"
+        )
+        try:
+            asyncio.run(self._work(burst))
+        finally:
+            self.executor.shutdown(wait=True)
+            self.register_death()
+        return True
+
+    async def _work(self, burst: bool):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        running: Set[asyncio.Task] = set()
+
+        for signum in signal.SIGINT, signal.SIGTERM:
+            loop.add_signal_handler(signum, self._request_stop, signum)
+
+        heartbeat = asyncio.create_task(self._heartbeat())
+        timeout = None if burst else self.dequeue_timeout
+
+        while not self._stop_requested:
+            await slots.acquire()
+            result = await self._run_blocking(self._dequeue, timeout)
+            if result is None:
+                slots.release()
+                if burst and not running:
+                    break
+                if burst:
+                    await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            job, queue = result
+            task = asyncio.create_task(self._run_job(job, queue))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        if running:
+            self.log.info(f"waiting for {len(running)} jobs to finish")
+            await asyncio.wait(running)
+
+        heartbeat.cancel()
+
+    async def _run_job(self, job, queue):
+        """Corre un trabajo, con la misma contabilidad que rq.Worker.
+        """
+        self.log.info(f"{queue.name}: {job.description} ({job.id})")
+        started_job_registry = queue.started_job_registry
+        timeout = job.timeout or self.queue_class.DEFAULT_TIMEOUT
+
+        await self._run_blocking(self.prepare_job_execution, job)
+        job.started_at = utcnow()
+        start = time.monotonic()
+        record_job_start(job, queue)
+        ok = False
+
+        try:
+            if job.func is tasks.corregir_entrega:
+                coro = tasks.corregir_entrega_async(*job.args, executor=self.executor)
+            else:
+                coro = self._run_blocking(job.perform)
+            result = await asyncio.wait_for(coro, timeout if timeout > 0 else None)
+        except Exception:
+            job.ended_at = utcnow()
+            exc_info = sys.exc_info()
+            exc_string = self._get_safe_exception_string(
+                traceback.format_exception(*exc_info)
+            )
+            await self._run_blocking(
+                self.handle_job_failure, job, started_job_registry, exc_string
+            )
+            self.handle_exception(job, *exc_info)
+        else:
+            job.ended_at = utcnow()
+            job._result = result
+            await self._run_blocking(
+                self.handle_job_success, job, queue, started_job_registry
+            )
+            self.log.info(f"{queue.name}: Job OK ({job.id})")
+            ok = True
+        finally:
+            record_job_end(job, queue, ok, flush=False)
+            await self._run_blocking(
+                self.fair_finish, job, time.monotonic() - start
+            )
+
+    def _dequeue(self, timeout):
+        while True:
+            try:
+                result = self.queue_class.dequeue_any(
+                    self.fair_queues(), timeout, self.connection, self.job_class
+                )
+            except DequeueTimeout:
+                return None
+            if result is None or not self.reroute(result[0]):
+                return result
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.job_monitoring_interval)
+            await self._run_blocking(
+                self.heartbeat, self.job_monitoring_interval + 60
+            )
+
+    def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, func, *args)
+
+    def _request_stop(self, signum):
+        if self._stop_requested:
+            self.log.warning("Cold shut down requested")
+            raise SystemExit(1)
+        self.log.info(f"{signal.Signals(signum).name} received, warm shut down")
+        self._stop_requested = True
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
+
+from requests import Session
 
 from ..common.github_utils import repo_files
 from ..common.typ import PyGithubRepo, RepoFile
@@ -16,8 +18,9 @@ class AluRepo(ABC):
 class GithubAluRepo(AluRepo):
     """AluRepo en que que el id de entrega dobla como subdirectorio."""
 
-    def __init__(self, alu_repo: PyGithubRepo):
+    def __init__(self, alu_repo: PyGithubRepo, session: Optional[Session] = None):
         self.gh_repo = alu_repo
+        self.session = session
 
     def get_entrega(self, entrega_id: str, /, sha: str) -> List[RepoFile]:
-        return repo_files(self.gh_repo, sha, subdir=entrega_id)
+        return repo_files(self.gh_repo, sha, subdir=entrega_id, session=self.session)
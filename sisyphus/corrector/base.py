@@ -1,41 +1,95 @@
 """Clase base para correcciones desde Github."""
 
+import asyncio
+import contextlib
 import datetime
-import io
+import functools
+import os
 import pathlib
 import subprocess
 import tarfile
+import tempfile
+
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Sequence, Tuple
 
 from ..common.typ import RepoFile
+from . import corrector_pool
+from .admission import AdmissionController, Slot
 from .alu_repo import AluRepo
+from .corrector_pool import CorrectorPool
 from .tests_repo import TestsRepo
+from .typ import Check
 
 
 CORRECTOR_BIN = "/srv/algo2/corrector/bin/worker"
 
+# Estado de salida de CORRECTOR_BIN --build-only si la entrega no compila.
+BUILD_FAILED = os.EX_DATAERR
+
 
 class CorrectorBase:
     """
     """
 
+    # Si se configura con use_pool(), las correcciones se envían a procesos
+    # persistentes del corrector en lugar de hacer un exec() por entrega.
+    pool: Optional[CorrectorPool] = None
+
+    # Si se configura con use_admission(), cada corrección espera un slot
+    # libre en el host (compartido con el resto de los workers).
+    admission: Optional[AdmissionController] = None
+
     def __init__(self, alu_repo: AluRepo, tests_repo: TestsRepo):
         self.alu_repo = alu_repo
         self.tests_repo = tests_repo
 
-    def corregir_entrega(self, entrega_id: str, sha: str):
-        tarbytes = io.BytesIO()
-        now = datetime.datetime.now()
-        tarobj = tarfile.open(fileobj=tarbytes, mode="w|", dereference=True)
+    def corregir_entrega(
+        self, entrega_id: str, sha: str, check: Optional[Check] = None
+    ):
+        test_files, entrega_files = self.get_files(entrega_id, sha)
+        with self.build_tar(test_files, entrega_files, check) as tar:
+            return self.run_corrector(tar)
 
+    def get_files(self, entrega_id: str, sha: str):
+        """Descarga (una sola vez) los archivos de prueba y los de la entrega.
+
+        Returns:
+          una tupla (test_files, entrega_files), con listas de RepoFile.
+        """
         test_files = self.tests_repo.get_tests()
         entrega_files = self.alu_repo.get_entrega(entrega_id, sha)
+        return test_files, entrega_files
+
+    def build_tar(
+        self,
+        test_files: List[RepoFile],
+        entrega_files: List[RepoFile],
+        check: Optional[Check] = None,
+    ) -> BinaryIO:
+        """Construye el tar que recibe el corrector por entrada estándar.
+
+        El tar se escribe en un archivo temporal (que se borra al cerrarlo),
+        no en memoria: así se pasa tal cual como stdin del corrector, y una
+        entrega grande no ocupa memoria del worker.
+
+        Si se especifica un check, solo se incluyen los archivos de su lista
+        alu_files y test_files (en caso de que estén definidas).
+        """
+        tar = tempfile.TemporaryFile()
+        now = datetime.datetime.now()
+        tarobj = tarfile.open(fileobj=tar, mode="w|", dereference=True)
+
+        if check is not None:
+            test_files = filter_files(test_files, check.test_files)
+            entrega_files = filter_files(entrega_files, check.alu_files)
 
         def add_file(repo_file: RepoFile, prefix: pathlib.PurePath):
             info = tarfile.TarInfo((prefix / repo_file.path).as_posix())
-            info.size = len(repo_file.contents)
+            info.size = repo_file.size
             info.mtime = int(now.timestamp())
             info.type, info.mode = tarfile.REGTYPE, repo_file.mode
-            tarobj.addfile(info, io.BytesIO(repo_file.contents))
+            with repo_file.open() as fileobj:
+                tarobj.addfile(info, fileobj)
 
         for subdir, files in ("skel", test_files), ("orig", entrega_files):
             # FIXME: El worker actual hace el merge entre orig/ y
@@ -45,8 +99,197 @@ class CorrectorBase:
                 add_file(repo_file, prefix)
 
         tarobj.close()
+        tar.seek(0)
+        return tar
+
+    @classmethod
+    def use_pool(
+        cls,
+        size: int,
+        *,
+        max_jobs: int = 100,
+        timeout: Optional[float] = corrector_pool.DEFAULT_TIMEOUT,
+    ):
+        """Activa el modo persistente del corrector, con un pool de procesos.
+        """
+        cls.pool = CorrectorPool(
+            [CORRECTOR_BIN, "--persistent"],
+            size=size,
+            max_jobs=max_jobs,
+            timeout=timeout,
+        )
+        return cls.pool
 
+    @classmethod
+    def use_admission(cls, **kwargs):
+        """Limita las correcciones simultáneas en el host.
+        """
+        cls.admission = AdmissionController(**kwargs)
+        return cls.admission
+
+    def run_corrector(self, tar: BinaryIO) -> bytes:
+        """Corre el corrector sobre el tar (desde su inicio).
+        """
         # TODO: timeout here for "timed_out" conclusion.
-        return subprocess.check_output(
-            [CORRECTOR_BIN], input=tarbytes.getvalue(), stderr=subprocess.STDOUT
+        status, output = self._run(tar, pool=self.pool)
+        if status != 0:
+            raise subprocess.CalledProcessError(status, [CORRECTOR_BIN], output=output)
+        return output
+
+    async def run_corrector_async(self, tar: BinaryIO) -> bytes:
+        """Igual que run_corrector(), pero como subproceso de asyncio.
+        """
+        status, output = await self._run_async(tar, pool=self.pool)
+        if status != 0:
+            raise subprocess.CalledProcessError(status, [CORRECTOR_BIN], output=output)
+        return output
+
+    def run_build(self, tar: BinaryIO) -> Tuple[bool, bytes]:
+        """Etapa de compilación: corre CORRECTOR_BIN --build-only.
+
+        Es mucho más barata que la corrección completa, y permite informar
+        de inmediato que una entrega no compila. El corrector sale con
+        BUILD_FAILED si la entrega no compila; cualquier otro estado
+        distinto de cero es un error del corrector, y se lanza.
+
+        Returns:
+          una tupla (compila, salida).
+        """
+        return build_result(*self._run(tar, "--build-only"))
+
+    async def run_build_async(self, tar: BinaryIO) -> Tuple[bool, bytes]:
+        """Igual que run_build(), pero como subproceso de asyncio.
+        """
+        return build_result(*await self._run_async(tar, "--build-only"))
+
+    def _run(
+        self, tar: BinaryIO, *args: str, pool: Optional[CorrectorPool] = None
+    ) -> Tuple[int, bytes]:
+        """Corre CORRECTOR_BIN con el tar por stdin, en un slot de admisión.
+
+        Si se pasa un pool, la corrección se envía a uno de sus procesos.
+
+        Returns:
+          una tupla (estado de salida, salida).
+        """
+        tar.seek(0)
+        with self._slot() as slot:
+            if pool is not None:
+                try:
+                    return 0, pool.run(tar, pin=self._pin_fn(slot))
+                except subprocess.CalledProcessError as ex:
+                    return ex.returncode, ex.output
+            with subprocess.Popen(
+                [CORRECTOR_BIN, *args],
+                stdin=tar,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            ) as proc:
+                try:
+                    self._pin(slot, proc.pid)
+                    output, _ = proc.communicate()
+                except BaseException:
+                    # P.ej. el timeout del trabajo de rq: que el corrector no
+                    # siga corriendo con el slot ya liberado.
+                    proc.kill()
+                    proc.wait()
+                    raise
+                return proc.returncode, output
+
+    async def _run_async(
+        self, tar: BinaryIO, *args: str, pool: Optional[CorrectorPool] = None
+    ) -> Tuple[int, bytes]:
+        """Igual que _run(), pero como subproceso de asyncio.
+        """
+        tar.seek(0)
+        async with self._slot_async() as slot:
+            if pool is not None:
+                loop = asyncio.get_running_loop()
+                run = functools.partial(pool.run, pin=self._pin_fn(slot))
+                try:
+                    return 0, await loop.run_in_executor(None, run, tar)
+                except subprocess.CalledProcessError as ex:
+                    return ex.returncode, ex.output
+            proc = await asyncio.create_subprocess_exec(
+                CORRECTOR_BIN,
+                *args,
+                stdin=tar,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            try:
+                self._pin(slot, proc.pid)
+                output, _ = await proc.communicate()
+            except asyncio.CancelledError:
+                # asyncio.wait_for() cancela la tarea al vencer el timeout del
+                # trabajo: el corrector no debe seguir corriendo.
+                proc.kill()
+                await proc.wait()
+                raise
+            return await proc.wait(), output
+
+    @contextlib.contextmanager
+    def _slot(self) -> Iterator[Optional[Slot]]:
+        if self.admission is None:
+            yield None
+        else:
+            with self.admission.slot() as slot:
+                yield slot
+
+    @contextlib.asynccontextmanager
+    async def _slot_async(self) -> AsyncIterator[Optional[Slot]]:
+        if self.admission is None:
+            yield None
+        else:
+            async with self.admission.slot_async() as slot:
+                yield slot
+
+    def _pin(self, slot: Optional[Slot], pid: int):
+        """Fija a los cores del slot un proceso recién lanzado.
+
+        Se hace desde el padre tras el fork, y no con preexec_fn: esta no
+        es segura con threads (aio_worker, checks en paralelo).
+        """
+        if slot is not None and self.admission is not None:
+            self.admission.pin(pid, slot)
+
+    def _pin_fn(self, slot):
+        if slot is None or not self.admission.pin_cpus:
+            return None
+        return functools.partial(self.admission.pin, slot=slot)
+
+
+def build_result(status: int, output: bytes) -> Tuple[bool, bytes]:
+    """Interpreta el estado de salida de la etapa de compilación.
+
+    Returns:
+      una tupla (compila, salida).
+
+    Raises:
+      subprocess.CalledProcessError si el corrector falló por otro motivo.
+    """
+    if status not in (0, BUILD_FAILED):
+        raise subprocess.CalledProcessError(
+            status, [CORRECTOR_BIN, "--build-only"], output=output
         )
+    return status == 0, output
+
+
+def filter_files(
+    repo_files: List[RepoFile], allowed: Optional[Sequence[pathlib.Path]]
+) -> List[RepoFile]:
+    """Filtra una lista de archivos según una lista de rutas permitidas.
+
+    Una ruta permitida incluye el archivo con ese mismo nombre o, si es un
+    directorio, todos los archivos bajo él. Si allowed es None, no se filtra.
+    """
+    if allowed is None:
+        return repo_files
+
+    allowed_paths = [pathlib.PurePosixPath(p) for p in allowed]
+
+    def is_allowed(repo_file: RepoFile):
+        path = pathlib.PurePosixPath(repo_file.path)
+        return any(p == path or p in path.parents for p in allowed_paths)
+
+    return [f for f in repo_files if is_allowed(f)]
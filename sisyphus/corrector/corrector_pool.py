@@ -0,0 +1,238 @@
+"""Pool de procesos del corrector de larga vida.
+
+Para entregas cortas, el exec() del corrector y el arranque de su toolchain
+cuestan más que la corrección misma. En modo persistente, el corrector se
+lanza una vez (con CORRECTOR_BIN --persistent) y recibe un trabajo tras otro
+por stdin, respondiendo por stdout. El protocolo es de frames:
+
+  • request: longitud del tar (4 bytes, big-endian) seguida del tar.
+    Un request de longitud cero es un health check (ping).
+
+  • response: estado de salida y longitud de la salida (4 bytes cada uno,
+    big-endian), seguidos de la salida (stdout y stderr combinados). La
+    respuesta a un ping es estado 0 y salida vacía.
+
+Cada proceso se recicla tras max_jobs trabajos; ante cualquier error
+(de protocolo, timeout, o una excepción que interrumpa la corrección, como
+el timeout del trabajo de rq) se lo mata, pues pudo quedar a mitad de un frame.
+El timeout abarca el request entero: tanto escribir el tar (un corrector
+trabado puede dejar de leer stdin) como leer la respuesta.
+"""
+
+import io
+import logging
+import os
+import queue
+import select
+import struct
+import subprocess
+import threading
+import time
+
+from typing import IO, BinaryIO, Callable, List, Optional
+
+from rq.queue import Queue  # type: ignore
+
+
+__all__ = [
+    "CorrectorPool",
+    "ProtocolError",
+]
+
+REQUEST_HDR = struct.Struct("!I")
+RESPONSE_HDR = struct.Struct("!iI")
+
+# Por omisión, el mismo tiempo máximo que el de los trabajos de rq.
+DEFAULT_TIMEOUT = Queue.DEFAULT_TIMEOUT
+
+
+class ProtocolError(Exception):
+    """El proceso del corrector no respondió según el protocolo.
+    """
+
+
+class CorrectorProcess:
+    """Un proceso del corrector en modo persistente.
+    """
+
+    def __init__(self, argv: List[str]):
+        self.argv = argv
+        self.jobs = 0
+        self.last_used = time.monotonic()
+        self.proc = subprocess.Popen(
+            argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0
+        )
+        if self.proc.stdin is None or self.proc.stdout is None:
+            self.kill()
+            raise ProtocolError(f"could not open pipes to {argv[0]}")
+        self.stdin: IO[bytes] = self.proc.stdin
+        self.stdout: IO[bytes] = self.proc.stdout
+        # Las escrituras esperan con select(), para poder respetar el timeout.
+        os.set_blocking(self.stdin.fileno(), False)
+
+    def request(self, payload: BinaryIO, timeout: Optional[float]):
+        """Envía un frame, copiando payload desde el inicio, y espera la respuesta.
+
+        Returns:
+          una tupla (estado, salida).
+        """
+        self.last_used = time.monotonic()
+        deadline = None if timeout is None else self.last_used + timeout
+        size = payload.seek(0, io.SEEK_END)
+        payload.seek(0)
+        self._write(REQUEST_HDR.pack(size), deadline)
+        while chunk := payload.read(1 << 16):
+            self._write(chunk, deadline)
+
+        status, size = RESPONSE_HDR.unpack(self._read(RESPONSE_HDR.size, deadline))
+        output = self._read(size, deadline)
+        self.last_used = time.monotonic()
+        return status, output
+
+    def ping(self, timeout: float) -> bool:
+        try:
+            return self.request(io.BytesIO(), timeout) == (0, b"")
+        except (ProtocolError, subprocess.TimeoutExpired):
+            return False
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        """Cierra stdin (fin de trabajos) y, si no termina, mata el proceso.
+        """
+        try:
+            self.stdin.close()
+            self.proc.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+
+    def _write(self, data: bytes, deadline: Optional[float]):
+        fd = self.stdin.fileno()
+        view = memoryview(data)
+        while view:
+            remaining = None
+            if deadline is not None:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    raise subprocess.TimeoutExpired(self.argv, 0)
+            _, ready, _ = select.select([], [fd], [], remaining)
+            if not ready:
+                continue
+            try:
+                written = os.write(fd, view)
+            except BlockingIOError:
+                continue
+            except (BrokenPipeError, ValueError) as ex:
+                raise ProtocolError(f"could not write to corrector: {ex}") from ex
+            view = view[written:]
+
+    def _read(self, size: int, deadline: Optional[float]) -> bytes:
+        fd = self.stdout.fileno()
+        chunks = []
+        while size > 0:
+            if deadline is not None:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    raise subprocess.TimeoutExpired(self.argv, 0)
+                ready, _, _ = select.select([fd], [], [], remaining)
+                if not ready:
+                    continue
+            if not (chunk := os.read(fd, min(size, 1 << 16))):
+                raise ProtocolError(f"corrector exited ({self.proc.poll()})")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+
+class CorrectorPool:
+    """Pool de procesos persistentes del corrector.
+
+    Args:
+      argv: comando del corrector en modo persistente.
+      size: cantidad máxima de procesos (y de correcciones simultáneas).
+      max_jobs: trabajos tras los cuales se recicla un proceso.
+      timeout: tiempo máximo por corrección, en segundos (None: sin límite).
+      health_interval: si un proceso estuvo ocioso más que esto, se le hace
+          un health check antes de usarlo.
+    """
+
+    def __init__(
+        self,
+        argv: List[str],
+        *,
+        size: int,
+        max_jobs: int = 100,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        health_interval: float = 60,
+    ):
+        self.argv = argv
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.logger = logging.getLogger(__name__)
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def run(
+        self, tar: BinaryIO, *, pin: Optional[Callable[[int], None]] = None
+    ) -> bytes:
+        """Corre una corrección en un proceso del pool.
+
+        Args:
+          tar: archivo con el tar de la entrega y las pruebas.
+          pin: función que recibe el pid del proceso elegido antes de usarlo
+              (p.ej. para fijarlo a los cores de un slot de admisión).
+
+        Raises:
+          subprocess.CalledProcessError si el estado de salida no es cero,
+          igual que subprocess.check_output().
+        """
+        with self._slots:
+            proc = self._acquire()
+            try:
+                if pin is not None:
+                    pin(proc.proc.pid)
+                status, output = proc.request(tar, self.timeout)
+            except BaseException:
+                # Quizás a mitad de un frame: el proceso ya no es reusable.
+                proc.kill()
+                raise
+            proc.jobs += 1
+            self._release(proc)
+
+        if status != 0:
+            raise subprocess.CalledProcessError(status, self.argv, output=output)
+
+        return output
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _acquire(self) -> CorrectorProcess:
+        while True:
+            try:
+                proc = self._idle.get_nowait()
+            except queue.Empty:
+                return CorrectorProcess(self.argv)
+            idle_time = time.monotonic() - proc.last_used
+            if proc.alive() and (
+                idle_time < self.health_interval or proc.ping(timeout=5)
+            ):
+                return proc
+            self.logger.warn(f"discarding unhealthy corrector {proc.proc.pid}")
+            proc.close()
+
+    def _release(self, proc: CorrectorProcess):
+        if proc.jobs >= self.max_jobs or not proc.alive():
+            self.logger.info(f"recycling corrector {proc.proc.pid} ({proc.jobs} jobs)")
+            proc.close()
+        else:
+            self._idle.put(proc)
@@ -0,0 +1,69 @@
+"""Exporter HTTP de las métricas propias del host de un worker.
+
+Las métricas de los trabajos van a Redis y las sirve el /metrics de la
+app (ver common.metrics); aquí solo se exporta el estado local del host,
+que no tiene sentido agregar entre hosts: slots de corrección en uso y
+capacidad (ver admission.py).
+"""
+
+import http.server
+import logging
+import socket
+import threading
+
+from ..common.metrics import format_labels, render_family
+from .base import CorrectorBase
+
+
+__all__ = [
+    "host_metrics",
+    "serve_metrics",
+]
+
+
+def host_metrics() -> str:
+    """Métricas del host en formato de texto de Prometheus.
+    """
+    if (admission := CorrectorBase.admission) is None:
+        return ""
+    usage = admission.usage()
+    labels = format_labels(dict(host=socket.gethostname()))
+    return render_family(
+        "sisyphus_admission_capacity",
+        "gauge",
+        "Correcciones simultáneas admitidas en el host.",
+        [("sisyphus_admission_capacity", labels, usage["capacity"])],
+    ) + render_family(
+        "sisyphus_admission_used",
+        "gauge",
+        "Slots de corrección en uso en el host.",
+        [("sisyphus_admission_used", labels, usage["used"])],
+    )
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = host_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).debug(format, *args)
+
+
+def serve_metrics(port: int, host: str = "") -> http.server.ThreadingHTTPServer:
+    """Sirve /metrics en un thread aparte (daemon) del proceso del worker.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics exporter", daemon=True
+    )
+    thread.start()
+    return server
@@ -0,0 +1,206 @@
+"""Reparto justo de los workers entre materias, y entre repos.
+
+Con una única cola, la fecha de entrega de una materia (o un repo con
+treinta push seguidos) demora las correcciones de todos los demás.
+Aquí la cola de trabajos se divide en sub-colas, que los workers recorren
+en un orden que se recalcula en cada desencolado:
+
+  1. <cola>:priority   pedidos explícitos (check_run.rerequested);
+  2. <cola>:<materia>  una por materia, primero la que menos tiempo de
+                       corrección usó recientemente, en proporción a su peso;
+  3. <cola>            trabajos encolados sin reparto (compatibilidad);
+  4. <cola>:overflow   trabajos de un repo que ya tiene max_pending_per_repo
+                       en curso.
+
+rq desencola siempre de la primera cola no vacía de la lista, de modo que
+una materia con poco uso pasa delante de otra que está en su fecha de
+entrega, y un repo no acapara la cola de su materia. (El tope es por repo:
+un alumno con repo individual y grupal tiene un tope en cada uno.)
+
+Los workers con reparto anuncian en Redis que leen las sub-colas de cada
+cola; si ninguno lo hace, route() encola en la cola misma, sin reparto, en
+lugar de dejar los trabajos en sub-colas que nadie lee.
+"""
+
+import logging
+import time
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from redis import Redis
+from rq.queue import Queue  # type: ignore
+
+from ..common.typ import CorregirJob, Repo
+
+
+__all__ = [
+    "FairShare",
+]
+
+PRIORITY = "priority"
+OVERFLOW = "overflow"
+
+
+class FairShare:
+    """Asignación de trabajos a sub-colas, y orden en que se desencolan.
+
+    Args:
+      connection: conexión a Redis.
+      bases: colas a dividir en sub-colas (solo en los workers).
+      weights: peso de cada materia (1 por omisión).
+      max_pending_per_repo: trabajos encolados o en curso por repo, antes
+          de desviar los siguientes a la cola overflow.
+      window: segundos de la ventana con que se mide el uso de cada materia.
+      ttl: segundos que dura el anuncio de un worker; este lo renueva antes.
+      prefix: prefijo de las claves en Redis.
+    """
+
+    # Si se configura con use(), los workers reordenan sus colas.
+    default: Optional["FairShare"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        bases: Iterable[str] = (),
+        weights: Optional[Dict[str, float]] = None,
+        max_pending_per_repo: int = 3,
+        window: int = 600,
+        ttl: int = 30,
+        prefix: str = "sisyphus:fair",
+    ):
+        self.connection = connection
+        self.bases = set(bases)
+        self.weights = weights or {}
+        self.max_pending_per_repo = max_pending_per_repo
+        self.window = window
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "FairShare":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    # Lado del que encola.
+
+    def route(
+        self, base: str, job: CorregirJob, *, priority: bool = False
+    ) -> Tuple[str, Optional[Dict]]:
+        """Elige la sub-cola de un trabajo, y lo cuenta como pendiente.
+
+        Si ningún worker lee las sub-colas de base, el trabajo va a base.
+
+        Returns:
+          una tupla (nombre de la cola, meta para el trabajo de rq).
+        """
+        if not self.connection.exists(self._workers_key(base)):
+            logging.getLogger(__name__).warn(
+                f"no fair-share worker reads {base}, enqueuing without fair share"
+            )
+            return base, None
+
+        # El contador expira window * 6 segundos después de creado (no de
+        # cada INCR): si se perdiera un release(), no queda trabado.
+        key = self._pending_key(job.repo)
+        pipe = self.connection.pipeline()
+        pipe.set(key, 0, ex=self.window * 6, nx=True)
+        pipe.incr(key)
+        _, pending = pipe.execute()
+
+        if priority:
+            queue_name = f"{base}:{PRIORITY}"
+        elif pending > self.max_pending_per_repo:
+            queue_name = f"{base}:{OVERFLOW}"
+        else:
+            queue_name = f"{base}:{job.materia}"
+
+        meta = dict(fair=dict(materia=job.materia, repo=job.repo.full_name))
+        return queue_name, meta
+
+    def release(self, meta: Optional[Dict]):
+        """Descuenta un trabajo pendiente (terminado, o cancelado sin correr).
+        """
+        if meta is None or (fair := meta.get("fair")) is None:
+            return
+        key = self._pending_key(Repo(fair["repo"]))
+        if self.connection.decr(key) <= 0:
+            self.connection.delete(key)
+
+    # Lado del worker.
+
+    def register(self):
+        """Anuncia que hay workers leyendo las sub-colas de cada base.
+        """
+        pipe = self.connection.pipeline(transaction=False)
+        for base in self.bases:
+            pipe.set(self._workers_key(base), 1, ex=self.ttl)
+        pipe.execute()
+
+    def queue_names(self, names: Iterable[str]) -> List[str]:
+        """Expande las colas de un worker en sus sub-colas, en orden de prioridad.
+        """
+        ordered = []
+        for name in names:
+            if name not in self.bases:
+                ordered.append(name)
+                continue
+            materias = self.materias(name)
+            usage = self.usage(materias)
+            materias.sort(key=lambda m: (usage[m] / self.weights.get(m, 1.0), m))
+            ordered.append(f"{name}:{PRIORITY}")
+            ordered.extend(f"{name}:{materia}" for materia in materias)
+            ordered.append(name)
+            ordered.append(f"{name}:{OVERFLOW}")
+        return ordered
+
+    def materias(self, base: str) -> List[str]:
+        """Materias con sub-cola en Redis (o con peso configurado).
+        """
+        prefix = f"{Queue.redis_queue_namespace_prefix}{base}:"
+        materias = set(self.weights)
+        for key in self.connection.smembers(Queue.redis_queues_keys):
+            if (name := key.decode()).startswith(prefix):
+                materias.add(name[len(prefix) :])
+        materias -= {PRIORITY, OVERFLOW}
+        return list(materias)
+
+    def usage(self, materias: List[str]) -> Dict[str, float]:
+        """Segundos de corrección recientes de cada materia.
+
+        Se suma la ventana actual y, con peso decreciente, la anterior.
+        """
+        now = time.time()
+        current = int(now // self.window)
+        elapsed = now / self.window - current
+        if not materias:
+            return {}
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hmget(self._usage_key(current), materias)
+        pipe.hmget(self._usage_key(current - 1), materias)
+        cur, prev = pipe.execute()
+        return {
+            materia: float(c or 0) + float(p or 0) * (1 - elapsed)
+            for materia, c, p in zip(materias, cur, prev)
+        }
+
+    def finish(self, meta: Optional[Dict], seconds: float):
+        """Registra el uso de un trabajo terminado, y lo descuenta del repo.
+        """
+        if meta is None or (fair := meta.get("fair")) is None:
+            return
+        key = self._usage_key(int(time.time() // self.window))
+        pipe = self.connection.pipeline()
+        pipe.hincrbyfloat(key, fair["materia"], seconds)
+        pipe.expire(key, self.window * 3)
+        pipe.execute()
+        self.release(meta)
+
+    def _pending_key(self, repo: Repo) -> str:
+        return f"{self.prefix}:pending:{repo.full_name}"
+
+    def _usage_key(self, window: int) -> str:
+        return f"{self.prefix}:usage:{window}"
+
+    def _workers_key(self, base: str) -> str:
+        return f"{self.prefix}:workers:{base}"
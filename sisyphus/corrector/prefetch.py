@@ -0,0 +1,149 @@
+"""Descarga anticipada de entregas, en un caché compartido en Redis.
+
+Entre que el webhook encola un trabajo y que un worker lo toma, la entrega
+no se mueve; y lo primero que hace el worker es descargarla. Si la app
+tiene configurada una cola de prefetch, el webhook encola además
+prefetch_entrega(), un trabajo que descarga los archivos de alu_dir para
+head_sha y los guarda en SubmissionCache. Los workers consultan primero ese
+caché (CachedAluRepo); si la cola estaba cargada, la descarga ya terminó y
+el trabajo pasa directo a la corrección. (Solo los workers lanzados con
+"worker --prefetch" usan el caché: sin prefetch, guardar cada entrega en
+Redis no ahorra nada.)
+
+El prefetch sirve justamente cuando los workers de corrección están todos
+ocupados, así que su cola debe tener workers propios (p.ej. "worker
+--prefetch --asyncio 8 prefetch", pues solo hace I/O). Un worker que la lee
+después de "default" no la atendería hasta vaciar "default", cuando ya no
+hace falta.
+"""
+
+import datetime
+import logging
+import pickle
+import time
+
+from typing import List, Optional
+
+from redis import Redis
+
+from ..common.github_pool import default_pool
+from ..common.typ import AppInstallationTokenAuth, Repo, RepoFile
+from .alu_repo import AluRepo, GithubAluRepo
+
+
+__all__ = [
+    "CachedAluRepo",
+    "SubmissionCache",
+    "prefetch_entrega",
+]
+
+ENTREGA_PREFIX = "sisyphus:entrega:"
+
+
+class SubmissionCache:
+    """Caché en Redis de los archivos de una entrega, por commit.
+
+    Args:
+      connection: conexión a Redis.
+      ttl: tiempo que se guarda cada entrega.
+      max_bytes: entregas más grandes que esto no se guardan.
+      wait: segundos que se espera a un prefetch en curso antes de
+          descargar la entrega por cuenta propia.
+    """
+
+    # Si se configura con use(), los workers consultan este caché.
+    default: Optional["SubmissionCache"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        ttl: datetime.timedelta = datetime.timedelta(hours=1),
+        max_bytes: int = 8 << 20,
+        wait: float = 10,
+    ):
+        self.connection = connection
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.wait = wait
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "SubmissionCache":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    def get(self, repo: str, sha: str, alu_dir: str) -> Optional[List[RepoFile]]:
+        """Devuelve la entrega guardada, esperando un prefetch en curso.
+        """
+        key = self._key(repo, sha, alu_dir)
+        deadline = time.monotonic() + self.wait
+        while (data := self.connection.get(key)) is None:
+            if not self.connection.exists(f"{key}:lock"):
+                return None
+            if time.monotonic() > deadline:
+                self.logger.info(f"gave up waiting for prefetch of {key}")
+                return None
+            time.sleep(0.25)
+        return pickle.loads(data)
+
+    def put(self, repo: str, sha: str, alu_dir: str, repo_files: List[RepoFile]):
+        if sum(f.size for f in repo_files) > self.max_bytes:
+            return
+        data = pickle.dumps(repo_files, protocol=pickle.HIGHEST_PROTOCOL)
+        self.connection.set(self._key(repo, sha, alu_dir), data, ex=self.ttl)
+
+    def claim(self, repo: str, sha: str, alu_dir: str, timeout: int = 60) -> bool:
+        """Marca un prefetch en curso; devuelve False si ya hay otro.
+        """
+        key = self._key(repo, sha, alu_dir)
+        if self.connection.exists(key):
+            return False
+        return bool(self.connection.set(f"{key}:lock", 1, nx=True, ex=timeout))
+
+    def release(self, repo: str, sha: str, alu_dir: str):
+        self.connection.delete(f"{self._key(repo, sha, alu_dir)}:lock")
+
+    def _key(self, repo: str, sha: str, alu_dir: str) -> str:
+        return f"{ENTREGA_PREFIX}{repo}:{sha}:{alu_dir.strip('/')}"
+
+
+class CachedAluRepo(AluRepo):
+    """AluRepo que consulta primero SubmissionCache, y guarda lo descargado.
+    """
+
+    def __init__(self, alu_repo: AluRepo, cache: SubmissionCache, repo: Repo):
+        self.alu_repo = alu_repo
+        self.cache = cache
+        self.repo = repo
+
+    def get_entrega(self, entrega_id: str, /, sha: str) -> List[RepoFile]:
+        full_name = self.repo.full_name
+        if (repo_files := self.cache.get(full_name, sha, entrega_id)) is not None:
+            return repo_files
+        repo_files = self.alu_repo.get_entrega(entrega_id, sha)
+        self.cache.put(full_name, sha, entrega_id, repo_files)
+        return repo_files
+
+
+def prefetch_entrega(
+    repo: Repo, sha: str, alu_dir: str, auth: AppInstallationTokenAuth
+):
+    """Descarga una entrega a SubmissionCache, si no estaba ya.
+    """
+    if (cache := SubmissionCache.default) is None:
+        raise RuntimeError("prefetch_entrega() requires SubmissionCache.use()")
+
+    if not cache.claim(repo.full_name, sha, alu_dir):
+        return False
+
+    try:
+        pool = default_pool()
+        alu_repo = GithubAluRepo(
+            pool.pygithub(auth).get_repo(repo.full_name), pool.session(auth)
+        )
+        cache.put(repo.full_name, sha, alu_dir, alu_repo.get_entrega(alu_dir, sha))
+    finally:
+        cache.release(repo.full_name, sha, alu_dir)
+
+    return True
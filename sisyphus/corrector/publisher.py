@@ -0,0 +1,163 @@
+"""Publicación de check runs en GitHub con el mínimo de requests.
+
+Un check run pasa por dos escrituras: "in_progress" al empezar la
+corrección y "completed" al terminar, esta última con todos los campos
+(conclusión, output y details_url) en un único PATCH. Como el id del check
+run ya se conoce, no se lo pide antes con un GET.
+"""
+
+import datetime
+import logging
+import time
+
+from typing import Any, Dict, Optional, Union
+
+import requests
+
+from github3.session import GitHubSession  # type: ignore
+
+from ..common.typ import Repo
+
+
+__all__ = [
+    "CheckRunPublisher",
+    "PublishError",
+]
+
+# Hasta 2020, la Checks API requería este media type (preview).
+CHECKS_MEDIA_TYPE = "application/vnd.github.antiope-preview+json"
+
+
+class PublishError(Exception):
+    """No se pudo publicar el check run tras todos los reintentos.
+    """
+
+
+class CheckRunPublisher:
+    """Publica el estado de un check run de un commit.
+
+    Si no se pasa checkrun_id, la primera escritura crea el check run (y
+    guarda su id para las siguientes).
+    """
+
+    def __init__(
+        self,
+        session: GitHubSession,
+        repo: Repo,
+        *,
+        head_sha: str,
+        name: str,
+        checkrun_id: Optional[int] = None,
+        attempts: int = 4,
+        backoff: float = 2.0,
+    ):
+        self.session = session
+        self.repo = repo
+        self.head_sha = head_sha
+        self.name = name
+        self.checkrun_id = checkrun_id
+        self.attempts = attempts
+        self.backoff = backoff
+        self.logger = logging.getLogger(__name__)
+        self.html_url: Optional[str] = None
+
+    def start(self) -> bool:
+        """Marca el check run como "in_progress".
+
+        Un error aquí no debe impedir la corrección: se registra y se
+        devuelve False.
+        """
+        try:
+            self._write(dict(status="in_progress", started_at=_now()), attempts=1)
+        except PublishError as ex:
+            self.logger.warn(f"could not mark {self.name!r} as in_progress: {ex}")
+            return False
+        return True
+
+    def publish(
+        self, conclusion: str, output: Dict, *, details_url: Optional[str] = None
+    ) -> Dict:
+        """Publica el resultado final en una sola escritura.
+
+        Args:
+          conclusion: conclusión del check run ("success", "failure", etc.)
+          output: diccionario con title, summary y text.
+          details_url: si no se especifica, se usa el html_url del check
+              run (según la API, que es la que sabe el dominio, p.ej. en
+              GitHub Enterprise), para tener un enlace directo desde
+              Reviewable.
+
+        Returns:
+          el check run publicado, tal y como lo devuelve la API.
+        """
+        attrs: Dict[str, Any] = dict(
+            status="completed",
+            conclusion=conclusion,
+            completed_at=_now(),
+            output=output,
+        )
+        if details_url or self.html_url:
+            attrs["details_url"] = details_url or self.html_url
+
+        checkrun = self._write(attrs, attempts=self.attempts)
+
+        if "details_url" not in attrs and checkrun.get("html_url"):
+            # Primera escritura (start() falló, o no se llamó): solo ahora
+            # conocemos su html_url.
+            checkrun = self._write(dict(details_url=checkrun["html_url"]))
+
+        return checkrun
+
+    def _write(self, attrs: Dict, *, attempts: int = 1) -> Dict:
+        """Crea o actualiza el check run, reintentando errores transitorios.
+        """
+        if self.checkrun_id is None:
+            method = "post"
+            url = self.session.build_url("repos", self.repo.full_name, "check-runs")
+            attrs = dict(attrs, name=self.name, head_sha=self.head_sha)
+        else:
+            method = "patch"
+            url = self.session.build_url(
+                "repos", self.repo.full_name, "check-runs", str(self.checkrun_id)
+            )
+
+        headers = {"Accept": CHECKS_MEDIA_TYPE}
+        last_error: Union[None, str, requests.RequestException] = None
+
+        for attempt in range(attempts):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                resp = self.session.request(method, url, json=attrs, headers=headers)
+            except requests.RequestException as ex:
+                last_error = ex
+                continue
+            if resp.status_code < 300:
+                checkrun = resp.json()
+                self.checkrun_id = checkrun["id"]
+                self.html_url = checkrun.get("html_url", self.html_url)
+                return checkrun
+            last_error = f"{resp.status_code} {resp.reason}"
+            if resp.status_code < 500 and not _retryable(resp):
+                break
+
+        raise PublishError(f"{method.upper()} {url}: {last_error}")
+
+
+def _retryable(resp: requests.Response) -> bool:
+    """Si vale la pena reintentar un error 4xx: solo si es de rate limit.
+
+    GitHub responde 403 tanto por rate limit (con X-RateLimit-Remaining: 0,
+    o Retry-After en el secondary rate limit) como por falta de permisos.
+    """
+    if resp.status_code in (401, 429):
+        return True
+    return resp.status_code == 403 and (
+        resp.headers.get("X-RateLimit-Remaining") == "0"
+        or "Retry-After" in resp.headers
+    )
+
+
+def _now() -> str:
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    return now.isoformat().replace("+00:00", "Z")
@@ -0,0 +1,186 @@
+"""Resultados de corrección guardados en Redis antes de publicarlos.
+
+Correr el corrector es caro; publicar su resultado en GitHub es barato pero
+puede fallar (token vencido, errores 5xx). Para no volver a descargar y
+corregir la entrega solo para reintentar la publicación, cada resultado
+(conclusión y output) se guarda primero en Redis, y si la publicación falla
+se encola republicar() en una cola aparte. Ese trabajo solo reintenta la
+escritura en GitHub, con un token nuevo si el original ya venció.
+
+Los reintentos sucesivos se encolan con enqueue_in(), así que algún worker
+de la cola de publicación debe correr con el scheduler de rq activado.
+"""
+
+import datetime
+import logging
+
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+from redis import Redis
+from rq import Queue  # type: ignore
+
+from ..common import metrics
+from ..common.github_pool import GitHubPool, default_pool
+from ..common.typ import AppInstallationTokenAuth, Repo
+from .publisher import CheckRunPublisher, PublishError
+
+
+__all__ = [
+    "GradingResult",
+    "ResultStore",
+    "republicar",
+]
+
+RESULT_PREFIX = "sisyphus:result:"
+
+
+class GradingResult(BaseModel):
+    """Resultado de un check, con todo lo necesario para publicarlo.
+    """
+
+    repo: str
+    head_sha: str
+    check_id: str
+    name: str
+    checkrun_id: Optional[int] = None
+    conclusion: str
+    output: Dict[str, str]
+    published: bool = False
+
+    @property
+    def key(self) -> str:
+        return f"{RESULT_PREFIX}{self.repo}:{self.head_sha}:{self.check_id}"
+
+
+class ResultStore:
+    """Almacén de resultados en Redis, con su cola de reintentos.
+
+    Args:
+      connection: conexión a Redis (la misma de las colas de rq).
+      retry_queue: cola en que se encolan los reintentos de publicación.
+      app_pool: pool con credenciales de la app, para renovar tokens
+          vencidos; sin él, se reintenta con el token original.
+      ttl: tiempo que se guarda cada resultado.
+      max_retries: cantidad de reintentos antes de abandonar.
+    """
+
+    # Si se configura con use(), las tareas guardan sus resultados aquí.
+    default: Optional["ResultStore"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        retry_queue: str = "publish",
+        app_pool: Optional[GitHubPool] = None,
+        ttl: datetime.timedelta = datetime.timedelta(days=7),
+        max_retries: int = 8,
+    ):
+        self.connection = connection
+        self.queue = Queue(retry_queue, connection=connection)
+        self.app_pool = app_pool
+        self.ttl = ttl
+        self.max_retries = max_retries
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "ResultStore":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    def save(self, result: GradingResult):
+        self.connection.set(result.key, result.json(), ex=self.ttl)
+
+    def load(self, key: str) -> Optional[GradingResult]:
+        if (data := self.connection.get(key)) is None:
+            return None
+        return GradingResult.parse_raw(data)
+
+    def publish(
+        self,
+        publisher: CheckRunPublisher,
+        result: GradingResult,
+        auth: AppInstallationTokenAuth,
+    ) -> Optional[Dict]:
+        """Guarda el resultado y lo publica.
+
+        Si la publicación falla, se encola un reintento y se devuelve None:
+        el trabajo de corrección no necesita repetirse.
+        """
+        self.save(result)
+        try:
+            checkrun = publisher.publish(result.conclusion, result.output)
+        except PublishError as ex:
+            self.logger.warning(f"could not publish {result.key}, will retry: {ex}")
+            result.checkrun_id = publisher.checkrun_id
+            self.save(result)
+            self.enqueue_retry(result, auth, attempt=0)
+            return None
+
+        self.mark_published(result, checkrun)
+        return checkrun
+
+    def mark_published(self, result: GradingResult, checkrun: Dict):
+        result.published = True
+        result.checkrun_id = checkrun["id"]
+        self.save(result)
+        metrics.inc("sisyphus_results_total", conclusion=result.conclusion)
+
+    def enqueue_retry(
+        self, result: GradingResult, auth: AppInstallationTokenAuth, *, attempt: int
+    ):
+        if attempt == 0:
+            self.queue.enqueue(republicar, result.key, auth, attempt)
+        else:
+            delay = datetime.timedelta(seconds=min(60 * 2 ** (attempt - 1), 3600))
+            self.queue.enqueue_in(delay, republicar, result.key, auth, attempt)
+
+    def fresh_auth(
+        self, result: GradingResult, auth: AppInstallationTokenAuth
+    ) -> AppInstallationTokenAuth:
+        """Devuelve auth si sigue vigente; si no, un token nuevo (si se puede).
+        """
+        if self.app_pool is None or self.app_pool.is_fresh(auth):
+            return auth
+        return self.app_pool.repo_auth(Repo(result.repo))
+
+
+def republicar(key: str, auth: AppInstallationTokenAuth, attempt: int = 0):
+    """Reintenta publicar un resultado guardado, sin volver a corregir.
+    """
+    logger = logging.getLogger(__name__)
+
+    if (store := ResultStore.default) is None:
+        raise RuntimeError("republicar() requires ResultStore.use() in the worker")
+
+    if (result := store.load(key)) is None:
+        logger.warning(f"result {key} expired before it could be published")
+        return None
+
+    if result.published:
+        return result.checkrun_id
+
+    auth = store.fresh_auth(result, auth)
+    publisher = CheckRunPublisher(
+        default_pool().session(auth),
+        Repo(result.repo),
+        head_sha=result.head_sha,
+        name=result.name,
+        checkrun_id=result.checkrun_id,
+    )
+
+    try:
+        checkrun = publisher.publish(result.conclusion, result.output)
+    except PublishError as ex:
+        if attempt + 1 >= store.max_retries:
+            logger.error(f"giving up on {key} after {attempt + 1} retries: {ex}")
+            raise
+        logger.warning(f"retry {attempt + 1} of {key} failed: {ex}")
+        result.checkrun_id = publisher.checkrun_id
+        store.save(result)
+        store.enqueue_retry(result, auth, attempt=attempt + 1)
+        return None
+
+    store.mark_published(result, checkrun)
+    return checkrun["id"]
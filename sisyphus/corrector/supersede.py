@@ -0,0 +1,163 @@
+"""Reemplazo de trabajos viejos por uno más nuevo de la misma rama.
+
+Antes de una fecha de entrega, un alumno puede hacer muchos push seguidos;
+solo interesa corregir el último. Por cada (repo, rama) se guarda en Redis
+el último head_sha encolado, junto con el id de su trabajo:
+
+  • al encolar uno nuevo, el anterior se saca de su cola si todavía no
+    empezó, y sus check runs se cierran como "cancelled";
+
+  • si ya estaba corriendo, el propio trabajo lo detecta (is_superseded)
+    antes de cada etapa cara, y cierra sus check runs sin terminar.
+
+Solo los push (check_suite.requested) registran su commit: un pedido de
+volver a correr puede ser de un commit viejo, que no debe reemplazar al
+último, ni ser cancelado por él (CorregirJob.supersedable). Y como los
+webhooks pueden llegar desordenados, un push cuyo commit es el "before" del
+ya registrado (esto es, uno más viejo) no lo reemplaza.
+"""
+
+import datetime
+import json
+import logging
+
+from typing import Dict, Optional
+
+from redis import Redis
+from rq.exceptions import NoSuchJobError  # type: ignore
+from rq.job import Job  # type: ignore
+from rq.queue import Queue  # type: ignore
+
+from ..common.github_pool import default_pool
+from ..common.typ import AppInstallationTokenAuth, CorregirJob, Repo
+from ..common.wire import decode_job
+from .fairshare import FairShare
+from .publisher import CheckRunPublisher, PublishError
+
+
+__all__ = [
+    "Supersession",
+    "superseded_output",
+]
+
+
+class Supersession:
+    """Registro en Redis del último commit encolado de cada (repo, rama).
+    """
+
+    # Si se configura con use(), el webhook y los workers lo consultan.
+    default: Optional["Supersession"] = None
+
+    def __init__(
+        self,
+        connection: Redis,
+        *,
+        ttl: datetime.timedelta = datetime.timedelta(days=2),
+        prefix: str = "sisyphus:latest",
+    ):
+        self.connection = connection
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def use(cls, connection: Redis, **kwargs) -> "Supersession":
+        cls.default = cls(connection, **kwargs)
+        return cls.default
+
+    def register(
+        self, repo: Repo, branch: str, sha: str, job_id: str, *, before: str
+    ) -> Optional[Dict]:
+        """Registra el trabajo del push más nuevo de una rama.
+
+        Args:
+          before: el commit anterior de la rama según el push.
+
+        Returns:
+          el registro anterior ({"sha": ..., "job_id": ...}), si lo había y
+          fue reemplazado; None si no lo había, o si el registrado es más
+          nuevo que sha (el webhook de este push llegó tarde).
+        """
+        key = self._key(repo, branch)
+        value = json.dumps(dict(sha=sha, before=before, job_id=job_id))
+        previous = None
+
+        def update(pipe):
+            nonlocal previous
+            data = pipe.get(key)
+            previous = json.loads(data) if data is not None else None
+            if previous is not None and previous.get("before") == sha:
+                previous = None
+                return
+            pipe.multi()
+            pipe.set(key, value, ex=self.ttl)
+
+        self.connection.transaction(update, key)
+        return previous
+
+    def latest_sha(self, repo: Repo, branch: str) -> Optional[str]:
+        if (data := self.connection.get(self._key(repo, branch))) is None:
+            return None
+        return json.loads(data)["sha"]
+
+    def is_superseded(self, job: CorregirJob) -> Optional[str]:
+        """Si hay un commit más nuevo encolado para la rama, devuelve su sha.
+
+        Nunca, para un pedido explícito de volver a correr.
+        """
+        if not job.supersedable:
+            return None
+        latest = self.latest_sha(job.repo, job.head_branch)
+        return latest if latest not in (None, job.head_sha) else None
+
+    def supersede(self, previous: Dict, new_sha: str, auth: AppInstallationTokenAuth):
+        """Saca de su cola el trabajo anterior, y si estaba, cierra sus check runs.
+
+        Se lo saca con un único LREM: si un worker lo desencoló mientras
+        tanto, LREM no encuentra nada, y el trabajo en curso se encarga él
+        mismo (ver is_superseded).
+        """
+        logger = logging.getLogger(__name__)
+        if previous["sha"] == new_sha:
+            return
+        try:
+            old_job = Job.fetch(previous["job_id"], connection=self.connection)
+        except NoSuchJobError:
+            return
+        queue_key = Queue(old_job.origin, connection=self.connection).key
+        if self.connection.lrem(queue_key, 1, old_job.id) != 1:
+            return
+
+        old_job.delete(remove_from_queue=False)
+        FairShare(self.connection).release(old_job.meta)
+        corregir_job = decode_job(old_job.args[0])
+        logger.info(
+            f"superseded {corregir_job.repo.full_name}@{corregir_job.head_sha[:7]}"
+            f" by {new_sha[:7]}"
+        )
+        for check_id, check in corregir_job.checks.items():
+            if (checkrun_id := corregir_job.checkrun_ids.get(check_id)) is None:
+                continue
+            publisher = CheckRunPublisher(
+                default_pool().session(auth),
+                corregir_job.repo,
+                head_sha=corregir_job.head_sha,
+                name=check.name,
+                checkrun_id=checkrun_id,
+            )
+            try:
+                publisher.publish("cancelled", superseded_output(new_sha))
+            except PublishError as ex:
+                logger.warn(f"could not close superseded check run: {ex}")
+
+    def _key(self, repo: Repo, branch: str) -> str:
+        return f"{self.prefix}:{repo.full_name}:{branch}"
+
+
+def superseded_output(new_sha: str) -> Dict:
+    """Output del check run de un commit reemplazado por otro más nuevo.
+    """
+    return dict(
+        title="Reemplazado por un commit más nuevo",
+        summary=f"No se corrigió este commit; se corrige en su lugar {new_sha[:7]}.",
+        text="",
+    )
@@ -1,16 +1,26 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import logging
 import pathlib
 import re
 import subprocess
 import sys
 
-import github
-import github3  # type: ignore
+from typing import Dict, Optional, Union
 
-from ..common import github_utils
+from ..common import metrics, tracing
+from ..common.github_pool import default_pool
 from ..common.typ import CorregirJob
-from .alu_repo import GithubAluRepo
+from ..common.wire import decode_job
+from .alu_repo import AluRepo, GithubAluRepo
 from .base import CorrectorBase
+from .prefetch import CachedAluRepo, SubmissionCache
+from .publisher import CheckRunPublisher
+from .results import GradingResult, ResultStore
+from .supersede import Supersession, superseded_output
 from .tests_repo import FilesystemTestsRepo
+from .typ import Check
 
 
 TEST_PATHS = {
@@ -18,46 +28,313 @@ TEST_PATHS = {
 }
 
 
-def post_checkrun(job, checkrun_attrs):
-    """Crea o actualiza un check_run en el repositorio."""
-    # We use github3.py here, because PyGithub has no Checks API yet:
-    # https://github.com/PyGithub/PyGithub/issues/1063
-    session = github3.session.GitHubSession()
-    session.app_installation_token_auth(job.installation_auth.as_dict())
-    github_utils.configure_retries(session)
+def checkrun_publisher(job: CorregirJob, check_id: str, check: Check):
+    """Devuelve el CheckRunPublisher del check run de un check.
+    """
+    # We write check runs directly over the pooled session, because PyGithub
+    # has no Checks API yet: https://github.com/PyGithub/PyGithub/issues/1063
+    return CheckRunPublisher(
+        default_pool().session(job.installation_auth),
+        job.repo,
+        head_sha=job.head_sha,
+        name=check.name,
+        checkrun_id=job.checkrun_ids.get(check_id),
+    )
 
-    gh3 = github3.GitHub(session=session)
-    repo = gh3.repository(job.repo.owner, job.repo.name)
-    checkrun = repo.check_run(job.checkrun_id) if job.checkrun_id else None
 
-    if not checkrun:
-        checkrun = repo.create_check_run(**checkrun_attrs)
-    else:
-        checkrun_attrs.pop("head_sha")
-        checkrun.update(**checkrun_attrs)
+def corregir_entrega(job: Union[bytes, CorregirJob]):
+    """Corrige todos los checks de una entrega a partir de una única descarga.
+
+    Los checks se ejecutan en paralelo, y cada uno publica su check run en
+    cuanto termina. Si alguno falla, se relanza su excepción al final.
+
+    Si mientras tanto se encoló un commit más nuevo de la misma rama, los
+    checks pendientes se cierran como "cancelled" sin correrlos.
+
+    El trabajo llega en el formato de common.wire (o, de un productor
+    anterior, como CorregirJob).
+    """
+    job = decode_job(job)
+    with stage(job, "prepare"):
+        corr, checks, publishers = prepare_job(job)
+
+    if new_sha := superseded_by(job):
+        return collect_checkruns(
+            {
+                check_id: publish_superseded(job, check_id, publisher, new_sha)
+                for check_id, publisher in publishers.items()
+            }
+        )
+
+    for publisher in publishers.values():
+        publisher.start()
 
-    return checkrun
+    with stage(job, "fetch"):
+        test_files, entrega_files = corr.get_files(job.alu_dir, job.head_sha)
 
+    def corregir_check(check_id, check):
+        with stage(job, "tar", check=check_id):
+            tar = corr.build_tar(test_files, entrega_files, check)
+        with tar:
+            return corregir_tar(check_id, check, tar)
 
-def corregir_entrega(job: CorregirJob):
+    def corregir_tar(check_id, check, tar):
+        if check.build_stage:
+            with stage(job, "build", check=check_id):
+                compiles, output = corr.run_build(tar)
+            if not compiles:
+                return publish_result(
+                    job, check_id, publishers[check_id], *build_failure(output)
+                )
+        if new_sha := superseded_by(job):
+            return publish_superseded(job, check_id, publishers[check_id], new_sha)
+        with stage(job, "corrector", check=check_id):
+            output = corr.run_corrector(tar)
+        return publish_output(job, check_id, publishers[check_id], output)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        futures = {
+            check_id: pool.submit(corregir_check, check_id, check)
+            for check_id, check in checks.items()
+        }
+        concurrent.futures.wait(futures.values())
+
+    return collect_checkruns(
+        {check_id: f.exception() or f.result() for check_id, f in futures.items()}
+    )
+
+
+async def corregir_entrega_async(job: Union[bytes, CorregirJob], executor=None):
+    """Versión asyncio de corregir_entrega(), para aio_worker.
+
+    El corrector corre como subproceso asyncio; las llamadas a GitHub (que
+    son bloqueantes) se delegan al executor, de modo que muchos trabajos
+    pueden estar en curso a la vez en un único proceso.
     """
+    loop = asyncio.get_running_loop()
+    job = decode_job(job)
+
+    def run(func, *args):
+        return loop.run_in_executor(executor, func, *args)
+
+    with stage(job, "prepare"):
+        corr, checks, publishers = await run(prepare_job, job)
+
+    if new_sha := await run(superseded_by, job):
+        results = await asyncio.gather(
+            *(
+                run(publish_superseded, job, check_id, publisher, new_sha)
+                for check_id, publisher in publishers.items()
+            ),
+            return_exceptions=True,
+        )
+        return collect_checkruns(dict(zip(publishers, results)))
+
+    await asyncio.gather(*(run(p.start) for p in publishers.values()))
+
+    with stage(job, "fetch"):
+        test_files, entrega_files = await run(
+            corr.get_files, job.alu_dir, job.head_sha
+        )
+
+    async def corregir_check(check_id, check):
+        with stage(job, "tar", check=check_id):
+            tar = await run(corr.build_tar, test_files, entrega_files, check)
+        with tar:
+            return await corregir_tar(check_id, check, tar)
+
+    async def corregir_tar(check_id, check, tar):
+        if check.build_stage:
+            with stage(job, "build", check=check_id):
+                compiles, output = await corr.run_build_async(tar)
+            if not compiles:
+                conclusion, checkrun_output = build_failure(output)
+                return await run(
+                    publish_result,
+                    job,
+                    check_id,
+                    publishers[check_id],
+                    conclusion,
+                    checkrun_output,
+                )
+        if new_sha := await run(superseded_by, job):
+            return await run(
+                publish_superseded, job, check_id, publishers[check_id], new_sha
+            )
+        with stage(job, "corrector", check=check_id):
+            output = await corr.run_corrector_async(tar)
+        return await run(publish_output, job, check_id, publishers[check_id], output)
+
+    results = await asyncio.gather(
+        *(corregir_check(check_id, check) for check_id, check in checks.items()),
+        return_exceptions=True,
+    )
+    return collect_checkruns(dict(zip(checks, results)))
+
+
+@contextlib.contextmanager
+def stage(job: CorregirJob, name: str, **attrs):
+    """Mide una etapa: histograma de métricas, y span en la traza del trabajo.
     """
-    auth = job.installation_auth
+    with metrics.timer("sisyphus_stage_seconds", stage=name):
+        with tracing.span(job.trace_id, name, **attrs):
+            yield
+
 
-    gh = github.Github(login_or_token=auth.token.get_secret_value())
-    alu_repo = GithubAluRepo(gh.get_repo(job.repo.full_name))
+def prepare_job(job: CorregirJob):
+    """Construye el corrector, y los publishers de los checks de un trabajo.
+
+    Returns:
+      una tupla (CorrectorBase, checks, publishers), los dos últimos
+      indexados por id de check.
+    """
+    pool = default_pool()
+    # Un cliente por trabajo: en aio_worker, varios trabajos del mismo token
+    # usan a la vez los threads del executor.
+    gh = pool.new_pygithub(job.installation_auth)
+    alu_repo: AluRepo = GithubAluRepo(
+        gh.get_repo(job.repo.full_name), pool.session(job.installation_auth)
+    )
+    if SubmissionCache.default is not None:
+        alu_repo = CachedAluRepo(alu_repo, SubmissionCache.default, job.repo)
     tests_loc = FilesystemTestsRepo(TEST_PATHS[job.materia] / job.head_branch)
 
-    branch = job.head_branch
-    corr = CorrectorBase(alu_repo, tests_loc)
-    try:
-        output = corr.corregir_entrega(branch, job.head_sha).decode(
-            "utf-8", errors="replace"
+    checks = job.checks or {job.head_branch: Check(name=f"Pruebas {job.head_branch}")}
+    publishers = {
+        check_id: checkrun_publisher(job, check_id, check)
+        for check_id, check in checks.items()
+    }
+
+    return CorrectorBase(alu_repo, tests_loc), checks, publishers
+
+
+def superseded_by(job: CorregirJob) -> Optional[str]:
+    """Devuelve el sha del commit que reemplazó al del trabajo, si lo hay.
+    """
+    if (supersession := Supersession.default) is None:
+        return None
+    return supersession.is_superseded(job)
+
+
+def publish_superseded(
+    job: CorregirJob, check_id: str, publisher: CheckRunPublisher, new_sha: str
+):
+    """Cierra el check run de un commit reemplazado por otro más nuevo.
+    """
+    return publish_result(
+        job, check_id, publisher, "cancelled", superseded_output(new_sha)
+    )
+
+
+def collect_checkruns(results):
+    """Devuelve los check runs publicados por cada check.
+
+    Args:
+      results: diccionario {check_id: resultado}, donde el resultado es el
+          check run publicado, o la excepción que ocurrió en ese check.
+
+    Las excepciones de cada check se registran; la primera se relanza.
+    """
+    logger = logging.getLogger(__name__)
+    checkruns = {}
+    first_exc = None
+
+    for check_id, result in results.items():
+        if isinstance(result, subprocess.CalledProcessError):
+            print(f"ERROR: {result.output}", file=sys.stderr)
+        elif isinstance(result, BaseException):
+            logger.error(f"check {check_id!r} failed: {result}")
+        else:
+            checkruns[check_id] = result
+            continue
+        first_exc = first_exc or result
+
+    if first_exc is not None:
+        raise first_exc from first_exc
+
+    return checkruns
+
+
+def publish_output(
+    job: CorregirJob, check_id: str, publisher: CheckRunPublisher, output: bytes
+):
+    """Publica en el check run correspondiente la salida del corrector.
+
+    Si hay un ResultStore configurado, el resultado se guarda antes de
+    publicarlo, y un fallo al publicar se reintenta aparte (sin relanzar
+    la excepción). En ese caso, se devuelve None.
+    """
+    with stage(job, "convert", check=check_id):
+        conclusion, checkrun_output = checkrun_result(
+            output.decode("utf-8", errors="replace")
+        )
+    return publish_result(job, check_id, publisher, conclusion, checkrun_output)
+
+
+def publish_result(
+    job: CorregirJob,
+    check_id: str,
+    publisher: CheckRunPublisher,
+    conclusion: str,
+    checkrun_output: Dict,
+):
+    """Publica una conclusión y output ya calculados (ver publish_output).
+    """
+    checkrun_output = with_trace_summary(job, checkrun_output)
+
+    with stage(job, "publish", check=check_id):
+        if (store := ResultStore.default) is None:
+            checkrun = publisher.publish(conclusion, checkrun_output)
+            metrics.inc("sisyphus_results_total", conclusion=conclusion)
+            return checkrun
+
+        # Con ResultStore, el resultado se cuenta al marcarlo publicado.
+        result = GradingResult(
+            repo=job.repo.full_name,
+            head_sha=job.head_sha,
+            check_id=check_id,
+            name=publisher.name,
+            checkrun_id=publisher.checkrun_id,
+            conclusion=conclusion,
+            output=checkrun_output,
         )
-    except subprocess.CalledProcessError as ex:
-        print(f"ERROR: {ex.output}", file=sys.stderr)
-        raise ex from ex
+        return store.publish(publisher, result, job.installation_auth)
+
+
+def with_trace_summary(job: CorregirJob, checkrun_output: Dict) -> Dict:
+    """Agrega al output del check run el resumen de la traza hasta ahora.
+
+    Solo si el Tracer se configuró con check_summary: si no, la traza se
+    consulta con la herramienta trace (a partir del id del trabajo).
+    """
+    if job.trace_id is None or (tracer := tracing.Tracer.default) is None:
+        return checkrun_output
+    if not tracer.check_summary:
+        return checkrun_output
+    try:
+        spans = tracer.spans(job.trace_id)
+    except Exception:
+        return checkrun_output
+    if not (summary := tracing.summary_markdown(job.trace_id, spans)):
+        return checkrun_output
+    text = checkrun_output.get("text") or ""
+    return dict(checkrun_output, text=f"{text}\n\n{summary}".lstrip())
+
+
+def build_failure(output: bytes):
+    """Conclusión y output del check run de una entrega que no compila.
+    """
+    text = output.decode("utf-8", errors="replace")
+    return "failure", dict(
+        title="No compila",
+        summary="La entrega no compila; no se corrieron las pruebas",
+        text=f"```\n{text}\n```",
+    )
+
 
+def checkrun_result(output: str):
+    """Obtiene conclusión y output del check run a partir de la salida del worker.
+    """
     if not (m := re.search(r"^(Todo OK|ERROR)$", output, re.M)):
         conclusion = "cancelled"
         checkrun_output = dict(
@@ -73,17 +350,4 @@ def corregir_entrega(job: CorregirJob):
             text=f"```\n{output}\n```",
         )
 
-    checkrun = post_checkrun(
-        job,
-        dict(
-            name=f"Pruebas {branch}",
-            head_sha=job.head_sha,
-            conclusion=conclusion,
-            output=checkrun_output,
-        ),
-    )
-
-    # We set details_url to have a direct link available in Reviewable.
-    checkrun.update(details_url=checkrun.html_url, output=checkrun_output)
-
-    return checkrun
+    return conclusion, checkrun_output
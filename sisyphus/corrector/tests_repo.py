@@ -1,11 +1,12 @@
 import logging
 import os
 import pathlib
+import threading
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, List, Tuple
 
-from ..common.typ import RepoFile
+from ..common.typ import SPILL_THRESHOLD, RepoFile
 
 
 class TestsRepo(ABC):
@@ -17,8 +18,17 @@ class TestsRepo(ABC):
 
 
 class FilesystemTestsRepo(TestsRepo):
+    """TestsRepo que lee los archivos de un directorio local.
+
+    La lista de archivos se guarda en un caché a nivel de proceso (invalidado
+    si cambia algún archivo), de modo que un worker que precarga los tests
+    antes de hacer fork() no los vuelve a recorrer en cada trabajo. Los
+    archivos chicos se guardan en memoria; los grandes se leen del disco
+    recién al armar el tar.
     """
-    """
+
+    _cache: Dict[pathlib.Path, Tuple[Tuple, List[RepoFile]]] = {}
+    _cache_lock = threading.Lock()
 
     def __init__(self, tests_dir: pathlib.Path):
         self.logger = logging.getLogger(__name__)
@@ -27,6 +37,34 @@ class FilesystemTestsRepo(TestsRepo):
     def get_tests(self) -> List[RepoFile]:
         """
         """
+        stamp = self._stamp()
+
+        with self._cache_lock:
+            cached = self._cache.get(self.tests_dir)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+
+        repo_files = self._read_tests()
+
+        with self._cache_lock:
+            self._cache[self.tests_dir] = (stamp, repo_files)
+
+        return repo_files
+
+    def _stamp(self) -> Tuple:
+        """Firma del directorio (ruta, tamaño y mtime de cada archivo).
+        """
+        stamp = []
+        for dirname, _dirs, files in os.walk(self.tests_dir, followlinks=True):
+            for filename in files:
+                try:
+                    stat = os.stat(os.path.join(dirname, filename))
+                except OSError:
+                    continue
+                stamp.append((dirname, filename, stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(stamp))
+
+    def _read_tests(self) -> List[RepoFile]:
         toplevel = self.tests_dir
         repo_files: List[RepoFile] = []
 
@@ -34,6 +72,10 @@ class FilesystemTestsRepo(TestsRepo):
             stat = full_path.stat()
             rel_path = full_path.relative_to(toplevel).as_posix()
             try:
+                if stat.st_size > SPILL_THRESHOLD:
+                    return RepoFile.from_disk(
+                        rel_path, full_path, stat.st_mode, size=stat.st_size
+                    )
                 with open(full_path, "rb") as fileobj:
                     return RepoFile(
                         path=rel_path, contents=fileobj.read(), mode=stat.st_mode
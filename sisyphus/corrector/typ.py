@@ -1,23 +1,15 @@
-from pathlib import Path
-from typing import List, Optional
+from typing import List
 
 from pydantic.dataclasses import dataclass
 
+# Check vive en common (CorregirJob lo usa); se reexporta aquí.
+from ..common.typ import Check
 
-@dataclass
-class Check:
-    """Clase que representa una corrección (un check run).
 
-    Args:
-      • name: nombre visible en Github, por ejemplo "Pruebas datalab"
-      • alu_files: lista de archivos a corregir, por ejemplo ["bits.c"]. (Si
-            no se especifica, se usan todos los archivos en Entrega.alu_dir.)
-      • test_files: ídem, con los archivos que componen los tests.
-    """
-
-    name: str
-    alu_files: Optional[List[Path]] = None
-    test_files: Optional[List[Path]] = None
+__all__ = [
+    "Check",
+    "Entrega",
+]
 
 
 @dataclass
@@ -0,0 +1,415 @@
+"""Worker de rq para corrector.tasks, con módulos y tests precargados.
+
+El worker estándar de rq hace fork() de un proceso nuevo por trabajo; si
+el proceso padre no importó nada, cada trabajo vuelve a importar github,
+github3 y compañía, y a leer los tests del disco. Aquí se ofrecen dos modos:
+
+  • "fork": el padre precarga todo antes de entrar al loop de rq, y los
+    hijos lo heredan (copy-on-write).
+
+  • "recycle": el padre precarga todo y hace fork() de un worker de larga
+    vida (rq.SimpleWorker) que corre los trabajos en su propio proceso;
+    tras N trabajos termina y el padre lanza uno nuevo.
+
+En ambos casos se mide el overhead de cada trabajo (todo lo que no es la
+función del trabajo en sí), y se lo reporta en el log y en job.meta.
+
+Si se configuró FairShare.default, las colas del worker se expanden en sus
+sub-colas por materia, reordenadas antes de cada desencolado; un thread
+del worker anuncia en Redis que las lee (ver FairShare.register). Si se
+configuró Affinity.default, el mismo thread anuncia las materias de su
+nodo, y el worker lee además la cola propia del nodo (ver
+corrector.affinity).
+"""
+
+import datetime
+import importlib
+import logging
+import os
+import signal
+import threading
+import time
+
+from typing import Any, Iterable, List, Optional, Type
+
+from redis import Redis
+from rq import Queue, SimpleWorker, Worker  # type: ignore
+from rq.exceptions import NoSuchJobError  # type: ignore
+from rq.job import Job  # type: ignore
+from rq.queue import DequeueTimeout  # type: ignore
+from rq.worker import WorkerStatus  # type: ignore
+
+from ..common import metrics, tracing
+from .affinity import Affinity
+from .fairshare import FairShare
+
+
+__all__ = [
+    "FairShareMixin",
+    "PreloadedWorker",
+    "RecyclingWorker",
+    "preload",
+    "record_job_end",
+    "record_job_start",
+    "run_recycling",
+]
+
+PRELOAD_MODULES = [
+    "github",
+    "github3",
+    "requests",
+    "sisyphus.common.github_pool",
+    "sisyphus.common.github_tap",
+    "sisyphus.common.github_utils",
+    "sisyphus.corrector.tasks",
+]
+
+
+def preload(modules: Iterable[str] = PRELOAD_MODULES):
+    """Importa los módulos del corrector, y carga en caché los tests.
+
+    Returns:
+      la cantidad de directorios de tests precargados.
+    """
+    logger = logging.getLogger(__name__)
+    start = time.monotonic()
+
+    for module in modules:
+        importlib.import_module(module)
+
+    from .tasks import TEST_PATHS
+    from .tests_repo import FilesystemTestsRepo
+
+    num_dirs = 0
+    for materia_dir in TEST_PATHS.values():
+        if not materia_dir.is_dir():
+            continue
+        for entrega_dir in materia_dir.iterdir():
+            if entrega_dir.is_dir():
+                FilesystemTestsRepo(entrega_dir).get_tests()
+                num_dirs += 1
+
+    elapsed = time.monotonic() - start
+    logger.info(f"preloaded {num_dirs} test directories in {elapsed:.3f}s")
+    return num_dirs
+
+
+def record_job_start(job, queue):
+    """Registra cuánto esperó el trabajo en la cola (métricas y traza).
+    """
+    if job.enqueued_at is not None:
+        enqueued = job.enqueued_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+        wait = time.time() - enqueued
+        metrics.observe("sisyphus_queue_wait_seconds", wait, queue=queue.name)
+        tracing.record(job.meta.get("trace_id"), "dequeue", enqueued, queue=queue.name)
+
+
+def record_job_end(job, queue, ok: bool, *, flush: bool = True):
+    """Cuenta el trabajo terminado, y vuelca las métricas del proceso.
+
+    El flush es necesario con fork(): el proceso del trabajo termina sin
+    esperar al thread de flush.
+    """
+    status = "finished" if ok else "failed"
+    metrics.inc("sisyphus_jobs_total", queue=queue.name, status=status)
+    if flush:
+        metrics.flush()
+
+
+class TimedJob(Job):
+    """Job que registra cuánto tardó la función del trabajo en sí.
+    """
+
+    def perform(self):
+        start = time.monotonic()
+        try:
+            return super().perform()
+        finally:
+            self.perform_secs = time.monotonic() - start
+
+
+class OverheadMixin:
+    """Mide y reporta el overhead por trabajo de un worker de rq.
+
+    Se llama overhead a la diferencia entre el tiempo total de ejecución
+    (incluyendo fork, si lo hay, y la actualización de registros en Redis) y
+    el tiempo de la función del trabajo.
+    """
+
+    job_class = TimedJob
+
+    # Atributos de rq.Worker.
+    log: logging.Logger
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.overhead_total = 0.0
+        self.overhead_jobs = 0
+
+    def perform_job(self, job, queue, heartbeat_ttl=None):
+        start = time.monotonic()
+        record_job_start(job, queue)
+        result = super().perform_job(job, queue, heartbeat_ttl)
+        record_job_end(job, queue, result)
+        perform_secs = getattr(job, "perform_secs", None)
+        # Con result_ttl=0 rq ya borró el trabajo; save_meta() lo recrearía.
+        if perform_secs is not None and job.result_ttl != 0:
+            job.meta["timings"] = {
+                "horse": time.monotonic() - start,
+                "perform": perform_secs,
+            }
+            job.save_meta()
+        return result
+
+    def execute_job(self, job, queue):
+        start = time.monotonic()
+        super().execute_job(job, queue)
+        total = time.monotonic() - start
+
+        if not isinstance(self, SimpleWorker):
+            # El trabajo corrió en otro proceso: leer los tiempos de Redis.
+            try:
+                job.refresh()
+            except NoSuchJobError:
+                # Ya se borró (result_ttl=0, o limpieza): no hay tiempos.
+                return
+
+        if "perform" in (timings := job.meta.get("timings", {})):
+            self.report_overhead(job, total, total - timings["perform"])
+
+    def report_overhead(self, job, total: float, overhead: float):
+        self.overhead_total += overhead
+        self.overhead_jobs += 1
+        average = self.overhead_total / self.overhead_jobs
+        self.log.info(
+            f"job {job.id}: total {total:.3f}s, overhead {overhead * 1000:.1f}ms "
+            f"(average {average * 1000:.1f}ms over {self.overhead_jobs} jobs)"
+        )
+
+
+class FairShareMixin:
+    """Desencola según FairShare.default y Affinity.default, si están
+    configurados.
+
+    Las colas pedidas al crear el worker se guardan aparte; self.queues se
+    recalcula (sub-colas nuevas, orden según el uso, cola del nodo) cada vez
+    que se desencola, o a lo sumo cada fair_refresh segundos mientras se
+    espera.
+    """
+
+    fair_refresh = 5
+    advertise_interval = 10
+
+    # Atributos de rq.Worker.
+    log: logging.Logger
+    queues: List[Queue]
+    connection: Redis
+    queue_class: Type[Queue]
+    job_class: Type[Job]
+    serializer: Any
+
+    _advertiser_pid: Optional[int] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested_queues = self.queue_names()
+        self._queue_cache = {queue.name: queue for queue in self.queues}
+
+    def fair_queues(self) -> List:
+        """Las colas de las que desencolar, en orden.
+        """
+        fair, affinity = FairShare.default, Affinity.default
+        if fair is None and affinity is None:
+            return self.queues
+        self._ensure_advertiser()
+        names = self.requested_queues
+        if fair is not None:
+            names = fair.queue_names(names)
+        if affinity is not None:
+            names = affinity.queue_names(names)
+        self.queues = [self._fair_queue(name) for name in names]
+        return self.queues
+
+    def reroute(self, job) -> bool:
+        """Devuelve a la cola de su materia un trabajo que el nodo no puede
+        correr (ver Affinity.misrouted).
+        """
+        if (affinity := Affinity.default) is None:
+            return False
+        if (target := affinity.misrouted(job)) is None:
+            return False
+        queue_name, materia = target
+        self.log.info(f"{job.id}: no tests for {materia} here, moving to {queue_name}")
+        self._fair_queue(queue_name).enqueue_job(job, at_front=True)
+        return True
+
+    def _fair_queue(self, name: str):
+        if (queue := self._queue_cache.get(name)) is None:
+            queue = self._queue_cache[name] = self.queue_class(
+                name,
+                connection=self.connection,
+                job_class=self.job_class,
+                serializer=self.serializer,
+            )
+        return queue
+
+    def dequeue_job_and_maintain_ttl(self, timeout):
+        if FairShare.default is None and Affinity.default is None:
+            return super().dequeue_job_and_maintain_ttl(timeout)
+
+        self.set_state(WorkerStatus.IDLE)
+        while True:
+            self.heartbeat()
+            if self.should_run_maintenance_tasks:
+                self.run_maintenance_tasks()
+
+            queues = self.fair_queues()
+            self.procline(f"Listening on {','.join(q.name for q in queues)}")
+            wait = timeout if timeout is None else min(timeout, self.fair_refresh)
+            try:
+                result = self.queue_class.dequeue_any(
+                    queues, wait, connection=self.connection, job_class=self.job_class
+                )
+            except DequeueTimeout:
+                # Sub-colas nuevas, o cambió el orden: volver a calcularlas.
+                continue
+            if result is not None:
+                job, queue = result
+                if self.reroute(job):
+                    continue
+                self.log.info(f"{queue.name}: {job.description} ({job.id})")
+            break
+
+        self.heartbeat()
+        return result
+
+    def execute_job(self, job, queue):
+        start = time.monotonic()
+        try:
+            super().execute_job(job, queue)
+        finally:
+            self.fair_finish(job, time.monotonic() - start)
+
+    def advertise(self):
+        """Anuncia en Redis lo que lee el worker (ver FairShare.register), y
+        las materias del nodo (ver Affinity.advertise); además, recupera los
+        trabajos de los nodos caídos (ver Affinity.reap).
+        """
+        if (fair := FairShare.default) is not None:
+            fair.register()
+        if (affinity := Affinity.default) is not None:
+            affinity.advertise(force=True)
+            affinity.reap()
+
+    def _ensure_advertiser(self):
+        """Lanza el thread que renueva los anuncios (uno por proceso).
+
+        Es un thread, y no parte del loop de desencolado, porque este no
+        corre mientras se ejecuta un trabajo (con fork(), o en SimpleWorker).
+        """
+        if self._advertiser_pid == os.getpid():
+            return
+        self._advertiser_pid = os.getpid()
+        self.advertise()
+        thread = threading.Thread(
+            target=self._advertise_loop, name="sisyphus advertiser", daemon=True
+        )
+        thread.start()
+
+    def _advertise_loop(self):
+        while True:
+            time.sleep(self.advertise_interval)
+            try:
+                self.advertise()
+            except Exception as ex:
+                self.log.warning(f"could not advertise worker: {ex}")
+
+    def fair_finish(self, job, seconds: float):
+        if job.meta.get("fair") is not None:
+            # Se descuenta aunque este worker no tenga reparto (p.ej. si lee
+            # las sub-colas explícitamente): si no, el repo queda trabado.
+            fair = FairShare.default or FairShare(self.connection)
+            try:
+                fair.finish(job.meta, seconds)
+            except Exception as ex:
+                self.log.warning(f"could not account job {job.id}: {ex}")
+        if (affinity := Affinity.default) is not None:
+            try:
+                affinity.finish(job)
+            except Exception as ex:
+                self.log.warning(f"could not record warmth of job {job.id}: {ex}")
+
+
+class PreloadedWorker(FairShareMixin, OverheadMixin, Worker):
+    """Worker con fork() por trabajo, en que el padre precarga los módulos.
+    """
+
+    def work(self, *args, **kwargs):
+        preload()
+        return super().work(*args, **kwargs)
+
+
+class RecyclingWorker(FairShareMixin, OverheadMixin, SimpleWorker):
+    """Worker sin fork() por trabajo; se recicla con work(max_jobs=N).
+    """
+
+
+def run_recycling(
+    queues: List,
+    connection,
+    *,
+    max_jobs: int,
+    burst=False,
+    with_scheduler=False,
+    max_backoff: float = 60,
+):
+    """Corre RecyclingWorker en procesos hijos, relanzándolos cada max_jobs.
+
+    El padre precarga los módulos una sola vez; cada hijo nace ya "caliente".
+    Si un hijo termina con error (p.ej. Redis caído), se espera antes de
+    lanzar el siguiente, el doble cada vez, hasta max_backoff segundos.
+    """
+    logger = logging.getLogger(__name__)
+    preload()
+    stopping = False
+    pid = 0
+    backoff = 0.0
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        if pid:
+            # El hijo termina el trabajo en curso (warm shutdown de rq).
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while not stopping:
+        if (pid := os.fork()) == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                worker = RecyclingWorker(queues, connection=connection)
+                worker.work(
+                    burst=burst, max_jobs=max_jobs, with_scheduler=with_scheduler
+                )
+            except BaseException:
+                logger.exception("recycling worker failed")
+                os._exit(1)
+            os._exit(0)
+
+        _, status = os.waitpid(pid, 0)
+        pid = 0
+
+        if burst:
+            break
+        if status != 0:
+            backoff = min(max(backoff * 2, 1), max_backoff)
+            logger.warning(f"worker exited with status {status}, waiting {backoff}s")
+            deadline = time.monotonic() + backoff
+            while not stopping and time.monotonic() < deadline:
+                time.sleep(min(1, deadline - time.monotonic()))
+        elif not stopping:
+            backoff = 0
+            logger.info(f"recycling worker after {max_jobs} jobs")
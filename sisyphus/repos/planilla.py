@@ -1,11 +1,19 @@
-from typing import ClassVar, Optional
+import concurrent.futures
+import logging
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import ClassVar, Dict, List, Optional
 
 from ..common import sheets
 from ..common.models import Model, parse_rows
 
 
 __all__ = [
+    "RepoInfo",
     "ReposDB",
+    "ReposRegistry",
 ]
 
 
@@ -48,3 +56,117 @@ class ReposDB(sheets.PullDB):
         """Devuelve verdadero si el repositorio existe en alguna materia.
         """
         return repo_full in self.data
+
+
+@dataclass(frozen=True)
+class RepoInfo:
+    """Lo que se sabe de un repositorio: su materia y de quién es.
+
+    Si el repo figura como repo_grupal de alguna fila, legajo es el del
+    alumno de esa fila.
+    """
+
+    materia: Optional[str]
+    legajo: str
+    grupo: Optional[str]
+    repo_grupal: Optional[str]
+
+
+class ReposRegistry:
+    """Índice único de los repositorios de todas las materias.
+
+    Cada materia tiene su propia planilla (un ReposDB); las que no tienen
+    datos se descargan en paralelo, y el índice {repo: RepoInfo} se
+    reconstruye solo cuando alguna de ellas cambia (p.ej. tras una
+    actualización en segundo plano).
+
+    Args:
+      dbs: un ReposDB por materia.
+      max_workers: descargas simultáneas.
+      retry_after: segundos durante los cuales, tras fallar la descarga de
+          una planilla sin datos, no se la reintenta al buscar un repo (el
+          índice se arma mientras tanto sin ella).
+    """
+
+    def __init__(
+        self,
+        dbs: Dict[Optional[str], ReposDB],
+        *,
+        max_workers: int = 8,
+        retry_after: float = 60,
+    ):
+        self.dbs = dbs
+        self.max_workers = max_workers
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._index: Dict[str, RepoInfo] = {}
+        self._sources: List[Dict] = []
+        self._retry_at: Dict[Optional[str], float] = {}
+
+    def refresh(self, *, only_missing=False):
+        """Descarga en paralelo las planillas.
+
+        Con only_missing, solo las que no tengan datos y no hayan fallado
+        hace menos de retry_after segundos.
+        """
+        logger = logging.getLogger(__name__)
+        now = time.monotonic()
+        dbs = {
+            m: db
+            for m, db in self.dbs.items()
+            if not only_missing
+            or (not db.loaded and self._retry_at.get(m, 0) <= now)
+        }
+        if not dbs:
+            return
+
+        workers = min(self.max_workers, len(dbs))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(db.refresh): m for m, db in dbs.items()}
+            for future in concurrent.futures.as_completed(futures):
+                materia = futures[future]
+                if (ex := future.exception()) is not None:
+                    logger.error(f"could not fetch repos of {materia}: {ex}")
+                    self._retry_at[materia] = time.monotonic() + self.retry_after
+                else:
+                    self._retry_at.pop(materia, None)
+
+    def lookup(self, /, repo_full: str) -> Optional[RepoInfo]:
+        """Devuelve la materia y datos de un repositorio, o None si no se conoce.
+        """
+        return self.index().get(repo_full)
+
+    def is_repo_known(self, /, repo_full: str):
+        """Devuelve verdadero si el repositorio existe en alguna materia.
+        """
+        return repo_full in self.index()
+
+    def index(self) -> Dict[str, RepoInfo]:
+        if not all(db.loaded for db in self.dbs.values()):
+            self.refresh(only_missing=True)
+
+        datas = [(m, db.get()) for m, db in self.dbs.items() if db.loaded]
+
+        with self._lock:
+            # Se compara por identidad: cada refresh() produce un dict nuevo.
+            if len(datas) != len(self._sources) or any(
+                data is not old for (_, data), old in zip(datas, self._sources)
+            ):
+                self._index = build_index(datas)
+                self._sources = [data for _, data in datas]
+            return self._index
+
+
+def build_index(datas) -> Dict[str, RepoInfo]:
+    """Combina los datos de cada ReposDB en un único diccionario.
+    """
+    index = {}
+    for materia, repos in datas:
+        for repo, row in repos.items():
+            index[repo] = RepoInfo(
+                materia=materia,
+                legajo=row.legajo,
+                grupo=row.grupo,
+                repo_grupal=row.repo_grupal,
+            )
+    return index
@@ -0,0 +1,220 @@
+"""Índice de repositorios compartido en Redis entre procesos.
+
+Con ReposRegistry, cada proceso descarga y parsea todas las planillas, y
+guarda su propia copia. SharedReposIndex guarda el índice ya parseado en
+Redis, como un hash versionado:
+
+  • sisyphus:repos:version          número de la versión vigente;
+  • sisyphus:repos:v<N>             hash {repo: RepoInfo en JSON};
+  • sisyphus:repos:leader           lock del proceso que actualiza.
+
+Un único proceso (el que obtiene el lock) descarga las planillas y publica
+una versión nueva; el resto solo lee, con un caché local por versión.
+
+Una versión nunca omite una materia: si la planilla de alguna no se pudo
+descargar nunca en el proceso que publica, se copian sus repos de la
+versión vigente; y si no la hay, no se publica.
+"""
+
+import dataclasses
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from typing import Dict, Optional, Set
+
+from redis import Redis
+
+from .planilla import RepoInfo, ReposRegistry
+
+
+__all__ = [
+    "SharedReposIndex",
+]
+
+
+class SharedReposIndex:
+    """Índice {repo: RepoInfo} en Redis, con un caché local de lectura.
+
+    Args:
+      connection: conexión a Redis.
+      registry: planillas de donde construir el índice (solo las descarga
+          el proceso que gana la elección).
+      refresh_interval: segundos tras los cuales se publica una versión nueva.
+      local_ttl: cada cuánto se consulta en Redis la versión vigente.
+      prefix: prefijo de las claves en Redis.
+    """
+
+    def __init__(
+        self,
+        connection: Redis,
+        registry: ReposRegistry,
+        *,
+        refresh_interval: float = 300,
+        local_ttl: float = 10,
+        prefix: str = "sisyphus:repos",
+    ):
+        self.connection = connection
+        self.registry = registry
+        self.refresh_interval = refresh_interval
+        self.local_ttl = local_ttl
+        self.prefix = prefix
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._cache: Dict[str, Optional[RepoInfo]] = {}
+        self._refreshing = False
+
+    def lookup(self, /, repo_full: str) -> Optional[RepoInfo]:
+        """Devuelve la materia y datos de un repositorio, o None si no se conoce.
+        """
+        if (version := self._current_version()) is None:
+            # Aún no hay índice publicado: usar las planillas directamente.
+            return self.registry.lookup(repo_full)
+
+        with self._lock:
+            # None también se guarda (repo desconocido en esta versión).
+            if repo_full in self._cache:
+                return self._cache[repo_full]
+
+        data = self.connection.hget(self._hash_key(version), repo_full)
+        attrs = json.loads(data) if data is not None else None
+        info = RepoInfo(**attrs) if attrs else None
+
+        with self._lock:
+            if self._version == version:
+                self._cache[repo_full] = info
+        return info
+
+    def is_repo_known(self, /, repo_full: str):
+        """Devuelve verdadero si el repositorio existe en alguna materia.
+        """
+        return self.lookup(repo_full) is not None
+
+    def publish(self) -> int:
+        """Descarga las planillas y publica una versión nueva del índice.
+
+        Returns:
+          el número de la nueva versión.
+
+        Raises:
+          RuntimeError si alguna planilla no tiene datos, y no hay una
+          versión publicada de donde tomarlos.
+        """
+        self.registry.refresh()
+        index = self.registry.index()
+        missing = {m for m, db in self.registry.dbs.items() if not db.loaded}
+        if missing:
+            index = self._carry_forward(index, missing)
+        version = self.connection.incr(f"{self.prefix}:seq")
+        hash_key = self._hash_key(version)
+
+        pipe = self.connection.pipeline(transaction=False)
+        items = list(index.items())
+        for start in range(0, len(items), 1000):
+            chunk = items[start : start + 1000]
+            pipe.hset(
+                hash_key,
+                mapping={
+                    repo: json.dumps(dataclasses.asdict(info)) for repo, info in chunk
+                },
+            )
+        if not items:
+            # Un hash vacío no existe en Redis; se guarda un centinela.
+            pipe.hset(hash_key, "", "null")
+        # La versión anterior sigue legible un rato, por los lectores en curso.
+        if (old := self.connection.get(f"{self.prefix}:version")) is not None:
+            pipe.expire(self._hash_key(int(old)), int(self.local_ttl * 6) + 60)
+        pipe.set(f"{self.prefix}:version", version)
+        pipe.set(f"{self.prefix}:updated", time.time())
+        pipe.execute()
+
+        self.logger.info(f"published repos index v{version} ({len(items)} repos)")
+        return version
+
+    def _carry_forward(
+        self, index: Dict[str, RepoInfo], missing: Set[Optional[str]]
+    ) -> Dict[str, RepoInfo]:
+        """Completa el índice con los repos de la versión vigente de las
+        materias sin datos.
+        """
+        names = sorted(map(str, missing))
+        if (old := self.connection.get(f"{self.prefix}:version")) is None:
+            raise RuntimeError(f"no data for {names}, not publishing")
+        self.logger.warning(f"no data for {names}, keeping v{int(old)} entries")
+        index = dict(index)
+        for repo, data in self.connection.hgetall(self._hash_key(int(old))).items():
+            if (attrs := json.loads(data)) and attrs["materia"] in missing:
+                index.setdefault(repo.decode(), RepoInfo(**attrs))
+        return index
+
+    def _current_version(self) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.local_ttl:
+                return self._version
+
+        version, updated = self.connection.mget(
+            f"{self.prefix}:version", f"{self.prefix}:updated"
+        )
+        version = int(version) if version is not None else None
+        stale = updated is None or time.time() - float(updated) > self.refresh_interval
+
+        with self._lock:
+            if version != self._version:
+                self._cache = {}
+            self._version = version
+            self._checked_at = now
+
+        if stale:
+            self._maybe_refresh(cold=version is None)
+            if version is None:
+                return self._current_version_after_cold_start()
+
+        return version
+
+    def _maybe_refresh(self, *, cold: bool):
+        """Si este proceso gana la elección, publica una versión nueva.
+
+        En frío (sin índice publicado) se publica en el momento; si no, en un
+        thread aparte, y mientras tanto se sigue sirviendo la versión vigente.
+        """
+        leader_key = f"{self.prefix}:leader"
+        ident = f"{socket.gethostname()}:{os.getpid()}"
+        lease = max(int(self.refresh_interval), 60)
+
+        with self._lock:
+            if self._refreshing:
+                return
+            if not self.connection.set(leader_key, ident, nx=True, ex=lease):
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self.publish()
+            except Exception as ex:
+                self.logger.error(f"could not publish repos index: {ex}")
+                self.connection.delete(leader_key)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+                    self._checked_at = 0.0
+
+        if cold:
+            refresh()
+        else:
+            threading.Thread(target=refresh, name="repos index", daemon=True).start()
+
+    def _current_version_after_cold_start(self) -> Optional[int]:
+        version = self.connection.get(f"{self.prefix}:version")
+        with self._lock:
+            self._version = int(version) if version is not None else None
+            return self._version
+
+    def _hash_key(self, version: int) -> str:
+        return f"{self.prefix}:v{version}"
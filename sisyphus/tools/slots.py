@@ -0,0 +1,27 @@
+"""Muestra el uso de los slots de corrección del host.
+
+Ejemplo:
+
+  slots                      # capacidad, slots en uso y pid de cada uno
+  slots --max-correctors 4   # con la misma configuración que el worker
+"""
+
+import argparse
+import json
+
+from ..corrector.admission import DEFAULT_SLOTS_DIR, AdmissionController
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slots-dir", default=DEFAULT_SLOTS_DIR)
+    parser.add_argument("--max-correctors", type=int, metavar="N")
+    parser.add_argument("--corrector-mem", type=int, default=512, metavar="MB")
+    args = parser.parse_args()
+
+    admission = AdmissionController(
+        args.slots_dir,
+        max_slots=args.max_correctors,
+        mem_per_run=args.corrector_mem << 20,
+    )
+    print(json.dumps(admission.usage(), indent=2))
@@ -0,0 +1,87 @@
+"""Mide el tiempo de importar los módulos de entrada, contra un presupuesto.
+
+Cada módulo se importa en un intérprete nuevo, sin sisyphus.yaml y con las
+conexiones de red prohibidas: importar no debe leer la configuración ni
+conectarse a nada (eso ocurre en create_app() y en el worker). Termina con
+error si algún import falla o excede su presupuesto.
+
+Ejemplos:
+
+  startup                               # módulos y presupuestos por omisión
+  startup --repeat 5                    # el mínimo de 5 mediciones
+  startup --budget 0.5 sisyphus.app     # un módulo, con otro presupuesto
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Presupuesto (segundos) de cada módulo de entrada. Casi todo el tiempo es
+# de dependencias (github, github3, redis, pydantic).
+STARTUP_BUDGETS = {
+    "sisyphus.app": 1.5,
+    "sisyphus.corrector.tasks": 1.2,
+    "sisyphus.tools.worker": 1.2,
+}
+
+PROBE = """
+import socket, sys, time
+
+def connect(*args):
+    raise RuntimeError(f"network connection at import time: {args}")
+
+socket.socket.connect = socket.socket.connect_ex = connect
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def measure(module: str) -> float:
+    """Segundos que tarda en importarse el módulo, en un proceso nuevo.
+
+    Raises:
+      RuntimeError con la salida del intérprete, si el import falla.
+    """
+    env = dict(os.environ, SISYPHUS_CONF=os.devnull + ".missing")
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, module],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return float(proc.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", metavar="<module>", nargs="*")
+    parser.add_argument(
+        "--budget", type=float, metavar="SECS", help="Presupuesto de cada módulo",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, metavar="N", help="Mediciones por módulo",
+    )
+    args = parser.parse_args()
+
+    budgets = {
+        module: args.budget or STARTUP_BUDGETS.get(module, 1.0)
+        for module in args.modules or STARTUP_BUDGETS
+    }
+    failed = False
+
+    for module, budget in budgets.items():
+        try:
+            elapsed = min(measure(module) for _ in range(args.repeat))
+        except RuntimeError as ex:
+            print(f"FAIL  {module}: {ex}")
+            failed = True
+            continue
+        status = "ok" if elapsed <= budget else "SLOW"
+        failed |= elapsed > budget
+        print(f"{status:<4}  {module}: {elapsed:.3f}s (budget {budget:.3f}s)")
+
+    sys.exit(1 if failed else 0)
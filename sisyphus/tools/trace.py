@@ -0,0 +1,53 @@
+"""Muestra la traza de una entrega, desde el webhook hasta el check run.
+
+Ejemplos:
+
+  trace <job_id>            # por id del trabajo de rq (de rq info, o logs)
+  trace <trace_id>          # por id de traza (de job.meta, o del check run)
+  trace --json <job_id>     # exportar la traza completa en JSON
+"""
+
+import argparse
+import json
+
+from redis import Redis
+from rq.exceptions import NoSuchJobError  # type: ignore
+from rq.job import Job  # type: ignore
+
+from ..common.tracing import Tracer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("id", help="id del trabajo de rq, o de la traza")
+    parser.add_argument(
+        "--redis-url", default="redis://localhost:6379", help="URL de Redis",
+    )
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    connection = Redis.from_url(args.redis_url)
+    tracer = Tracer(connection)
+    trace_id = args.id
+
+    try:
+        job = Job.fetch(args.id, connection=connection)
+    except NoSuchJobError:
+        pass
+    else:
+        trace_id = job.meta.get("trace_id", trace_id)
+
+    trace = tracer.export(trace_id)
+    if args.json:
+        print(json.dumps(trace, indent=2))
+        return
+    if not trace["spans"]:
+        raise SystemExit(f"no trace found for {args.id}")
+
+    origin = trace["spans"][0]["start"]
+    print(f"trace {trace_id}")
+    for span in trace["spans"]:
+        attrs = " ".join(f"{k}={v}" for k, v in span["attrs"].items())
+        offset = span["start"] - origin
+        duration = span["duration"]
+        print(f"  +{offset:8.3f}s  {duration:8.3f}s  {span['name']:<10} {attrs}")
@@ -0,0 +1,316 @@
+"""Lanza un worker de rq precargado para correr corrector.tasks.
+
+Ejemplos:
+
+  worker default                      # fork() por trabajo, padre precargado
+  worker --recycle-after 50 default   # procesos de larga vida, reciclados
+  worker --asyncio 32 default         # 32 trabajos concurrentes, un proceso
+  worker --max-correctors 4 default   # a lo sumo 4 correcciones en el host
+  worker --publish-queue publish default
+                                      # resultados en Redis, reintentos en publish
+  worker --with-scheduler --publish-queue publish publish
+                                      # reintentos de publicación
+  worker --prefetch --asyncio 8 prefetch
+                                      # prefetch de entregas, en workers propios
+  worker --prefetch default           # corrección, leyendo el caché del prefetch
+  worker --fair-share default default # sub-colas por materia, con reparto justo
+  worker --metrics-port 9100 default  # slots del host en :9100/metrics
+  worker --preload-app ingest         # ingesta, con el índice de repos cargado
+  worker --node-affinity default --tests algo2=/srv/algo2/skel default
+                                      # solo los tests de algo2, en este nodo
+"""
+
+import argparse
+import logging
+import os
+import pathlib
+import time
+
+from redis import Redis
+
+from ..common.github_pool import app_pool
+from ..common.metrics import Metrics
+from ..common.tracing import Tracer
+from ..corrector import tasks
+from ..corrector.admission import DEFAULT_SLOTS_DIR
+from ..corrector.affinity import Affinity
+from ..corrector.aio_worker import AsyncWorker
+from ..corrector.base import CorrectorBase
+from ..corrector.corrector_pool import DEFAULT_TIMEOUT
+from ..corrector.exporter import serve_metrics
+from ..corrector.fairshare import FairShare
+from ..corrector.prefetch import SubmissionCache
+from ..corrector.results import ResultStore
+from ..corrector.supersede import Supersession
+from ..corrector.worker import PreloadedWorker, preload, run_recycling
+
+
+def materia_weight(value: str):
+    """Parsea MATERIA=W (argumento de --weight).
+    """
+    materia, sep, weight = value.partition("=")
+    try:
+        if not materia or not sep or (number := float(weight)) <= 0:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected MATERIA=W, W > 0: {value!r}")
+    return materia, number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queues", metavar="<queue>", nargs="+")
+    parser.add_argument(
+        "--redis-url", default="redis://localhost:6379", help="URL de Redis",
+    )
+    parser.add_argument(
+        "--recycle-after",
+        type=int,
+        metavar="N",
+        help="""Correr los trabajos sin fork() en un proceso de larga vida,
+             reemplazándolo tras N trabajos.""",
+    )
+    parser.add_argument(
+        "--asyncio",
+        type=int,
+        metavar="N",
+        help="Correr hasta N trabajos concurrentes en un único proceso asyncio.",
+    )
+    parser.add_argument(
+        "--persistent-correctors",
+        type=int,
+        metavar="N",
+        help="""Usar un pool de N procesos persistentes del corrector (con
+             --recycle-after o --asyncio, donde el pool sobrevive entre
+             trabajos).""",
+    )
+    parser.add_argument(
+        "--corrector-max-jobs",
+        type=int,
+        default=100,
+        metavar="N",
+        help="Reciclar cada proceso persistente del corrector tras N trabajos.",
+    )
+    parser.add_argument(
+        "--corrector-timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        metavar="SECS",
+        help="""Tiempo máximo de una corrección en un proceso persistente (por
+             omisión, %(default)s segundos, como los trabajos de rq).""",
+    )
+    parser.add_argument(
+        "--no-admission",
+        dest="admission",
+        action="store_false",
+        help="No limitar las correcciones simultáneas en el host.",
+    )
+    parser.add_argument(
+        "--max-correctors",
+        type=int,
+        metavar="N",
+        help="""Correcciones simultáneas en el host (por omisión, según CPUs
+             y memoria disponibles).""",
+    )
+    parser.add_argument(
+        "--corrector-mem",
+        type=int,
+        default=512,
+        metavar="MB",
+        help="Memoria estimada de una corrección, en MB.",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="Fijar cada corrección a los cores de su slot.",
+    )
+    parser.add_argument(
+        "--slots-dir", default=DEFAULT_SLOTS_DIR, help="Directorio de los slots",
+    )
+    parser.add_argument(
+        "--publish-queue",
+        metavar="<queue>",
+        help="""Guardar en Redis los resultados, y encolar en <queue> los
+             reintentos de publicación (algún worker debe leerla, con
+             --with-scheduler).""",
+    )
+    parser.add_argument(
+        "--app-id",
+        type=int,
+        default=os.environ.get("REPOS_APP_ID"),
+        help="ID de la app, para renovar tokens al reintentar publicaciones.",
+    )
+    parser.add_argument(
+        "--app-key",
+        default=os.environ.get("REPOS_KEY_PATH"),
+        metavar="PATH",
+        help="Clave privada de la app (ídem).",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="""Usar el caché de entregas en Redis (SubmissionCache): en los
+             workers de prefetch, y en los de corrección si la app tiene
+             prefetch_queue.""",
+    )
+    parser.add_argument(
+        "--with-scheduler",
+        action="store_true",
+        help="Correr el scheduler de rq (necesario para reintentos diferidos).",
+    )
+    parser.add_argument(
+        "--fair-share",
+        action="append",
+        default=[],
+        metavar="<queue>",
+        help="""Desencolar de las sub-colas de <queue> (prioridad, una por
+             materia, overflow), repartiendo entre materias según su uso.""",
+    )
+    parser.add_argument(
+        "--weight",
+        action="append",
+        type=materia_weight,
+        default=[],
+        metavar="MATERIA=W",
+        help="Peso de una materia en el reparto (1 por omisión).",
+    )
+    parser.add_argument(
+        "--tests",
+        action="append",
+        default=[],
+        metavar="MATERIA=DIR",
+        help="""Directorio de tests de una materia en este nodo (una
+             subcarpeta por entrega); reemplaza los directorios por omisión.""",
+    )
+    parser.add_argument(
+        "--node-affinity",
+        action="append",
+        default=[],
+        metavar="<queue>",
+        help="""Anunciar las materias de este nodo, y leer además <queue>@<nodo>
+             (los trabajos que el webhook rutea a este nodo).""",
+    )
+    parser.add_argument(
+        "--node", metavar="NAME", help="Nombre del nodo (por omisión, el hostname).",
+    )
+    parser.add_argument(
+        "--no-metrics",
+        dest="metrics",
+        action="store_false",
+        help="No registrar métricas de los trabajos en Redis.",
+    )
+    parser.add_argument(
+        "--no-tracing",
+        dest="tracing",
+        action="store_false",
+        help="No registrar las trazas de las entregas en Redis.",
+    )
+    parser.add_argument(
+        "--trace-summary",
+        action="store_true",
+        help="Agregar el resumen de la traza al output de los check runs.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Exportar en PORT las métricas propias del host (slots en uso).",
+    )
+    parser.add_argument(
+        "--preload-app",
+        action="store_true",
+        help="""Cargar la configuración de la app, el índice de repos y el pool
+             de GitHub antes de empezar (para la cola de ingesta).""",
+    )
+    parser.add_argument(
+        "--burst", action="store_true", help="Terminar al vaciarse la cola",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    connection = Redis.from_url(args.redis_url)
+
+    if args.admission:
+        admission = CorrectorBase.use_admission(
+            slots_dir=args.slots_dir,
+            max_slots=args.max_correctors,
+            mem_per_run=args.corrector_mem << 20,
+            pin_cpus=args.pin_cpus,
+        )
+        logging.info(f"admitting up to {admission.capacity} correctors per host")
+
+    if args.publish_queue:
+        token_pool = None
+        if args.app_id and args.app_key:
+            with open(args.app_key, "rb") as key:
+                token_pool = app_pool(args.app_id, key.read())
+        ResultStore.use(
+            connection, retry_queue=args.publish_queue, app_pool=token_pool
+        )
+    if args.prefetch:
+        SubmissionCache.use(connection)
+    Supersession.use(connection)
+
+    if args.metrics:
+        Metrics.use(connection)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    if args.tracing:
+        Tracer.use(connection, check_summary=args.trace_summary)
+
+    if args.fair_share:
+        FairShare.use(connection, bases=args.fair_share, weights=dict(args.weight))
+
+    if args.tests:
+        tasks.TEST_PATHS.clear()
+        for entry in args.tests:
+            materia, _, path = entry.partition("=")
+            tasks.TEST_PATHS[materia] = pathlib.Path(path)
+
+    if args.node_affinity:
+        affinity = Affinity.use(
+            connection,
+            node=args.node,
+            tests=tasks.TEST_PATHS,
+            bases=args.node_affinity,
+        )
+        affinity.advertise(force=True)
+        logging.info(f"node {affinity.node} serves {affinity.entregas()}")
+
+    if args.preload_app:
+        # Se importa aquí: sin --preload-app, el worker no lee sisyphus.yaml.
+        from ..app.ingest import warm_up
+
+        start = time.monotonic()
+        warm_up()
+        logging.info(f"preloaded app in {time.monotonic() - start:.3f}s")
+
+    if args.persistent_correctors:
+        CorrectorBase.use_pool(
+            args.persistent_correctors,
+            max_jobs=args.corrector_max_jobs,
+            timeout=args.corrector_timeout,
+        )
+
+    if args.asyncio:
+        if args.with_scheduler:
+            logging.warn("--with-scheduler is not supported with --asyncio")
+        preload()
+        worker = AsyncWorker(
+            args.queues, connection=connection, max_in_flight=args.asyncio
+        )
+        worker.work(burst=args.burst)
+    elif args.recycle_after:
+        run_recycling(
+            args.queues,
+            connection,
+            max_jobs=args.recycle_after,
+            burst=args.burst,
+            with_scheduler=args.with_scheduler,
+        )
+    else:
+        worker = PreloadedWorker(args.queues, connection=connection)
+        worker.work(burst=args.burst, with_scheduler=args.with_scheduler)
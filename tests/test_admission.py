@@ -0,0 +1,82 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sisyphus.corrector import admission
+from sisyphus.corrector.admission import AdmissionController, split_cpus
+
+
+@pytest.fixture
+def controller(tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, "mem_total", lambda: 64 << 30)
+    monkeypatch.setattr(admission, "mem_available", lambda: 32 << 30)
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 2, 3})
+    return AdmissionController(str(tmp_path), max_slots=2)
+
+
+def test_split_cpus():
+    assert split_cpus([0, 1, 2, 3, 4], 2) == [{0, 1, 2}, {3, 4}]
+    assert split_cpus([0, 1], 2) == [{0}, {1}]
+
+
+def test_capacidad(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(8)))
+    monkeypatch.setattr(admission, "mem_total", lambda: 2 << 30)
+    # Limita la memoria: 2 GiB / 512 MiB.
+    assert AdmissionController(str(tmp_path)).capacity == 4
+    # Limita el tope explícito.
+    assert AdmissionController(str(tmp_path), max_slots=3).capacity == 3
+    # Limitan las CPUs.
+    monkeypatch.setattr(admission, "mem_total", lambda: 64 << 30)
+    assert AdmissionController(str(tmp_path)).capacity == 8
+
+
+def test_slots_exclusivos(controller):
+    # Otro worker del host: mismo directorio, otro controlador.
+    other = AdmissionController(str(controller.slots_dir), max_slots=2)
+    with controller.slot() as first, other.slot() as second:
+        assert {first.index, second.index} == {0, 1}
+        assert first.cpus.isdisjoint(second.cpus)
+        with pytest.raises(TimeoutError):
+            with other.slot(timeout=0.1):
+                pass
+    with other.slot(timeout=0.1) as slot:
+        assert slot.index == 0
+
+
+def test_slot_async(controller):
+    async def correr():
+        async with controller.slot_async() as slot:
+            assert controller.usage()["used"] == 1
+            return slot.index
+
+    assert asyncio.run(correr()) == 0
+    assert controller.usage()["used"] == 0
+
+
+def test_usage(controller):
+    assert controller.usage() == dict(capacity=2, used=0, slots=[None, None])
+    with controller.slot():
+        assert controller.usage() == dict(
+            capacity=2, used=1, slots=[os.getpid(), None]
+        )
+    assert controller.usage()["used"] == 0
+
+
+def test_usage_ignora_procesos_muertos(controller):
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    (controller.slots_dir / "slot-1.lock").write_text(f"{proc.pid}\n")
+    assert controller.usage() == dict(capacity=2, used=0, slots=[None, None])
+
+
+def test_sin_memoria_espera_a_otra_correccion(controller, monkeypatch):
+    monkeypatch.setattr(admission, "mem_available", lambda: 0)
+    # Sin otra corrección en curso, se admite igual.
+    with controller.slot(timeout=0.1):
+        with pytest.raises(TimeoutError):
+            with controller.slot(timeout=0.1):
+                pass
@@ -0,0 +1,82 @@
+import fakeredis
+
+from rq import Queue  # type: ignore
+from rq.job import Job  # type: ignore
+
+from sisyphus.common.typ import AppInstallationTokenAuth, CorregirJob, Repo
+from sisyphus.common.wire import encode_job
+from sisyphus.corrector.affinity import Affinity
+
+AUTH = AppInstallationTokenAuth(token="t", expires_at="2030-01-01T00:00:00Z")
+
+
+def rq_job(connection, origin, materia="algo2", entrega="tp1"):
+    corregir = CorregirJob(
+        repo=Repo("algoritmos-rw/algo2_alu_x"),
+        materia=materia,
+        head_sha="aaa",
+        head_branch=entrega,
+        alu_dir=entrega,
+        installation_auth=AUTH,
+    )
+    job = Job.create(func=len, args=(encode_job(corregir),), connection=connection)
+    job.origin = origin
+    return job
+
+
+def node(connection, name, tests_dir):
+    return Affinity(connection, node=name, tests={"algo2": tests_dir}, bases=["q"])
+
+
+def test_misrouted_mueve_a_la_cola_de_la_materia(tmp_path):
+    (tmp_path / "tp1").mkdir()
+    connection = fakeredis.FakeStrictRedis()
+    node(connection, "capaz", tmp_path).advertise()
+    affinity = node(connection, "otro", tmp_path / "nada")
+    assert affinity.misrouted(rq_job(connection, "q")) == ("q:algo2", "algo2")
+
+
+def test_misrouted_sin_nodos_capaces_no_mueve(tmp_path):
+    connection = fakeredis.FakeStrictRedis()
+    affinity = node(connection, "otro", tmp_path)
+    affinity.advertise()
+    # Nadie tiene los tests: moverlo a q:algo2 lo dejaría allí para siempre.
+    assert affinity.misrouted(rq_job(connection, "q")) is None
+
+
+def test_misrouted_puede_correrlo(tmp_path):
+    (tmp_path / "tp1").mkdir()
+    connection = fakeredis.FakeStrictRedis()
+    affinity = node(connection, "capaz", tmp_path)
+    assert affinity.misrouted(rq_job(connection, "q:priority")) is None
+
+
+def test_queue_names_prioridad_antes_que_el_nodo(tmp_path):
+    (tmp_path / "tp1").mkdir()
+    affinity = node(fakeredis.FakeStrictRedis(), "capaz", tmp_path)
+    names = affinity.queue_names(["q:priority", "q:algo2", "q", "q:overflow"])
+    assert names == ["q:priority", "q@capaz", "q:algo2", "q", "q:overflow"]
+
+
+def test_reap_devuelve_los_trabajos_de_un_nodo_caido(tmp_path):
+    (tmp_path / "tp1").mkdir()
+    connection = fakeredis.FakeStrictRedis()
+    caido = node(connection, "caido", tmp_path)
+    caido.advertise()
+    dead_queue = Queue("q@caido", connection=connection)
+    jobs = [rq_job(connection, "q@caido") for _ in range(2)]
+    for job in jobs:
+        dead_queue.enqueue_job(job)
+
+    vivo = node(connection, "vivo", tmp_path)
+    vivo.advertise()
+    vivo.reap()
+    # Sigue anunciado: no se toca.
+    assert dead_queue.count == 2
+
+    connection.delete("sisyphus:nodes:caido")
+    vivo.reap()
+    assert dead_queue.count == 0
+    assert Queue("q", connection=connection).get_job_ids() == [j.id for j in jobs]
+    assert Job.fetch(jobs[0].id, connection=connection).origin == "q"
+    assert connection.smembers("sisyphus:nodes") == {b"vivo"}
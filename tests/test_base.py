@@ -0,0 +1,84 @@
+import asyncio
+import os
+import pathlib
+import signal
+import subprocess
+import tarfile
+import tempfile
+
+import pytest
+
+from sisyphus.common.typ import RepoFile
+from sisyphus.corrector import base
+from sisyphus.corrector.base import (
+    BUILD_FAILED,
+    CorrectorBase,
+    build_result,
+    filter_files,
+)
+
+
+def repo_files(*paths):
+    return [RepoFile(path=path, contents=b"") for path in paths]
+
+
+def test_filter_files_sin_lista():
+    files = repo_files("a.c", "b.c")
+    assert filter_files(files, None) is files
+
+
+def test_filter_files_archivos_y_directorios():
+    files = repo_files("a.c", "b.c", "lib/x.h", "lib/sub/y.h", "libx/z.h")
+    allowed = [pathlib.Path("a.c"), pathlib.Path("lib")]
+    paths = [f.path for f in filter_files(files, allowed)]
+    assert paths == ["a.c", "lib/x.h", "lib/sub/y.h"]
+
+
+def test_build_tar_en_archivo():
+    test_files = [RepoFile(path="test.c", contents=b"test")]
+    entrega_files = [RepoFile(path="alu.c", contents=b"alu")]
+    corr = CorrectorBase(None, None)
+    with corr.build_tar(test_files, entrega_files) as tar:
+        with tarfile.open(fileobj=tar, mode="r|") as tarobj:
+            members = {m.name: tarobj.extractfile(m).read() for m in tarobj}
+    assert members == {"skel/test.c": b"test", "orig/alu.c": b"alu"}
+
+
+def test_build_result():
+    assert build_result(0, b"ok") == (True, b"ok")
+    assert build_result(BUILD_FAILED, b"error: x") == (False, b"error: x")
+    with pytest.raises(subprocess.CalledProcessError):
+        build_result(1, b"Traceback")
+
+
+def test_run_mata_el_corrector_si_se_interrumpe(monkeypatch):
+    procs = []
+
+    def communicate(self, *args, **kwargs):
+        procs.append(self)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(base, "CORRECTOR_BIN", "sleep")
+    monkeypatch.setattr(subprocess.Popen, "communicate", communicate)
+    corr = CorrectorBase(None, None)
+    with tempfile.TemporaryFile() as tar, pytest.raises(KeyboardInterrupt):
+        corr._run(tar, "60")
+    assert procs[0].returncode == -signal.SIGKILL
+    with pytest.raises(ProcessLookupError):
+        os.kill(procs[0].pid, 0)
+
+
+def test_run_async_mata_el_corrector_si_se_cancela(monkeypatch):
+    procs = []
+    create = asyncio.create_subprocess_exec
+
+    async def create_subprocess_exec(*args, **kwargs):
+        procs.append(await create(*args, **kwargs))
+        return procs[-1]
+
+    monkeypatch.setattr(base, "CORRECTOR_BIN", "sleep")
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", create_subprocess_exec)
+    corr = CorrectorBase(None, None)
+    with tempfile.TemporaryFile() as tar, pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(corr._run_async(tar, "60"), 0.5))
+    assert procs[0].returncode == -signal.SIGKILL
@@ -0,0 +1,41 @@
+import io
+import subprocess
+import sys
+import time
+
+import pytest
+
+from sisyphus.corrector.corrector_pool import CorrectorPool, CorrectorProcess
+
+# Corrector persistente mínimo: responde cada frame con su tamaño.
+ECHO = """
+import struct, sys
+stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+while hdr := stdin.read(4):
+    size, = struct.unpack("!I", hdr)
+    stdin.read(size)
+    output = str(size).encode()
+    stdout.write(struct.pack("!iI", 0, len(output)) + output)
+    stdout.flush()
+"""
+
+
+def test_pool_request():
+    pool = CorrectorPool([sys.executable, "-c", ECHO], size=1, timeout=10)
+    try:
+        assert pool.run(io.BytesIO(b"x" * 100_000)) == b"100000"
+        assert pool.run(io.BytesIO(b"")) == b"0"
+    finally:
+        pool.close()
+
+
+def test_request_timeout_al_escribir():
+    # Un corrector trabado, que no lee stdin: el tar no entra en el pipe.
+    proc = CorrectorProcess(["sleep", "60"])
+    start = time.monotonic()
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            proc.request(io.BytesIO(b"x" * (4 << 20)), timeout=0.5)
+        assert time.monotonic() - start < 5
+    finally:
+        proc.kill()
@@ -0,0 +1,43 @@
+import fakeredis
+
+from sisyphus.app.dedup import Deliveries
+from sisyphus.common.typ import Repo
+
+REPO = Repo("algoritmos-rw/algo2_alu_x")
+
+
+def test_claim_descarta_reenvio():
+    deliveries = Deliveries(fakeredis.FakeStrictRedis())
+    assert deliveries.claim("d1", REPO, "aaa", "requested")
+    assert not deliveries.claim("d1", REPO, "aaa", "requested")
+
+
+def test_claim_descarta_mismo_evento_con_otro_delivery():
+    deliveries = Deliveries(fakeredis.FakeStrictRedis())
+    assert deliveries.claim("d1", REPO, "aaa", "requested")
+    assert not deliveries.claim("d2", REPO, "aaa", "requested")
+    assert deliveries.claim("d3", REPO, "aaa", "rerequested")
+    assert deliveries.claim("d4", REPO, "bbb", "requested")
+
+
+def test_claim_reenvio_tardio_no_bloquea_el_evento():
+    connection = fakeredis.FakeStrictRedis()
+    deliveries = Deliveries(connection)
+    assert deliveries.claim("d1", REPO, "aaa", "requested")
+    # Pasó la ventana: solo queda el delivery id.
+    connection.delete(deliveries._event_key(REPO, "aaa", "requested"))
+    assert not deliveries.claim("d1", REPO, "aaa", "requested")
+    assert deliveries.claim("d2", REPO, "aaa", "requested")
+
+
+def test_claim_sin_delivery_id():
+    deliveries = Deliveries(fakeredis.FakeStrictRedis())
+    assert deliveries.claim(None, REPO, "aaa", "requested")
+    assert not deliveries.claim(None, REPO, "aaa", "requested")
+
+
+def test_release_permite_el_reenvio():
+    deliveries = Deliveries(fakeredis.FakeStrictRedis())
+    assert deliveries.claim("d1", REPO, "aaa", "requested")
+    deliveries.release("d1", REPO, "aaa", "requested")
+    assert deliveries.claim("d1", REPO, "aaa", "requested")
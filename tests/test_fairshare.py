@@ -0,0 +1,48 @@
+import fakeredis
+
+from sisyphus.common.typ import AppInstallationTokenAuth, CorregirJob, Repo
+from sisyphus.corrector.fairshare import FairShare
+
+AUTH = AppInstallationTokenAuth(token="t", expires_at="2030-01-01T00:00:00Z")
+
+
+def corregir_job(repo="algoritmos-rw/algo2_alu_x", materia="algo2"):
+    return CorregirJob(
+        repo=Repo(repo),
+        materia=materia,
+        head_sha="aaa",
+        head_branch="tp1",
+        alu_dir="tp1",
+        installation_auth=AUTH,
+    )
+
+
+def test_route_sin_workers_usa_la_cola_base():
+    fair = FairShare(fakeredis.FakeStrictRedis())
+    assert fair.route("default", corregir_job()) == ("default", None)
+
+
+def test_route_subcolas():
+    connection = fakeredis.FakeStrictRedis()
+    FairShare(connection, bases=["default"]).register()
+    fair = FairShare(connection, max_pending_per_repo=2)
+    job = corregir_job()
+
+    queue_name, meta = fair.route("default", job)
+    assert queue_name == "default:algo2"
+    assert meta == dict(fair=dict(materia="algo2", repo=job.repo.full_name))
+    assert fair.route("default", job)[0] == "default:algo2"
+    assert fair.route("default", job)[0] == "default:overflow"
+    assert fair.route("default", job, priority=True)[0] == "default:priority"
+    # Otro repo no se ve afectado.
+    assert fair.route("default", corregir_job(repo="x/y"))[0] == "default:algo2"
+
+
+def test_release_descuenta():
+    connection = fakeredis.FakeStrictRedis()
+    FairShare(connection, bases=["default"]).register()
+    fair = FairShare(connection, max_pending_per_repo=1)
+    job = corregir_job()
+    _, meta = fair.route("default", job)
+    fair.release(meta)
+    assert fair.route("default", job)[0] == "default:algo2"
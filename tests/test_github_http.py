@@ -0,0 +1,54 @@
+import time
+
+import pytest
+import requests
+
+from sisyphus.common.github_http import GitHubAdapter, RateLimiter, RateLimitExceeded
+
+
+def ratelimit_response(remaining, reset):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.headers["X-RateLimit-Remaining"] = str(remaining)
+    resp.headers["X-RateLimit-Reset"] = str(reset)
+    return resp
+
+
+def test_delay_reparte_los_restantes():
+    limiter = RateLimiter(low_watermark=100)
+    limiter.update("tok", ratelimit_response(10, time.time() + 50))
+    assert 4 < limiter.delay("tok") <= 5
+    assert limiter.delay("otro") == 0
+
+
+def test_send_no_espera_mas_de_max_wait():
+    limiter = RateLimiter(max_wait=1)
+    limiter.update("token x", ratelimit_response(0, time.time() + 600))
+    adapter = GitHubAdapter(limiter=limiter, cache=None)
+    request = requests.Request(
+        "GET", "https://api.github.com/rate_limit", headers={"Authorization": "token x"}
+    ).prepare()
+    start = time.monotonic()
+    with pytest.raises(RateLimitExceeded):
+        adapter.send(request)
+    assert time.monotonic() - start < 1
+
+
+def test_send_espacia_sin_fallar_si_quedan_requests(monkeypatch):
+    limiter = RateLimiter(max_wait=0.1)
+    limiter.update("token x", ratelimit_response(200, time.time() + 3000))
+    adapter = GitHubAdapter(limiter=limiter, cache=None)
+    sent = []
+
+    def send(self, request, **kwargs):
+        sent.append(request)
+        return ratelimit_response(199, time.time() + 3000)
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", send)
+    request = requests.Request(
+        "GET", "https://api.github.com/rate_limit", headers={"Authorization": "token x"}
+    ).prepare()
+    resp = adapter.send(request)
+    assert sent == [request]
+    assert resp.headers["X-RateLimit-Remaining"] == "199"
+    assert limiter.delay("token x") == 0.1
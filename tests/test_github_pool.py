@@ -0,0 +1,74 @@
+import datetime
+import threading
+
+from sisyphus.common.github_pool import GitHubPool
+from sisyphus.common.typ import AppInstallationTokenAuth
+
+
+def token_auth(token, minutes):
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        minutes=minutes
+    )
+    return AppInstallationTokenAuth(
+        token=token, expires_at=expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+    )
+
+
+def test_installation_auth_reusa_el_token():
+    pool = GitHubPool(1, b"key")
+    minted = []
+
+    def mint(installation_id):
+        minted.append(installation_id)
+        return token_auth(f"t{len(minted)}", 60)
+
+    pool._mint_token = mint
+    assert pool.installation_auth(10).token.get_secret_value() == "t1"
+    assert pool.installation_auth(10).token.get_secret_value() == "t1"
+    assert pool.installation_auth(20).token.get_secret_value() == "t2"
+    assert minted == [10, 20]
+
+
+def test_installation_auth_renueva_el_token_vencido():
+    pool = GitHubPool(1, b"key")
+    tokens = iter([token_auth("viejo", 3), token_auth("nuevo", 60)])
+    pool._mint_token = lambda installation_id: next(tokens)
+    assert pool.installation_auth(10).token.get_secret_value() == "viejo"
+    # Vence en menos que el margen (5 minutos): se genera otro.
+    assert pool.installation_auth(10).token.get_secret_value() == "nuevo"
+
+
+def test_installation_auth_no_bloquea_otras_instalaciones():
+    pool = GitHubPool(1, b"key")
+    minting, release = threading.Event(), threading.Event()
+
+    def mint(installation_id):
+        if installation_id == 10:
+            minting.set()
+            assert release.wait(5)
+        return token_auth(f"t{installation_id}", 60)
+
+    pool._mint_token = mint
+    slow = threading.Thread(target=pool.installation_auth, args=(10,))
+    slow.start()
+    assert minting.wait(5)
+    # Mientras se genera el token de 10, el pool sigue atendiendo a los demás.
+    assert pool.installation_auth(20).token.get_secret_value() == "t20"
+    assert pool.session(token_auth("otro", 60)) is not None
+    release.set()
+    slow.join()
+
+
+def test_pygithub_un_cliente_por_thread():
+    pool = GitHubPool()
+    auth = token_auth("t", 60)
+    gh = pool.pygithub(auth)
+    assert pool.pygithub(auth) is gh
+    assert pool.pygithub(token_auth("otro", 60)) is not gh
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.pygithub(auth)))
+    thread.start()
+    thread.join()
+    assert other[0] is not gh
+    assert pool.new_pygithub(auth) is not gh
@@ -0,0 +1,37 @@
+import types
+
+import fakeredis
+import pytest
+
+from sisyphus.app import ingest
+from sisyphus.app.dedup import Deliveries
+from sisyphus.common.typ import IngestJob, Repo
+
+REPO = Repo("algoritmos-rw/algo2_alu_x")
+
+
+def test_ingesta_fallida_libera_el_webhook(monkeypatch):
+    connection = fakeredis.FakeStrictRedis()
+    config = types.SimpleNamespace(repos_app=types.SimpleNamespace(dedup_window=120))
+
+    def fail(event):
+        raise ConnectionError("sheets")
+
+    monkeypatch.setattr(ingest, "load_config", lambda: config)
+    monkeypatch.setattr(ingest, "redis_conn", lambda: connection)
+    monkeypatch.setattr(ingest, "_ingest_check_suite", fail)
+
+    deliveries = Deliveries(connection)
+    assert deliveries.claim("d1", REPO, "aaa", "check_suite")
+    event = IngestJob(
+        repo=REPO,
+        head_sha="aaa",
+        head_branch="tp1",
+        installation_id=1,
+        delivery_id="d1",
+        kind="check_suite",
+    )
+    with pytest.raises(ConnectionError):
+        ingest.ingest_check_suite(event)
+    # El reenvío de GitHub ya no es un duplicado.
+    assert deliveries.claim("d1", REPO, "aaa", "check_suite")
@@ -0,0 +1,28 @@
+import fakeredis
+
+from sisyphus.common.metrics import Metrics
+
+
+def test_render_contadores_e_histogramas():
+    metrics = Metrics(fakeredis.FakeStrictRedis())
+    metrics.inc("sisyphus_results_total", conclusion="success")
+    metrics.inc("sisyphus_results_total", conclusion="success")
+    metrics.observe("sisyphus_stage_seconds", 0.3, stage="fetch")
+    metrics.gauge("sisyphus_github_ratelimit_remaining", 4999)
+    metrics.flush()
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE sisyphus_results_total counter" in lines
+    assert 'sisyphus_results_total{conclusion="success"} 2' in lines
+    assert 'sisyphus_stage_seconds_bucket{stage="fetch",le="0.25"} 0' in lines
+    assert 'sisyphus_stage_seconds_bucket{stage="fetch",le="0.5"} 1' in lines
+    assert 'sisyphus_stage_seconds_bucket{stage="fetch",le="+Inf"} 1' in lines
+    assert 'sisyphus_stage_seconds_sum{stage="fetch"} 0.3' in lines
+    assert 'sisyphus_stage_seconds_count{stage="fetch"} 1' in lines
+    assert "sisyphus_github_ratelimit_remaining 4999" in lines
+
+
+def test_render_sin_datos():
+    text = Metrics(fakeredis.FakeStrictRedis()).render()
+    assert "# TYPE sisyphus_jobs_total counter" in text
+    assert "sisyphus_jobs_total{" not in text
@@ -0,0 +1,75 @@
+from itertools import islice
+from typing import ClassVar, Optional
+
+from pydantic import ValidationError, validator
+
+from sisyphus.common.models import Model, parse_rows_report
+from sisyphus.repos.planilla import RepoRow
+
+
+class Alumno(Model):
+    legajo: int
+    nombre: str
+    nota: Optional[float]
+    email: Optional[str]
+
+    COLUMNAS: ClassVar = ("Legajo", "Nombre", "Nota", "Email")
+
+    @validator("email")
+    def lower(cls, email):
+        return email.lower() if email is not None else None
+
+
+def parse_rows_slow(rows, model):
+    """La versión original: validación completa de pydantic en cada fila.
+    """
+    indices = [rows[0].index(column) for column in model.COLUMNAS]
+    objects, errors = [], []
+    for rownum, row in enumerate(islice(rows, 1, None), start=2):
+        attrs = {
+            name: None if idx >= len(row) or row[idx] == "" else row[idx]
+            for name, idx in zip(model.__fields__, indices)
+        }
+        try:
+            objects.append(model.parse_obj(attrs))
+        except ValidationError as ex:
+            failed = tuple(str(e["loc"][0]) for e in ex.errors())
+            errors.append((rownum, failed, attrs))
+    return objects, errors
+
+
+def assert_same_as_slow(rows, model):
+    objects, report = parse_rows_report(rows, model)
+    slow_objects, slow_errors = parse_rows_slow(rows, model)
+    assert [o.dict() for o in objects] == [o.dict() for o in slow_objects]
+    assert [type(o) for o in objects] == [type(o) for o in slow_objects]
+    assert report.errors == slow_errors
+    assert report.rows == len(rows) - 1
+    return report
+
+
+def test_parse_rows_report_igual_que_validar_todo_repos():
+    rows = [
+        ["Legajo", "Repo", "Github", "Grupo", "Repo2", "Extra"],
+        ["100", "org/alu_1", "alu1", "G1", "org/grupo_1", "x"],
+        ["101", "org/alu_2", "", "", ""],
+        ["102", "org/alu_3"],
+        ["", "org/alu_4", "alu4", "", "", ""],
+        ["103", ""],
+    ]
+    report = assert_same_as_slow(rows, RepoRow)
+    # Las filas completas no necesitan validación.
+    assert report.validated == 2
+    assert [rownum for rownum, _, _ in report.errors] == [5, 6]
+
+
+def test_parse_rows_report_igual_que_validar_todo_con_conversiones():
+    rows = [
+        ["Nombre", "Legajo", "Nota", "Email"],
+        ["Ana", "100", "7.5", "ANA@example.com"],
+        ["Beto", "x", "", ""],
+        ["Caro", "102", "diez", "caro@example.com"],
+        ["", "103"],
+    ]
+    report = assert_same_as_slow(rows, Alumno)
+    assert report.validated == 4
@@ -0,0 +1,28 @@
+from sisyphus.repos.planilla import ReposRegistry
+
+
+class FailingDB:
+    loaded = False
+
+    def __init__(self):
+        self.attempts = 0
+
+    def refresh(self):
+        self.attempts += 1
+        raise RuntimeError("sheets down")
+
+
+def test_index_no_reintenta_planilla_fallida():
+    db = FailingDB()
+    registry = ReposRegistry({"algo2": db}, retry_after=60)
+    assert registry.lookup("algoritmos-rw/algo2_alu_x") is None
+    assert registry.lookup("algoritmos-rw/algo2_alu_x") is None
+    assert db.attempts == 1
+
+
+def test_index_reintenta_tras_retry_after():
+    db = FailingDB()
+    registry = ReposRegistry({"algo2": db}, retry_after=0)
+    registry.lookup("algoritmos-rw/algo2_alu_x")
+    registry.lookup("algoritmos-rw/algo2_alu_x")
+    assert db.attempts == 2
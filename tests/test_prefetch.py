@@ -0,0 +1,64 @@
+import pickle
+
+import fakeredis
+
+from sisyphus.common import typ
+from sisyphus.common.typ import Repo, RepoFile
+from sisyphus.corrector.alu_repo import AluRepo
+from sisyphus.corrector.prefetch import CachedAluRepo, SubmissionCache
+
+REPO = Repo("algoritmos-rw/algo2_alu_x")
+
+
+class FakeAluRepo(AluRepo):
+    def __init__(self, files):
+        self.files = files
+        self.calls = 0
+
+    def get_entrega(self, entrega_id, /, sha):
+        self.calls += 1
+        return self.files
+
+
+def test_repofile_pickle():
+    small = RepoFile("a.c", b"abc", 0o755)
+    big = RepoFile("b.bin", b"x" * (typ.SPILL_THRESHOLD + 1))
+    for repo_file in small, big:
+        copy = pickle.loads(pickle.dumps(repo_file))
+        assert copy == repo_file
+        assert (copy.size, copy.mode) == (repo_file.size, repo_file.mode)
+
+
+def test_cache_put_get():
+    cache = SubmissionCache(fakeredis.FakeStrictRedis())
+    files = [RepoFile("tp1/a.c", b"abc")]
+    assert cache.get(REPO.full_name, "aaa", "tp1") is None
+    cache.put(REPO.full_name, "aaa", "tp1/", files)
+    assert cache.get(REPO.full_name, "aaa", "tp1") == files
+    assert cache.get(REPO.full_name, "bbb", "tp1") is None
+
+
+def test_cache_no_guarda_entregas_grandes():
+    cache = SubmissionCache(fakeredis.FakeStrictRedis(), max_bytes=2)
+    cache.put(REPO.full_name, "aaa", "tp1", [RepoFile("tp1/a.c", b"abc")])
+    assert cache.get(REPO.full_name, "aaa", "tp1") is None
+
+
+def test_cache_claim():
+    cache = SubmissionCache(fakeredis.FakeStrictRedis(), wait=0)
+    assert cache.claim(REPO.full_name, "aaa", "tp1")
+    assert not cache.claim(REPO.full_name, "aaa", "tp1")
+    # Con un prefetch en curso, get() espera a lo sumo wait segundos.
+    assert cache.get(REPO.full_name, "aaa", "tp1") is None
+    cache.release(REPO.full_name, "aaa", "tp1")
+    cache.put(REPO.full_name, "aaa", "tp1", [])
+    assert not cache.claim(REPO.full_name, "aaa", "tp1")
+
+
+def test_cached_alu_repo():
+    files = [RepoFile("tp1/a.c", b"abc")]
+    alu_repo = FakeAluRepo(files)
+    cached = CachedAluRepo(alu_repo, SubmissionCache(fakeredis.FakeStrictRedis()), REPO)
+    assert cached.get_entrega("tp1", "aaa") == files
+    assert cached.get_entrega("tp1", "aaa") == files
+    assert alu_repo.calls == 1
@@ -0,0 +1,22 @@
+import requests
+
+from sisyphus.corrector.publisher import _retryable
+
+
+def response(status, **headers):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers)
+    return resp
+
+
+def test_retryable_rate_limit():
+    assert _retryable(response(403, **{"X-RateLimit-Remaining": "0"}))
+    assert _retryable(response(403, **{"Retry-After": "30"}))
+    assert _retryable(response(429))
+
+
+def test_retryable_permisos():
+    assert not _retryable(response(403, **{"X-RateLimit-Remaining": "4999"}))
+    assert not _retryable(response(404))
+    assert not _retryable(response(422))
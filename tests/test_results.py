@@ -0,0 +1,169 @@
+import fakeredis
+import pytest
+
+from rq.registry import ScheduledJobRegistry  # type: ignore
+
+from sisyphus.common.typ import AppInstallationTokenAuth
+from sisyphus.corrector import results
+from sisyphus.corrector.publisher import PublishError
+from sisyphus.corrector.results import GradingResult, ResultStore, republicar
+
+AUTH = AppInstallationTokenAuth(token="viejo", expires_at="2020-01-01T00:00:00Z")
+NUEVO = AppInstallationTokenAuth(token="nuevo", expires_at="2030-01-01T00:00:00Z")
+
+
+class FakePublisher:
+    """Publisher que falla las primeras `failures` veces.
+    """
+
+    def __init__(self, failures=0, checkrun_id=None):
+        self.failures = failures
+        self.checkrun_id = checkrun_id
+        self.calls = 0
+
+    def publish(self, conclusion, output):
+        self.calls += 1
+        # Como el real, el check run puede quedar creado aunque falle.
+        self.checkrun_id = 42
+        if self.calls <= self.failures:
+            raise PublishError("502 Bad Gateway")
+        return {"id": 42, "conclusion": conclusion}
+
+
+class FakeAppPool:
+    def __init__(self, fresh):
+        self.fresh = fresh
+        self.refreshed = []
+
+    def is_fresh(self, auth):
+        return self.fresh
+
+    def repo_auth(self, repo):
+        self.refreshed.append(repo.full_name)
+        return NUEVO
+
+
+def grading_result(**kwargs):
+    return GradingResult(
+        repo="algoritmos-rw/algo2_alu_x",
+        head_sha="aaa",
+        check_id="tp1",
+        name="Pruebas tp1",
+        conclusion="success",
+        output={"title": "OK", "summary": "Todo bien"},
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ResultStore(fakeredis.FakeStrictRedis(), max_retries=3)
+    monkeypatch.setattr(ResultStore, "default", store)
+    return store
+
+
+@pytest.fixture
+def publisher_cls(monkeypatch):
+    """Reemplaza el CheckRunPublisher (y el pool) que usa republicar().
+    """
+
+    class Publisher(FakePublisher):
+        failures = 0
+        created = []
+
+        def __init__(self, session, repo, *, head_sha, name, checkrun_id=None):
+            super().__init__(self.failures, checkrun_id)
+            self.session = session
+            self.created.append(self)
+
+    class Pool:
+        def session(self, auth):
+            return auth
+
+    monkeypatch.setattr(results, "CheckRunPublisher", Publisher)
+    monkeypatch.setattr(results, "default_pool", Pool)
+    return Publisher
+
+
+def test_publish_guarda_el_resultado(store):
+    result = grading_result()
+    assert store.publish(FakePublisher(), result, AUTH) == {
+        "id": 42,
+        "conclusion": "success",
+    }
+    saved = store.load(result.key)
+    assert saved.published and saved.checkrun_id == 42
+    assert store.queue.count == 0
+
+
+def test_publish_fallido_encola_reintento(store):
+    result = grading_result()
+    assert store.publish(FakePublisher(failures=1), result, AUTH) is None
+
+    saved = store.load(result.key)
+    assert not saved.published
+    assert saved.checkrun_id == 42  # El reintento actualiza el mismo check run.
+
+    [job] = store.queue.jobs
+    assert job.func is republicar
+    assert job.args == (result.key, AUTH, 0)
+
+
+def test_fresh_auth_renueva_token_vencido(store):
+    result = grading_result()
+    assert store.fresh_auth(result, AUTH) is AUTH  # Sin app_pool.
+
+    store.app_pool = FakeAppPool(fresh=True)
+    assert store.fresh_auth(result, AUTH) is AUTH
+
+    store.app_pool = pool = FakeAppPool(fresh=False)
+    assert store.fresh_auth(result, AUTH) is NUEVO
+    assert pool.refreshed == ["algoritmos-rw/algo2_alu_x"]
+
+
+def test_republicar_usa_token_nuevo(store, publisher_cls):
+    store.app_pool = FakeAppPool(fresh=False)
+    result = grading_result(checkrun_id=42)
+    store.save(result)
+
+    assert republicar(result.key, AUTH) == 42
+    [publisher] = publisher_cls.created
+    assert publisher.session is NUEVO
+    assert store.load(result.key).published
+
+
+def test_republicar_reintenta_con_backoff(store, publisher_cls):
+    publisher_cls.failures = 1
+    result = grading_result()
+    store.save(result)
+
+    assert republicar(result.key, AUTH, 0) is None
+    assert store.load(result.key).checkrun_id == 42
+    registry = ScheduledJobRegistry(queue=store.queue)
+    [job_id] = registry.get_job_ids()
+    assert store.queue.fetch_job(job_id).args == (result.key, AUTH, 1)
+
+
+def test_republicar_abandona_tras_max_retries(store, publisher_cls):
+    publisher_cls.failures = 1
+    result = grading_result()
+    store.save(result)
+
+    with pytest.raises(PublishError):
+        republicar(result.key, AUTH, store.max_retries - 1)
+    assert not store.load(result.key).published
+    assert ScheduledJobRegistry(queue=store.queue).count == 0
+    assert store.queue.count == 0
+
+
+def test_republicar_ya_publicado(store, publisher_cls):
+    result = grading_result(checkrun_id=42, published=True)
+    store.save(result)
+
+    assert republicar(result.key, AUTH) == 42
+    assert publisher_cls.created == []
+
+
+def test_republicar_resultado_vencido(store, publisher_cls):
+    assert republicar(grading_result().key, AUTH) is None
+    assert publisher_cls.created == []
@@ -0,0 +1,60 @@
+import types
+
+import fakeredis
+import pytest
+
+from sisyphus.repos.planilla import RepoInfo, ReposRegistry
+from sisyphus.repos.shared import SharedReposIndex
+
+
+class FakeDB:
+    def __init__(self, repos):
+        self.repos = repos
+        self.data = None
+        self.fail = False
+
+    @property
+    def loaded(self):
+        return self.data is not None
+
+    def refresh(self):
+        if self.fail:
+            raise RuntimeError("sheets down")
+        self.data = dict(self.repos)
+
+    def get(self):
+        return self.data
+
+
+def row(legajo):
+    return types.SimpleNamespace(legajo=legajo, grupo=None, repo_grupal=None)
+
+
+def shared_index(connection, dbs):
+    return SharedReposIndex(connection, ReposRegistry(dbs, retry_after=60))
+
+
+def test_publish_conserva_las_materias_sin_datos():
+    connection = fakeredis.FakeStrictRedis()
+    algo2, orga = FakeDB({"org/algo2_a": row("1")}), FakeDB({"org/orga_b": row("2")})
+    shared_index(connection, {"algo2": algo2, "orga": orga}).publish()
+
+    # Otro proceso, en el que la planilla de orga nunca se pudo descargar.
+    orga_down = FakeDB({})
+    orga_down.fail = True
+    algo2.repos = {"org/algo2_a": row("1"), "org/algo2_c": row("3")}
+    shared = shared_index(connection, {"algo2": algo2, "orga": orga_down})
+    shared.publish()
+
+    assert shared.lookup("org/algo2_c") == RepoInfo("algo2", "3", None, None)
+    assert shared.lookup("org/orga_b") == RepoInfo("orga", "2", None, None)
+
+
+def test_publish_no_publica_un_indice_parcial():
+    connection = fakeredis.FakeStrictRedis()
+    orga = FakeDB({"org/orga_b": row("2")})
+    orga.fail = True
+    shared = shared_index(connection, {"algo2": FakeDB({}), "orga": orga})
+    with pytest.raises(RuntimeError):
+        shared.publish()
+    assert connection.get("sisyphus:repos:version") is None
@@ -0,0 +1,134 @@
+import json
+import time
+
+import pytest
+
+from sisyphus.common import sheets
+from sisyphus.common.sheets import Config, PullDB
+
+
+class Hojas(PullDB):
+    def parse_sheets(self, sheet_dict):
+        return sheet_dict
+
+
+class FakeService:
+    """Imita a la API de Sheets: spreadsheets().values().batchGet().execute().
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchGet(self, *, spreadsheetId, ranges, valueRenderOption):
+        return self
+
+    def execute(self):
+        self.fetches += 1
+        return {"valueRanges": [{"range": "Repos!A1:E100", "values": self.rows}]}
+
+
+class Stop(Exception):
+    pass
+
+
+def config(**kwargs):
+    return Config(spreadsheet_id="x", credentials={}, sheet_list=["Repos"], **kwargs)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeService([["Repo"], ["algo2_alu_x"]])
+    monkeypatch.setattr(sheets.discovery, "build", lambda *args, **kwargs: service)
+    return service
+
+
+def test_snapshot_se_guarda_al_descargar(tmp_path, service):
+    path = tmp_path / "repos.json"
+    db = Hojas(config(snapshot_path=str(path)), initial_fetch=True)
+    assert db.data == {"Repos": [["Repo"], ["algo2_alu_x"]]}
+    assert json.loads(path.read_text()) == db.data
+    assert list(tmp_path.iterdir()) == [path]  # Sin temporales.
+
+
+def test_snapshot_se_sirve_y_se_revalida(tmp_path, service):
+    path = tmp_path / "repos.json"
+    path.write_text(json.dumps({"Repos": [["Repo"], ["viejo"]]}))
+
+    db = Hojas(config(snapshot_path=str(path)))
+    assert db.loaded and service.fetches == 0
+    # Se sirven los datos del snapshot, sin esperar a la descarga...
+    assert db.get() in (
+        {"Repos": [["Repo"], ["viejo"]]},
+        {"Repos": [["Repo"], ["algo2_alu_x"]]},
+    )
+    # ...que los reemplaza en segundo plano.
+    nuevo = {"Repos": [["Repo"], ["algo2_alu_x"]]}
+    deadline = time.monotonic() + 5
+    while json.loads(path.read_text()) != nuevo and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert json.loads(path.read_text()) == nuevo
+    assert db.get() == nuevo
+    assert service.fetches == 1
+
+
+def test_snapshot_corrupto_se_ignora(tmp_path, service):
+    path = tmp_path / "repos.json"
+    path.write_text("{no es json")
+    db = Hojas(config(snapshot_path=str(path)))
+    assert not db.loaded
+    assert db.data == {"Repos": [["Repo"], ["algo2_alu_x"]]}
+    assert service.fetches == 1
+
+
+def refresh_loop(db, monkeypatch, failures):
+    """Corre _refresh_loop hasta la primera espera tras una descarga exitosa.
+
+    Devuelve las esperas (en segundos) que hizo el refresher.
+    """
+    sleeps = []
+    attempts = []
+
+    def refresh():
+        attempts.append(1)
+        if len(attempts) <= failures:
+            raise RuntimeError("sheets down")
+        db._fetched_at = time.monotonic()
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(attempts) > failures:
+            raise Stop
+
+    monkeypatch.setattr(db, "refresh", refresh)
+    monkeypatch.setattr(sheets.time, "sleep", sleep)
+    with pytest.raises(Stop):
+        db._refresh_loop()
+    return sleeps
+
+
+def test_refresher_reintenta_con_backoff(monkeypatch):
+    db = Hojas(config(refresh_interval=100, refresh_jitter=0, retry_min=5))
+    assert refresh_loop(db, monkeypatch, failures=3) == [5, 10, 20, 100]
+
+
+def test_refresher_backoff_acotado(monkeypatch):
+    db = Hojas(config(refresh_interval=100, retry_min=5, retry_max=12))
+    assert refresh_loop(db, monkeypatch, failures=3)[:3] == [5, 10, 12]
+
+    db = Hojas(config(refresh_interval=8, retry_min=5))
+    assert refresh_loop(db, monkeypatch, failures=3)[:3] == [5, 8, 8]
+
+
+def test_refresher_sin_intervalo_solo_reemplaza_snapshot(monkeypatch):
+    db = Hojas(config())
+    db._fetched_at = -float("inf")
+    monkeypatch.setattr(db, "refresh", lambda: setattr(db, "_fetched_at", 1.0))
+    db._refresh_loop()  # Termina tras la primera descarga.
+    assert db._fetched_at == 1.0
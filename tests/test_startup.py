@@ -0,0 +1,58 @@
+import sys
+
+import pytest
+
+from sisyphus.tools import startup
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    """Directorio en el PYTHONPATH de los intérpretes que lanza measure().
+    """
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    return tmp_path
+
+
+def run_startup(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["startup", *argv])
+    with pytest.raises(SystemExit) as exit:
+        startup.main()
+    return exit.value.code
+
+
+@pytest.mark.parametrize("module", list(startup.STARTUP_BUDGETS))
+def test_modulos_de_entrada_sin_efectos(module):
+    # Sin sisyphus.yaml y sin red: measure() falla si el import los usa.
+    assert startup.measure(module) > 0
+
+
+def test_measure_prohibe_la_red(modules):
+    (modules / "conecta.py").write_text(
+        "import socket\nsocket.create_connection(('localhost', 6379))\n"
+    )
+    with pytest.raises(RuntimeError, match="network connection at import time"):
+        startup.measure("conecta")
+
+
+def test_measure_import_fallido(modules):
+    (modules / "roto.py").write_text("raise ImportError('falta algo')\n")
+    with pytest.raises(RuntimeError, match="falta algo"):
+        startup.measure("roto")
+
+
+def test_main_presupuesto(modules, monkeypatch, capsys):
+    (modules / "lento.py").write_text("import time\ntime.sleep(0.2)\n")
+
+    assert run_startup(monkeypatch, "--repeat", "1", "--budget", "5", "lento") == 0
+    assert capsys.readouterr().out.startswith("ok    lento: ")
+
+    assert run_startup(monkeypatch, "--repeat", "1", "--budget", "0.1", "lento") == 1
+    assert capsys.readouterr().out.startswith("SLOW  lento: ")
+
+
+def test_main_falla_si_algun_import_falla(modules, monkeypatch, capsys):
+    (modules / "roto.py").write_text("raise ImportError('falta algo')\n")
+    assert run_startup(monkeypatch, "--repeat", "1", "json", "roto") == 1
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].startswith("ok    json: ")
+    assert out[1] == "FAIL  roto: ImportError: falta algo"
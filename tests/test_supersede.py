@@ -0,0 +1,62 @@
+import fakeredis
+
+from rq import Queue  # type: ignore
+
+from sisyphus.common.typ import AppInstallationTokenAuth, CorregirJob, Repo
+from sisyphus.common.wire import decode_job, encode_job
+from sisyphus.corrector.supersede import Supersession
+
+REPO = Repo("algoritmos-rw/algo2_alu_x")
+AUTH = AppInstallationTokenAuth(token="t", expires_at="2030-01-01T00:00:00Z")
+
+
+def test_register_push_nuevo():
+    supersession = Supersession(fakeredis.FakeStrictRedis())
+    assert supersession.register(REPO, "tp1", "aaa", "job1", before="000") is None
+    previous = supersession.register(REPO, "tp1", "bbb", "job2", before="aaa")
+    assert previous["sha"] == "aaa"
+    assert supersession.latest_sha(REPO, "tp1") == "bbb"
+
+
+def test_register_push_desordenado():
+    supersession = Supersession(fakeredis.FakeStrictRedis())
+    supersession.register(REPO, "tp1", "bbb", "job2", before="aaa")
+    # Llega tarde el webhook del push anterior: no reemplaza al registrado.
+    assert supersession.register(REPO, "tp1", "aaa", "job1", before="000") is None
+    assert supersession.latest_sha(REPO, "tp1") == "bbb"
+
+
+def test_supersede_saca_el_trabajo_de_la_cola():
+    connection = fakeredis.FakeStrictRedis()
+    queue = Queue("default", connection=connection)
+    job = CorregirJob(
+        repo=REPO,
+        materia="algo2",
+        head_sha="aaa",
+        head_branch="tp1",
+        alu_dir="tp1",
+        installation_auth=AUTH,
+        checks={},
+    )
+    old_job = queue.enqueue(len, encode_job(job), job_id="job1")
+    supersession = Supersession(connection)
+    supersession.supersede(dict(sha="aaa", job_id=old_job.id), "bbb", AUTH)
+    assert queue.job_ids == []
+    assert not connection.exists(old_job.key)
+
+
+def test_is_superseded_ignora_los_pedidos_de_volver_a_correr():
+    supersession = Supersession(fakeredis.FakeStrictRedis())
+    supersession.register(REPO, "tp1", "bbb", "job2", before="aaa")
+    job = CorregirJob(
+        repo=REPO,
+        materia="algo2",
+        head_sha="aaa",
+        head_branch="tp1",
+        alu_dir="tp1",
+        installation_auth=AUTH,
+    )
+    assert supersession.is_superseded(job) == "bbb"
+    rerun = job.copy(update=dict(supersedable=False))
+    assert supersession.is_superseded(rerun) is None
+    assert supersession.is_superseded(decode_job(encode_job(rerun))) is None
@@ -0,0 +1,21 @@
+from sisyphus.corrector.tasks import checkrun_result
+
+
+def test_checkrun_result_ok():
+    conclusion, output = checkrun_result("compilando...\nTodo OK\n")
+    assert conclusion == "success"
+    assert output["title"] == "Todo OK"
+    assert "compilando..." in output["text"]
+
+
+def test_checkrun_result_error():
+    conclusion, output = checkrun_result("prueba 3: falla\nERROR\n")
+    assert conclusion == "failure"
+    assert output["title"] == "ERROR"
+
+
+def test_checkrun_result_sin_veredicto():
+    # "Todo OK" debe ocupar la línea entera.
+    conclusion, output = checkrun_result("casi Todo OK\n")
+    assert conclusion == "cancelled"
+    assert output["title"] == "ERROR EN ENTREGA"
@@ -0,0 +1,136 @@
+import json
+import sys
+
+import fakeredis
+import pytest
+
+from rq import Queue  # type: ignore
+
+from sisyphus.common import tracing
+from sisyphus.common.tracing import Span, Tracer, summary_markdown
+from sisyphus.common.typ import AppInstallationTokenAuth, CorregirJob, Repo
+from sisyphus.corrector.tasks import with_trace_summary
+from sisyphus.tools import trace
+
+AUTH = AppInstallationTokenAuth(token="t", expires_at="2030-01-01T00:00:00Z")
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = Tracer(fakeredis.FakeStrictRedis())
+    monkeypatch.setattr(Tracer, "default", tracer)
+    return tracer
+
+
+def corregir_job(trace_id="abc"):
+    return CorregirJob(
+        repo=Repo("algoritmos-rw/algo2_alu_x"),
+        materia="algo2",
+        head_sha="aaa",
+        head_branch="tp1",
+        alu_dir="tp1",
+        installation_auth=AUTH,
+        trace_id=trace_id,
+    )
+
+
+def test_spans_ordenados_por_inicio(tracer):
+    tracing.record("abc", "publish", 13.0, 13.5, check="tp1")
+    tracing.record("abc", "webhook", 10.0, 10.25)
+    assert tracer.spans("abc") == [
+        Span("webhook", 10.0, 0.25),
+        Span("publish", 13.0, 0.5, {"check": "tp1"}),
+    ]
+    assert tracer.connection.ttl("sisyphus:trace:abc") > 0
+
+
+def test_span_registra_aun_con_excepcion(tracer):
+    with pytest.raises(ValueError):
+        with tracing.span("abc", "corrector", check="tp1"):
+            raise ValueError
+    [span] = tracer.spans("abc")
+    assert span.name == "corrector" and span.attrs == {"check": "tp1"}
+    assert span.duration >= 0
+
+
+def test_sin_tracer_o_sin_trace_id_no_hace_nada(tracer, monkeypatch):
+    with tracing.span(None, "fetch"):
+        pass
+    assert tracer.connection.keys() == []
+
+    monkeypatch.setattr(Tracer, "default", None)
+    with tracing.span("abc", "fetch"):
+        pass
+    tracing.record("abc", "fetch", 0)
+
+
+def test_record_ignora_errores_de_redis(tracer, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(tracer, "record", fail)
+    tracing.record("abc", "fetch", 0)
+
+
+def test_summary_markdown():
+    spans = [
+        Span("webhook", 100.0, 0.1),
+        Span("dequeue", 101.5, 0.0, {"queue": "default"}),
+        Span("corrector", 102.0, 3.25, {"check": "tp1"}),
+    ]
+    summary = summary_markdown("abc", spans)
+    assert summary.startswith("<details>") and summary.endswith("</details>")
+    assert "Traza `abc`" in summary
+    assert "| webhook | +0.00s | 0.10s |" in summary
+    assert "| dequeue (default) | +1.50s | 0.00s |" in summary
+    assert "| corrector (tp1) | +2.00s | 3.25s |" in summary
+    assert summary_markdown("abc", []) == ""
+
+
+def test_with_trace_summary_solo_con_check_summary(tracer):
+    tracing.record("abc", "webhook", 10.0, 10.25)
+    output = {"title": "OK", "summary": "Todo bien", "text": "salida"}
+
+    assert with_trace_summary(corregir_job(), output) is output
+
+    tracer.check_summary = True
+    text = with_trace_summary(corregir_job(), output)["text"]
+    assert text.startswith("salida\n\n<details>")
+    assert "| webhook | +0.00s | 0.25s |" in text
+
+    assert with_trace_summary(corregir_job(trace_id=None), output) is output
+    assert with_trace_summary(corregir_job(trace_id="otra"), output) is output
+
+
+def run_trace(monkeypatch, connection, *argv):
+    monkeypatch.setattr(sys, "argv", ["trace", *argv])
+    monkeypatch.setattr(trace.Redis, "from_url", lambda url: connection)
+    trace.main()
+
+
+def test_trace_por_job_id(tracer, monkeypatch, capsys):
+    tracing.record("abc", "webhook", 10.0, 10.25)
+    tracing.record("abc", "corrector", 11.0, 14.0, check="tp1")
+    job = Queue(connection=tracer.connection).enqueue(print)
+    job.meta["trace_id"] = "abc"
+    job.save_meta()
+
+    run_trace(monkeypatch, tracer.connection, job.id)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "trace abc"
+    assert lines[1].split() == ["+", "0.000s", "0.250s", "webhook"]
+    assert lines[2].split() == ["+", "1.000s", "3.000s", "corrector", "check=tp1"]
+
+
+def test_trace_json_por_trace_id(tracer, monkeypatch, capsys):
+    tracing.record("abc", "webhook", 10.0, 10.25)
+    run_trace(monkeypatch, tracer.connection, "--json", "abc")
+    assert json.loads(capsys.readouterr().out) == {
+        "trace_id": "abc",
+        "spans": [{"name": "webhook", "start": 10.0, "duration": 0.25, "attrs": {}}],
+    }
+
+
+def test_trace_inexistente(tracer, monkeypatch):
+    with pytest.raises(SystemExit, match="no trace found for nada"):
+        run_trace(monkeypatch, tracer.connection, "nada")
@@ -0,0 +1,100 @@
+import json
+import pathlib
+import pickle
+
+import pytest
+
+from sisyphus.common.typ import AppInstallationTokenAuth, Check, CorregirJob, Repo
+from sisyphus.common.wire import WireFormatError, decode_job, encode_job
+
+AUTH = AppInstallationTokenAuth(token="t", expires_at="2030-01-01T00:00:00Z")
+
+
+def corregir_job(**kwargs):
+    return CorregirJob(
+        repo=Repo("algoritmos-rw/algo2_alu_x"),
+        materia="algo2",
+        head_sha="aaa",
+        head_branch="tp1",
+        alu_dir="tp1",
+        installation_auth=AUTH,
+        **kwargs,
+    )
+
+
+def test_ida_y_vuelta_minimo():
+    job = decode_job(encode_job(corregir_job()))
+    assert job.repo.full_name == "algoritmos-rw/algo2_alu_x"
+    assert (job.materia, job.head_sha, job.head_branch) == ("algo2", "aaa", "tp1")
+    assert job.alu_dir == "tp1"
+    assert job.installation_auth.token.get_secret_value() == "t"
+    assert job.checks == {} and job.checkrun_ids == {} and job.trace_id is None
+
+
+def test_ida_y_vuelta_completo():
+    check = Check(
+        name="Pruebas tp1",
+        alu_files=[pathlib.Path("tp1.c")],
+        test_files=[pathlib.Path("pruebas.c")],
+        build_stage=True,
+    )
+    job = decode_job(
+        encode_job(
+            corregir_job(
+                checks={"tp1": check, "extra": Check(name="Extra")},
+                checkrun_ids={"tp1": 123},
+                trace_id="abc",
+            )
+        )
+    )
+    assert job.checks == {"tp1": check, "extra": Check(name="Extra")}
+    assert job.checkrun_ids == {"tp1": 123}
+    assert job.trace_id == "abc"
+
+
+def test_omite_valores_por_omision():
+    data = json.loads(encode_job(corregir_job(checks={"tp1": Check(name="x")})))
+    assert data["c"] == {"tp1": {"n": "x"}}
+    assert "k" not in data and "x" not in data
+
+
+def test_ignora_claves_desconocidas():
+    data = json.loads(encode_job(corregir_job()))
+    data["nueva"] = 1
+    assert decode_job(json.dumps(data).encode()).head_sha == "aaa"
+
+
+def test_acepta_corregir_job():
+    job = corregir_job()
+    assert decode_job(job) is job
+
+
+@pytest.mark.parametrize("data", [b"no es json", b"{}", b'{"v": 99}'])
+def test_formato_desconocido(data):
+    with pytest.raises(WireFormatError):
+        decode_job(data)
+
+
+def test_acepta_corregir_job_de_la_forma_original():
+    # Un CorregirJob encolado con pickle antes de alu_dir, checks y
+    # checkrun_ids: pickle restaura __dict__ tal cual, sin validar.
+    old = CorregirJob.__new__(CorregirJob)
+    old.__setstate__(
+        {
+            "__dict__": dict(
+                repo=Repo("algoritmos-rw/algo2_alu_x"),
+                materia="algo2",
+                head_sha="aaa",
+                head_branch="tp1",
+                installation_auth=AUTH,
+                checkrun_id=123,
+            ),
+            "__fields_set__": set(),
+        }
+    )
+    job = decode_job(pickle.loads(pickle.dumps(old)))
+    assert job.alu_dir == "tp1"
+    assert job.checks == {}
+    assert job.checkrun_ids == {"tp1": 123}
+    assert job.trace_id is None and job.supersedable
+    assert not hasattr(job, "checkrun_id")
@@ -0,0 +1,71 @@
+import argparse
+import signal
+
+import fakeredis
+import pytest
+
+from rq.job import Job  # type: ignore
+
+from sisyphus.corrector import worker
+from sisyphus.corrector.worker import OverheadMixin
+from sisyphus.tools.worker import materia_weight
+
+
+class DeletingWorker:
+    """Worker mínimo cuyo trabajo se borra al terminar (como con result_ttl=0).
+    """
+
+    def execute_job(self, job, queue):
+        job.delete()
+
+
+class Worker(OverheadMixin, DeletingWorker):
+    pass
+
+
+def test_execute_job_borrado():
+    connection = fakeredis.FakeStrictRedis()
+    job = Job.create(func=len, args=(b"",), connection=connection)
+    job.save()
+    worker = Worker()
+    # No debe propagar NoSuchJobError al loop de rq.
+    worker.execute_job(job, None)
+    assert worker.overhead_jobs == 0
+
+
+def test_run_recycling_espera_si_el_hijo_falla(monkeypatch):
+    handlers = {}
+    sleeps = []
+    statuses = [256, 256, 256, 0, 256]
+
+    def waitpid(pid, options):
+        status = statuses.pop(0)
+        if not statuses:
+            handlers[signal.SIGTERM](signal.SIGTERM, None)
+        return pid, status
+
+    clock = [0.0]
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(worker, "preload", lambda: 0)
+    monkeypatch.setattr(worker.signal, "signal", handlers.__setitem__)
+    monkeypatch.setattr(worker.os, "fork", lambda: 123)
+    monkeypatch.setattr(worker.os, "waitpid", waitpid)
+    monkeypatch.setattr(worker.os, "kill", lambda pid, signum: None)
+    monkeypatch.setattr(worker.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(worker.time, "sleep", sleep)
+
+    worker.run_recycling([], None, max_jobs=1, max_backoff=3)
+    # Esperas de 1, 2 y 3 (no 4) segundos; tras un hijo que terminó bien,
+    # vuelve a empezar, pero ya se pidió parar.
+    assert sum(sleeps) == 1 + 2 + 3
+
+
+def test_materia_weight():
+    assert materia_weight("algo2=2.5") == ("algo2", 2.5)
+    for value in ("algo2", "algo2=x", "=1", "algo2=0"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            materia_weight(value)